@@ -5,12 +5,21 @@ Fetches and stores GPU prices using the gpuhunt module.
 """
 
 import sys
+import enum
+import json
+import time
+import types
 import argparse
+import operator
+import threading
+import dataclasses
 from datetime import datetime
 from typing import List, Optional
 from pathlib import Path
 import warnings
 
+import numpy as np
+
 try:
     import gpuhunt
     # Monkey-patch TensorDock provider to handle API response format changes
@@ -121,8 +130,9 @@ except ImportError:
     sys.exit(1)
 
 
-from models import GPUInstance
-from database import PriceDatabase
+import instrumentation
+from models import DictColumn, GPUInstance, GPUInstanceBatch
+from database import SNAPSHOT_COMPLETE, SNAPSHOT_PARTIAL, PriceDatabase
 
 
 def convert_gpuhunt_to_instance(item) -> Optional[GPUInstance]:
@@ -210,6 +220,165 @@ def convert_gpuhunt_to_instance(item) -> Optional[GPUInstance]:
         return None
 
 
+# Provider-name normalisation, applied once per distinct provider in a batch.
+_PROVIDER_MAP = {
+    'aws': 'aws',
+    'gcp': 'gcp',
+    'azure': 'azure',
+    'lambda': 'lambda',
+    'runpod': 'runpod',
+    'tensordock': 'tensordock',
+    'vastai': 'vastai',
+    'datacrunch': 'datacrunch',
+    'cudo': 'cudo',
+    'nebius': 'nebius'
+}
+
+# Catalog item attributes read by the batch converter, in column order.
+_ITEM_FIELDS = ('provider', 'gpu_name', 'gpu_count', 'gpu_memory', 'instance_name',
+                'cpu', 'memory', 'location', 'price', 'spot')
+_get_item_fields = operator.attrgetter(*_ITEM_FIELDS)
+
+
+def _item_fields(item) -> tuple:
+    """Slow path for items missing some attributes: same defaults as
+    convert_gpuhunt_to_instance."""
+    return (
+        getattr(item, 'provider', 'unknown'),
+        getattr(item, 'gpu_name', None) or getattr(item, 'name', 'Unknown'),
+        getattr(item, 'gpu_count', 1),
+        getattr(item, 'gpu_memory', None),
+        getattr(item, 'instance_name', None) or getattr(item, 'name', 'unknown'),
+        getattr(item, 'cpu', 0),
+        getattr(item, 'memory', 0),
+        getattr(item, 'location', 'unknown'),
+        getattr(item, 'price', 0.0),
+        getattr(item, 'spot', False),
+    )
+
+
+def _as_float(values, bad: np.ndarray, falsy_zero: bool = True) -> np.ndarray:
+    """Coerce a column to float64, treating falsy values as 0.
+
+    Vectorised in the common case; only a column holding something
+    non-numeric falls back to per-element conversion, flagging those rows
+    in `bad` instead of failing the whole batch. With `falsy_zero=False`
+    values are converted as-is; note that NumPy turns None into NaN rather
+    than raising, so callers check the result with `np.isfinite`.
+    """
+    if falsy_zero:
+        values = [v or 0 for v in values]
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        out = np.zeros(len(values), dtype=np.float64)
+        for i, v in enumerate(values):
+            try:
+                out[i] = float(v)
+            except (TypeError, ValueError):
+                bad[i] = True
+        return out
+
+
+def convert_gpuhunt_items(items) -> tuple[GPUInstanceBatch, dict]:
+    """
+    Convert a whole list of gpuhunt catalog items to a GPUInstanceBatch.
+
+    Batch counterpart of convert_gpuhunt_to_instance with the same
+    normalisation, gpu_count <= 0 drop, failures (e.g. a missing price) and
+    quality tagging, applied as array masks over all items at once.
+
+    Args:
+        items: gpuhunt catalog items
+
+    Returns:
+        Tuple of (batch, failures) where failures maps provider name to the
+        number of items that could not be converted
+    """
+    rows = []
+    for item in items:
+        try:
+            fields = _get_item_fields(item)
+            # Fall back to the attribute defaults when a name is missing.
+            if not fields[1] or not fields[4]:
+                fields = _item_fields(item)
+        except AttributeError:
+            fields = _item_fields(item)
+        rows.append(fields)
+
+    if not rows:
+        return GPUInstanceBatch.empty(), {}
+
+    (providers, gpu_names, gpu_counts, gpu_memories, instance_names,
+     cpus, memories, locations, prices, spots) = zip(*rows)
+
+    # Normalise each distinct provider once rather than once per row. Raw
+    # spellings that normalise alike ('AWS', 'aws') merge into one category.
+    raw_providers = DictColumn.encode([str(p) for p in providers])
+    categories, remap = np.unique(
+        np.asarray([_PROVIDER_MAP.get(p.lower(), p.lower()) for p in raw_providers.categories],
+                   dtype=object),
+        return_inverse=True,
+    )
+    provider_col = DictColumn(remap.astype(np.int32)[raw_providers.codes], categories)
+
+    bad = np.zeros(len(rows), dtype=bool)
+    gpu_count = _as_float(gpu_counts, bad)
+    # Rows the per-item converter drops as CPU-only before anything can
+    # fail: a numeric gpu_count <= 0. Only the other bad rows are failures.
+    cpu_only = ~bad & np.isfinite(gpu_count) & (gpu_count <= 0)
+    gpu_memory = _as_float(gpu_memories, bad)
+    vcpus = _as_float(cpus, bad)
+    ram_gb = _as_float(memories, bad)
+    # A missing or non-numeric price fails the item (float(price) in
+    # convert_gpuhunt_to_instance), but only after the gpu_count <= 0 drop.
+    bad_price = np.zeros(len(rows), dtype=bool)
+    price = _as_float(prices, bad_price, falsy_zero=False)
+    # float(None) raises per item, but NumPy turns None into NaN, which the
+    # NOT NULL price column would reject at ingest: fail those items too.
+    bad_price |= ~np.isfinite(price)
+    # Integer columns can't hold NaN/inf (int() raises on them per row).
+    bad |= ~(np.isfinite(gpu_count) & np.isfinite(gpu_memory) & np.isfinite(vcpus))
+    gpu_count, vcpus = np.trunc(gpu_count), np.trunc(vcpus)
+    bad |= bad_price & (gpu_count > 0)
+
+    # Drop CPU-only / unscoped listings at the source (see
+    # convert_gpuhunt_to_instance) and anything that failed to convert.
+    keep = ~bad & (gpu_count > 0)
+
+    # None can't be sorted alongside strings when dictionary-encoding.
+    gpu_type = np.asarray([g if g is not None else 'Unknown' for g in gpu_names], dtype=object)
+    region = np.asarray([r if r is not None else 'unknown' for r in locations], dtype=object)
+    unknown_gpu = (gpu_type == '') | (gpu_type == 'Unknown')
+    quality = np.where(unknown_gpu, 'unknown_gpu',
+                       np.where(gpu_memory == 0, 'missing_memory', 'ok'))
+
+    failures = {}
+    failed = bad & ~cpu_only
+    if failed.any():
+        names, counts = np.unique(provider_col.decode()[failed], return_counts=True)
+        failures = dict(zip(names.tolist(), counts.tolist()))
+
+    n = int(keep.sum())
+    batch = GPUInstanceBatch(
+        provider=provider_col.take(keep),
+        instance_type=np.asarray(instance_names, dtype=object)[keep],
+        gpu_type=DictColumn.encode(gpu_type[keep]),
+        gpu_count=gpu_count[keep].astype(np.int32),
+        gpu_memory_gb=np.where(gpu_memory == 0, np.nan, np.trunc(gpu_memory))[keep],
+        vcpus=vcpus[keep].astype(np.int32),
+        ram_gb=ram_gb[keep],
+        region=DictColumn.encode(region[keep]),
+        price_per_hour=price[keep],
+        is_spot=np.asarray([bool(v) for v in spots], dtype=bool)[keep],
+        available=np.ones(n, dtype=np.int8),  # gpuhunt typically returns available instances
+        availability_zone=np.full(n, None, dtype=object),
+        last_updated=np.full(n, np.datetime64(datetime.now(), 'us')),
+        quality=DictColumn.encode(quality[keep]),
+    )
+    return batch, failures
+
+
 # Fallback provider lists, used only if gpuhunt's internal constants move.
 _FALLBACK_ONLINE = ['cudo', 'tensordock', 'vastai', 'vultr']
 _FALLBACK_OFFLINE = ['aws', 'azure', 'datacrunch', 'gcp', 'lambdalabs',
@@ -234,35 +403,243 @@ def _provider_split():
         return list(_FALLBACK_ONLINE), list(_FALLBACK_OFFLINE)
 
 
-def _query_isolated(names, query_params, bulk=False, verbose=False):
+def _query_isolated(names, query_params, bulk=False, verbose=False, raw=None):
     """Query the given providers, isolating failures.
 
     A single provider raising (API error, format change, rate limit) is caught and
     that provider is skipped, instead of aborting the whole collection. Returns
-    (items, failed_provider_names).
+    (items, failed_provider_names). If `raw` is a dict, each successful
+    provider's result list is also stored in it under the provider's label.
     """
     items, failed = [], []
     groups = [names] if bulk else [[n] for n in names]
     for group in groups:
         label = group[0] if len(group) == 1 else 'catalog'
+        started = time.perf_counter()
         try:
-            items.extend(gpuhunt.query(provider=group, **query_params))
+            found = gpuhunt.query(provider=group, **query_params)
+            items.extend(found)
+            if raw is not None:
+                raw[label] = found
+            instrumentation.active().record(f"fetch:{label}", time.perf_counter() - started,
+                                            rows=len(found), status='ok')
         except Exception as e:
+            instrumentation.active().record(f"fetch:{label}", time.perf_counter() - started,
+                                            rows=0, status='failed')
+            failed.append(label)
+            if verbose:
+                print(f"  WARNING: provider '{label}' failed and was skipped: "
+                      f"{type(e).__name__}: {e}", file=sys.stderr)
+    return items, failed
+
+
+# Defaults for the concurrent collection mode. Four workers cover the offline
+# catalog plus the slowest online providers at once; the timeout is generous
+# because Vast.ai routinely takes a minute or more to page through listings.
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_PROVIDER_TIMEOUT = 300.0
+
+
+def _query_concurrent(groups, query_params, max_workers=DEFAULT_MAX_WORKERS,
+                      timeout=DEFAULT_PROVIDER_TIMEOUT, verbose=False, raw=None):
+    """Query provider groups at the same time on a bounded worker pool.
+
+    `groups` is a list of (label, provider_names) pairs; each pair becomes one
+    `gpuhunt.query` call. Failure isolation matches `_query_isolated`: a group
+    that raises, or that runs longer than `timeout` seconds of wall-clock time
+    (measured from when it got a worker slot), lands in the failed list and
+    the rest of the collection proceeds. Abandoned calls keep their slots,
+    so the whole call is also bounded: after `timeout` seconds per wave of
+    `max_workers` groups, groups still waiting for a slot fail too. Items
+    are returned in `groups` order regardless of completion order, so
+    snapshots stay deterministic. `raw` is filled per label as in
+    `_query_isolated`.
+
+    Workers are daemon threads rather than a ThreadPoolExecutor: a vendor API
+    that hangs past the timeout is abandoned, and must not keep the process
+    alive at exit the way executor threads would.
+    """
+    workers = max(1, max_workers)
+    slots = threading.BoundedSemaphore(workers)
+    lock = threading.Lock()
+    done = threading.Event()
+    started, results, errors = {}, {}, {}
+    metrics = instrumentation.active()
+
+    def run(label, names):
+        with slots:
+            with lock:
+                if done.is_set():
+                    return  # given up on while queued
+                started[label] = time.monotonic()
+            try:
+                found = gpuhunt.query(provider=names, **query_params)
+                with lock:
+                    results[label] = found
+                status, rows = 'ok', len(found)
+            except Exception as e:
+                with lock:
+                    errors[label] = e
+                status, rows = 'failed', 0
+            # A call that outlives its timeout still lands here eventually;
+            # the metrics then show how long the vendor really took.
+            metrics.record(f"fetch:{label}", time.monotonic() - started[label],
+                           rows=rows, status=status)
+
+    threads = []
+    for label, names in groups:
+        t = threading.Thread(target=run, args=(label, names),
+                             name=f"gpuhunt-{label}", daemon=True)
+        t.start()
+        threads.append((label, t))
+
+    deadline = time.monotonic() + timeout * -(-len(groups) // workers)
+    timed_out, unstarted = set(), set()
+    pending = dict(threads)
+    while pending:
+        for label, t in list(pending.items()):
+            t.join(timeout=0.1)
+            if not t.is_alive():
+                del pending[label]
+                continue
+            now = time.monotonic()
+            with lock:
+                began = started.get(label)
+            if began is not None and now - began > timeout:
+                timed_out.add(label)
+                del pending[label]
+            elif began is None and now > deadline:
+                unstarted.add(label)
+                del pending[label]
+    with lock:
+        done.set()
+
+    items, failed = [], []
+    for label, _ in groups:
+        if label in timed_out:
             failed.append(label)
             if verbose:
+                print(f"  WARNING: provider '{label}' timed out after "
+                      f"{timeout:.0f}s and was skipped", file=sys.stderr)
+        elif label in unstarted:
+            failed.append(label)
+            if verbose:
+                print(f"  WARNING: provider '{label}' never got a worker (slots held "
+                      f"by timed-out providers) and was skipped", file=sys.stderr)
+        elif label in errors:
+            failed.append(label)
+            if verbose:
+                e = errors[label]
                 print(f"  WARNING: provider '{label}' failed and was skipped: "
                       f"{type(e).__name__}: {e}", file=sys.stderr)
+        else:
+            found = results.get(label, [])
+            items.extend(found)
+            if raw is not None:
+                raw[label] = found
     return items, failed
 
 
+RAW_MANIFEST = 'manifest.json'
+
+
+def _raw_value(value):
+    """Scalar form of a catalog item attribute for columnar storage."""
+    if isinstance(value, enum.Enum):
+        return value.value
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def record_raw_items(directory, raw, failed, query_params, timestamp) -> Path:
+    """Persist each provider's raw gpuhunt result for offline replay.
+
+    Writes one zstd-compressed Parquet file per provider label
+    (`<label>.parquet`, one column per catalog item attribute) plus a
+    `manifest.json` holding the snapshot timestamp, query parameters and
+    failed providers, so `replay_prices` can reproduce the run exactly.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    out = Path(directory)
+    out.mkdir(parents=True, exist_ok=True)
+    providers = {}
+    for label, found in raw.items():
+        records = [
+            {f.name: _raw_value(getattr(item, f.name)) for f in dataclasses.fields(item)}
+            if dataclasses.is_dataclass(item)
+            else {name: _raw_value(getattr(item, name, None)) for name in _ITEM_FIELDS}
+            for item in found
+        ]
+        names = list(dict.fromkeys(k for r in records for k in r)) or list(_ITEM_FIELDS)
+        columns = {}
+        for name in names:
+            values = [r.get(name) for r in records]
+            try:
+                columns[name] = pa.array(values)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                # Mixed types across items: keep the column, as text.
+                columns[name] = pa.array([None if v is None else str(v) for v in values])
+        filename = f"{label}.parquet"
+        pq.write_table(pa.table(columns), out / filename, compression="zstd")
+        providers[label] = {'file': filename, 'items': len(records)}
+
+    manifest = {
+        'timestamp': timestamp.isoformat(),
+        'query_params': query_params,
+        'failed': list(failed),
+        'providers': providers,
+    }
+    (out / RAW_MANIFEST).write_text(json.dumps(manifest, indent=2))
+    return out
+
+
+def load_raw_items(directory) -> tuple[list, dict]:
+    """Load items recorded by `record_raw_items`. Returns (items, manifest)."""
+    import pyarrow.parquet as pq
+
+    src = Path(directory)
+    manifest = json.loads((src / RAW_MANIFEST).read_text())
+    items = []
+    for entry in manifest['providers'].values():
+        rows = pq.read_table(src / entry['file']).to_pylist()
+        items.extend(types.SimpleNamespace(**row) for row in rows)
+    return items, manifest
+
+
+def _convert_items(items, verbose: bool = False) -> GPUInstanceBatch:
+    """Batch-convert catalog items, reporting failures in one warning line."""
+    with instrumentation.active().stage("conversion", rows_in=len(items)) as rec:
+        instances, conversion_failures = convert_gpuhunt_items(items)
+        rec["rows"] = len(instances)
+        rec["failures"] = sum(conversion_failures.values())
+    if conversion_failures:
+        print(f"WARNING: {sum(conversion_failures.values())} item(s) failed to convert: "
+              + ', '.join(f"{p}={n}" for p, n in sorted(conversion_failures.items())),
+              file=sys.stderr)
+
+    if verbose:
+        print(f"  Converted {len(instances)} valid instances")
+
+    return instances
+
+
 def collect_gpuhunt_prices(
     min_gpu_memory: Optional[int] = None,
     min_cpu: Optional[int] = None,
     max_price: Optional[float] = None,
     gpu_name: Optional[str] = None,
     provider: Optional[str] = None,
-    verbose: bool = False
-) -> List[GPUInstance]:
+    verbose: bool = False,
+    concurrent: bool = False,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    provider_timeout: float = DEFAULT_PROVIDER_TIMEOUT,
+    record_dir: Optional[str] = None,
+    timestamp: Optional[datetime] = None,
+    failed_out: Optional[list] = None,
+) -> GPUInstanceBatch:
     """
     Collect prices from gpuhunt.
     
@@ -273,9 +650,19 @@ def collect_gpuhunt_prices(
         gpu_name: Filter by GPU name (e.g., 'A100', 'H100')
         provider: Filter by provider
         verbose: Whether to print detailed output
+        concurrent: Query the offline catalog and each online provider at
+            the same time instead of one after another
+        max_workers: Worker pool size for concurrent mode
+        provider_timeout: Per-provider wall-clock timeout (seconds) for
+            concurrent mode
+        record_dir: If set, persist each provider's raw result here for
+            later `--replay`
+        timestamp: Snapshot timestamp recorded alongside the raw results
+        failed_out: If a list, names of providers that failed or timed out
+            are appended to it
         
     Returns:
-        List of GPUInstance objects
+        GPUInstanceBatch of converted instances (empty on failure)
     """
     if verbose:
         print("Fetching GPU prices from gpuhunt...")
@@ -296,36 +683,48 @@ def collect_gpuhunt_prices(
         # 403) must not zero out every other provider. We query the offline
         # catalog in one bulk call and each live-API provider individually so
         # failures are contained.
+        raw = {} if record_dir else None
         with warnings.catch_warnings():
             warnings.simplefilter("ignore")
             if provider:
-                items, failed = _query_isolated([provider], query_params, verbose=verbose)
+                items, failed = _query_isolated([provider], query_params, verbose=verbose, raw=raw)
+            elif concurrent:
+                # _provider_split() also warms gpuhunt's default catalog, so
+                # the worker threads below share one already-loaded instance.
+                online, offline = _provider_split()
+                groups = [('catalog', offline)] + [(n, [n]) for n in online]
+                items, failed = _query_concurrent(
+                    groups, query_params, max_workers=max_workers,
+                    timeout=provider_timeout, verbose=verbose, raw=raw,
+                )
             else:
                 online, offline = _provider_split()
-                off_items, off_failed = _query_isolated(offline, query_params, bulk=True, verbose=verbose)
-                on_items, on_failed = _query_isolated(online, query_params, bulk=False, verbose=verbose)
+                off_items, off_failed = _query_isolated(offline, query_params, bulk=True,
+                                                        verbose=verbose, raw=raw)
+                on_items, on_failed = _query_isolated(online, query_params, bulk=False,
+                                                      verbose=verbose, raw=raw)
                 items = off_items + on_items
                 failed = off_failed + on_failed
 
         if failed:
             print(f"WARNING: {len(failed)} provider(s) unavailable, skipped: "
                   f"{', '.join(failed)}", file=sys.stderr)
+            if failed_out is not None:
+                failed_out.extend(failed)
 
         if verbose:
             print(f"  Retrieved {len(items)} items from gpuhunt "
                   f"({len(failed)} provider(s) skipped)")
         
-        # Convert to GPUInstance objects
-        instances = []
-        for item in items:
-            gpu_instance = convert_gpuhunt_to_instance(item)
-            if gpu_instance:
-                instances.append(gpu_instance)
-        
-        if verbose:
-            print(f"  Converted {len(instances)} valid instances")
+        if record_dir:
+            recorded_params = dict(query_params, provider=provider) if provider else query_params
+            out = record_raw_items(record_dir, raw, failed, recorded_params,
+                                   timestamp or datetime.now())
+            if verbose:
+                print(f"  Recorded raw provider results to {out}")
         
-        return instances
+        # Convert the whole result set in one columnar pass
+        return _convert_items(items, verbose=verbose)
     
     except Exception as e:
         # Handle errors gracefully
@@ -335,15 +734,17 @@ def collect_gpuhunt_prices(
             traceback.print_exc()
         else:
             print(f"WARNING: Error querying gpuhunt (some providers may be unavailable): {type(e).__name__}", file=sys.stderr)
-        return []
+        return GPUInstanceBatch.empty()
 
 
-def collect_all_prices(verbose: bool = False) -> tuple[int, int]:
+def collect_all_prices(verbose: bool = False, **collect_kwargs) -> tuple[int, int]:
     """
     Collect prices from gpuhunt and store in database.
     
     Args:
         verbose: Whether to print detailed output
+        **collect_kwargs: Passed through to collect_gpuhunt_prices
+            (e.g. concurrent, max_workers, provider_timeout, record_dir)
         
     Returns:
         Tuple of (total_instances, stored_count)
@@ -354,7 +755,9 @@ def collect_all_prices(verbose: bool = False) -> tuple[int, int]:
         print(f"[{timestamp.strftime('%Y-%m-%d %H:%M:%S')}] Starting gpuhunt price collection...")
     
     # Collect all available GPU instances
-    instances = collect_gpuhunt_prices(verbose=verbose)
+    failed = []
+    instances = collect_gpuhunt_prices(verbose=verbose, timestamp=timestamp,
+                                       failed_out=failed, **collect_kwargs)
     
     if not instances:
         print("WARNING: No instances collected from gpuhunt", file=sys.stderr)
@@ -366,15 +769,74 @@ def collect_all_prices(verbose: bool = False) -> tuple[int, int]:
         print("  Storing to database...")
     
     db = PriceDatabase()
-    stored = db.store_prices(instances, timestamp=timestamp)
+    instrumentation.active().snapshot_timestamp = timestamp
+    result = db.ingest_prices(
+        instances, timestamp=timestamp,
+        status=SNAPSHOT_PARTIAL if failed else SNAPSHOT_COMPLETE,
+    )
+    stored = result.total
     
     if verbose:
-        print(f"  Stored {stored} price records")
+        print(f"  Stored {stored} price records "
+              f"({result.inserted} new, {result.replaced} replaced)")
         print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Collection complete!")
     
     return len(instances), stored
 
 
+def replay_prices(directory, verbose: bool = False) -> tuple[int, int]:
+    """
+    Re-run conversion, quality tagging and storage from a `--record` directory.
+
+    No network access. Rows are stored under the recorded snapshot
+    timestamp, so replaying after a normalisation fix replaces that
+    snapshot's rows in place.
+    
+    Args:
+        directory: Directory written by `collect.py --record`
+        verbose: Whether to print detailed output
+        
+    Returns:
+        Tuple of (total_instances, stored_count)
+    """
+    items, manifest = load_raw_items(directory)
+    timestamp = datetime.fromisoformat(manifest['timestamp'])
+
+    if verbose:
+        print(f"Replaying {len(items)} recorded items from {directory} "
+              f"(snapshot {timestamp.strftime('%Y-%m-%d %H:%M:%S')})")
+        if manifest['failed']:
+            print(f"  Providers that failed during recording: {', '.join(manifest['failed'])}")
+
+    instances = _convert_items(items, verbose=verbose)
+    if not instances:
+        return 0, 0
+
+    instrumentation.active().snapshot_timestamp = timestamp
+    # A recording of a filtered or degraded run replays as partial too.
+    partial = manifest['failed'] or manifest.get('query_params')
+    result = PriceDatabase().ingest_prices(
+        instances, timestamp=timestamp,
+        status=SNAPSHOT_PARTIAL if partial else SNAPSHOT_COMPLETE,
+    )
+    if verbose:
+        print(f"  Stored {result.total} price records "
+              f"({result.inserted} new, {result.replaced} replaced)")
+    return len(instances), result.total
+
+
+def _finish_run(run, metrics_file: Optional[str] = None) -> None:
+    """Emit the run's metrics as a JSON line and append them to the DB."""
+    run.finish()
+    run.emit(metrics_file)
+    try:
+        with PriceDatabase() as db:
+            db.record_run(run)
+    except Exception as e:
+        # Metrics must never fail a collection that already stored its data.
+        print(f"WARNING: could not record run metrics: {e}", file=sys.stderr)
+
+
 def main():
     """Main entry point for gpuhunt-based collection."""
     parser = argparse.ArgumentParser(
@@ -415,35 +877,89 @@ def main():
         type=str,
         help='Filter by provider'
     )
+    parser.add_argument(
+        '--record',
+        metavar='DIR',
+        help='Also save each provider\'s raw gpuhunt result to DIR for --replay'
+    )
+    parser.add_argument(
+        '--replay',
+        metavar='DIR',
+        help='Convert and store a --record directory instead of fetching'
+    )
+    parser.add_argument(
+        '--metrics-file',
+        metavar='PATH',
+        help='Append the run\'s stage metrics as one JSON line to PATH '
+             '(default: print the line to stderr)'
+    )
+    parser.add_argument(
+        '--concurrent',
+        action='store_true',
+        help='Query the offline catalog and each online provider concurrently'
+    )
+    parser.add_argument(
+        '--max-workers',
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        help=f'Worker pool size for --concurrent (default: {DEFAULT_MAX_WORKERS})'
+    )
+    parser.add_argument(
+        '--provider-timeout',
+        type=float,
+        default=DEFAULT_PROVIDER_TIMEOUT,
+        help='Per-provider timeout in seconds for --concurrent '
+             f'(default: {DEFAULT_PROVIDER_TIMEOUT:.0f})'
+    )
     
     args = parser.parse_args()
+    if args.record and args.replay:
+        parser.error('--record and --replay are mutually exclusive')
+    fetch_opts = dict(
+        concurrent=args.concurrent,
+        max_workers=args.max_workers,
+        provider_timeout=args.provider_timeout,
+        record_dir=args.record,
+    )
     
+    run = instrumentation.start_run('replay' if args.replay else 'collect')
     try:
+        if args.replay:
+            total, stored = replay_prices(args.replay, verbose=args.verbose)
         # If filters are specified, use custom query
-        if any([args.min_gpu_memory, args.min_cpu, args.max_price, args.gpu_name, args.provider]):
+        elif any([args.min_gpu_memory, args.min_cpu, args.max_price, args.gpu_name, args.provider]):
+            timestamp = datetime.now()
             instances = collect_gpuhunt_prices(
+                timestamp=timestamp,
                 min_gpu_memory=args.min_gpu_memory,
                 min_cpu=args.min_cpu,
                 max_price=args.max_price,
                 gpu_name=args.gpu_name,
                 provider=args.provider,
-                verbose=args.verbose
+                verbose=args.verbose,
+                **fetch_opts
             )
             
             if instances:
                 db = PriceDatabase()
-                timestamp = datetime.now()
-                stored = db.store_prices(instances, timestamp=timestamp)
+                run.snapshot_timestamp = timestamp
+                # A filtered collection never covers the whole market.
+                result = db.ingest_prices(instances, timestamp=timestamp,
+                                          status=SNAPSHOT_PARTIAL)
+                stored = result.total
 
                 if args.verbose:
-                    print(f"\nStored {stored} records to database")
+                    print(f"\nStored {stored} records to database "
+                          f"({result.inserted} new, {result.replaced} replaced)")
 
                 total, stored = len(instances), stored
             else:
                 total, stored = 0, 0
         else:
             # Collect all prices
-            total, stored = collect_all_prices(verbose=args.verbose)
+            total, stored = collect_all_prices(verbose=args.verbose, **fetch_opts)
+
+        _finish_run(run, args.metrics_file)
 
         if args.stats:
             db = PriceDatabase()
@@ -25,7 +25,7 @@ echo "" | tee -a "$LOGFILE"
 
 # Step 1: Collect GPU prices
 echo "Step 1: Collecting GPU prices from gpuhunt..." | tee -a "$LOGFILE"
-"$PYTHON" collect.py -v 2>&1 | tee -a "$LOGFILE"
+"$PYTHON" collect.py -v --concurrent 2>&1 | tee -a "$LOGFILE"
 echo "" | tee -a "$LOGFILE"
 
 # Step 1b: Emit the new snapshot as a Parquet file (for the Streamlit app)
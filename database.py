@@ -1,33 +1,260 @@
 """Database module for storing historical GPU pricing data."""
 
 import sqlite3
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterable, Iterator, Union
 from pathlib import Path
 import json
 
-from models import GPUInstance
+import numpy as np
+
+import instrumentation
+import price_sketch
+from models import GPUInstance, GPUInstanceBatch
+
+
+# Bump together with a new entry in PriceDatabase._MIGRATIONS.
+SCHEMA_VERSION = 8
+
+# Storage modes for price rows (recorded in db_meta under 'storage').
+STORAGE_ROWS = 'rows'  # one gpu_prices row per listing per snapshot
+STORAGE_INTERVALS = 'intervals'  # listing_intervals; gpu_prices is a view
+STORAGE_STAR = 'star'  # price_facts + dim_* tables; gpu_prices is a view
+STORAGE_CLUSTERED = 'clustered'  # gpu_prices WITHOUT ROWID on the snapshot key
+STORAGE_SHARDED = 'sharded'  # row layout, one gpu_prices file per month
+
+# Shards ATTACHed at once per connection; SQLite's default limit is 10.
+_MAX_ATTACHED_SHARDS = 8
+
+# price_snapshots.status: whether every provider contributed to a snapshot
+# (a provider failed, or the collection was filtered, makes it partial).
+SNAPSHOT_COMPLETE = 'complete'
+SNAPSHOT_PARTIAL = 'partial'
+
+# get_stats values cached in db_meta (as 'stats.<key>') by ingest_prices.
+_STATS_KEYS = (
+    'total_records', 'snapshots', 'first_snapshot', 'last_snapshot',
+    'providers', 'gpu_types',
+)
+
+# gpu_prices columns written by ingest, in _INSERT_PRICE_SQL order.
+_INSERT_COLUMNS = (
+    'timestamp', 'provider', 'instance_type', 'gpu_type', 'gpu_count',
+    'gpu_memory_gb', 'vcpus', 'ram_gb', 'region', 'price_per_hour',
+    'is_spot', 'available', 'availability_zone', 'quality',
+)
+
+_INSERT_PRICE_SQL = """
+    INSERT OR REPLACE INTO {table} (
+        timestamp, provider, instance_type, gpu_type, gpu_count,
+        gpu_memory_gb, vcpus, ram_gb, region, price_per_hour,
+        is_spot, available, availability_zone, quality
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# gpu_prices columns in models.BATCH_COLUMNS order (timestamp -> last_updated).
+_BATCH_SELECT = (
+    "provider, instance_type, gpu_type, gpu_count, gpu_memory_gb, vcpus, "
+    "ram_gb, region, price_per_hour, is_spot, available, availability_zone, "
+    "timestamp, quality"
+)
+
+# Listing identity in interval storage, and the attributes whose change
+# closes one interval and opens the next.
+_INTERVAL_KEY = ('provider', 'instance_type', 'region', 'is_spot')
+_INTERVAL_ATTRS = (
+    'gpu_type', 'gpu_count', 'gpu_memory_gb', 'vcpus', 'ram_gb',
+    'price_per_hour', 'available', 'availability_zone', 'quality',
+)
+_INTERVAL_COLUMNS = (
+    'provider', 'instance_type', 'gpu_type', 'gpu_count', 'gpu_memory_gb',
+    'vcpus', 'ram_gb', 'region', 'price_per_hour', 'is_spot', 'available',
+    'availability_zone', 'quality',
+)
+
+# Reconstructs every snapshot from intervals, with gpu_prices' columns in
+# gpu_prices' order, so row-oriented readers keep working unchanged.
+_INTERVAL_VIEW_SQL = """
+    CREATE VIEW gpu_prices AS
+    SELECT l.id AS id, s.timestamp AS timestamp,
+           l.provider, l.instance_type, l.gpu_type, l.gpu_count,
+           l.gpu_memory_gb, l.vcpus, l.ram_gb, l.region, l.price_per_hour,
+           l.is_spot, l.available, l.availability_zone, l.quality
+    FROM price_snapshots s
+    JOIN listing_intervals l
+      ON (l.valid_to IS NULL OR l.valid_to > s.timestamp)
+     AND l.valid_from <= s.timestamp
+"""
+
+# Text columns that star storage moves into integer-keyed dim_<name> tables.
+_STAR_DIMENSIONS = ('provider', 'instance_type', 'gpu_type', 'region', 'quality')
+
+_INSERT_FACT_SQL = """
+    INSERT OR REPLACE INTO price_facts (
+        timestamp, provider_id, instance_type_id, gpu_type_id, gpu_count,
+        gpu_memory_gb, vcpus, ram_gb, region_id, price_per_hour,
+        is_spot, available, availability_zone, quality_id
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_STAR_VIEW_SQL = """
+    CREATE VIEW gpu_prices AS
+    SELECT f.id AS id, f.timestamp AS timestamp,
+           p.value AS provider, it.value AS instance_type, g.value AS gpu_type,
+           f.gpu_count, f.gpu_memory_gb, f.vcpus, f.ram_gb, r.value AS region,
+           f.price_per_hour, f.is_spot, f.available, f.availability_zone,
+           q.value AS quality
+    FROM price_facts f
+    JOIN dim_provider p ON p.id = f.provider_id
+    JOIN dim_instance_type it ON it.id = f.instance_type_id
+    JOIN dim_gpu_type g ON g.id = f.gpu_type_id
+    JOIN dim_region r ON r.id = f.region_id
+    JOIN dim_quality q ON q.id = f.quality_id
+"""
+
+
+def _build_sketch(values: np.ndarray) -> Dict[str, int]:
+    """Bin counts of a price_rollups $/GPU-hr sketch (see price_sketch)."""
+    uniq, counts = np.unique(price_sketch.bin_indexes(values), return_counts=True)
+    return dict(zip(map(str, uniq.tolist()), counts.tolist()))
+
+
+def _sketch_quantile(sketches: Iterable[Dict[str, int]], q: float) -> Optional[float]:
+    """Approximate q-quantile (0..1) of the values behind merged sketches."""
+    merged = Counter()
+    for sketch in sketches:
+        # Rollups written before the sentinel bins counted values <= 0 as 'zero'.
+        merged.update({price_sketch.ZERO_BIN if k == 'zero' else int(k): n
+                       for k, n in sketch.items()})
+    return price_sketch.quantile(merged, q)
+
+
+def shard_path(db_path: Union[str, Path], timestamp) -> Path:
+    """File holding `timestamp`'s rows when `db_path` uses sharded storage.
+
+    Shards live next to the main file, one per calendar month:
+    data/gpu_prices.db -> data/gpu_prices_shards/2025-01.db.
+    """
+    db_path = Path(db_path)
+    return db_path.parent / f"{db_path.stem}_shards" / f"{_shard_month(timestamp)}.db"
+
+
+def _shard_month(timestamp) -> str:
+    """'YYYY-MM' of a datetime or a stored timestamp string."""
+    return str(timestamp)[:7]
+
+
+@dataclass
+class IngestResult:
+    """Outcome of a bulk ingest: new rows vs. rows that replaced an existing key."""
+
+    inserted: int
+    replaced: int
+
+    @property
+    def total(self) -> int:
+        return self.inserted + self.replaced
 
 
 class PriceDatabase:
     """SQLite database for storing historical GPU pricing data."""
     
-    def __init__(self, db_path: str = "data/gpu_prices.db"):
+    def __init__(
+        self,
+        db_path: str = "data/gpu_prices.db",
+        batch_size: int = 5000,
+        journal_mode: Optional[str] = None,
+        synchronous: Optional[str] = None,
+    ):
         """
         Initialize the database.
         
         Args:
             db_path: Path to SQLite database file
+            batch_size: Default rows per executemany call in ingest_prices
+            journal_mode: Optional PRAGMA journal_mode (e.g. 'WAL')
+            synchronous: Optional PRAGMA synchronous (e.g. 'NORMAL')
         """
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self._local = threading.local()
+        self._conns: List[sqlite3.Connection] = []
+        self._conns_lock = threading.Lock()
         self._init_db()
+        self.storage = self._get_meta('storage', STORAGE_ROWS)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's long-lived connection, opening it on first use.
+
+        Each thread gets its own connection (SQLite connections must not be
+        shared across threads mid-statement), so threaded callers get a small
+        per-thread pool for free. All of them are closed by `close()`.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        # PRAGMA values can't be bound as parameters; only allow plain words.
+        if self.journal_mode and self.journal_mode.isalpha():
+            conn.execute(f"PRAGMA journal_mode={self.journal_mode}")
+        if self.synchronous and self.synchronous.isalpha():
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        self._local.conn = conn
+        with self._conns_lock:
+            self._conns.append(conn)
+        return conn
+
+    def close(self):
+        """Close every connection this database has opened."""
+        with self._conns_lock:
+            conns, self._conns = self._conns, []
+        for conn in conns:
+            conn.close()
+        self._local = threading.local()
+
+    def __enter__(self) -> "PriceDatabase":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
     
     def _init_db(self):
-        """Initialize database schema."""
-        conn = sqlite3.connect(self.db_path)
+        """Initialize or upgrade the database schema.
+
+        The schema version is stored in `PRAGMA user_version`. Pending entries
+        of `_MIGRATIONS` run once, in order, inside one transaction; opening an
+        up-to-date database costs a single PRAGMA read and no DDL.
+        """
+        conn = self._connect()
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+            return
+
         cursor = conn.cursor()
-        
+        try:
+            # Re-read under the write lock: another process may have migrated
+            # the file between the check above and acquiring the lock.
+            cursor.execute("BEGIN IMMEDIATE")
+            version = cursor.execute("PRAGMA user_version").fetchone()[0]
+            for target in range(version + 1, SCHEMA_VERSION + 1):
+                self._MIGRATIONS[target - 1](self, cursor)
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def _migrate_v1(self, cursor):
+        """Baseline schema: gpu_prices, its indexes, and price_snapshots.
+
+        Also upgrades files created before schema versioning existed (which
+        report user_version 0), so every statement here is idempotent.
+        """
         # Create prices table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS gpu_prices (
@@ -102,37 +329,275 @@ class PriceDatabase:
                 metadata TEXT
             )
         """)
-        
-        conn.commit()
-        conn.close()
+
+    def _migrate_v2(self, cursor):
+        """Per-run pipeline metrics written by instrumentation.RunMetrics."""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS collection_runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                run_id TEXT NOT NULL UNIQUE,
+                run_type TEXT NOT NULL,
+                started_at TIMESTAMP NOT NULL,
+                finished_at TIMESTAMP,
+                snapshot_timestamp TIMESTAMP,
+                total_seconds REAL,
+                peak_rss_mb REAL,
+                rows_stored INTEGER,
+                bytes_written INTEGER,
+                stages TEXT
+            )
+        """)
+
+    def _migrate_v3(self, cursor):
+        """Key/value metadata and the interval-encoded listing table.
+
+        listing_intervals stays empty until a database is switched to
+        interval storage with `convert_to_intervals`.
+        """
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS db_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS listing_intervals (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                provider TEXT NOT NULL,
+                instance_type TEXT NOT NULL,
+                region TEXT NOT NULL,
+                is_spot BOOLEAN NOT NULL DEFAULT 0,
+                gpu_type TEXT NOT NULL,
+                gpu_count INTEGER NOT NULL,
+                gpu_memory_gb INTEGER,
+                vcpus INTEGER NOT NULL,
+                ram_gb REAL NOT NULL,
+                price_per_hour REAL NOT NULL,
+                available BOOLEAN,
+                availability_zone TEXT,
+                quality TEXT NOT NULL DEFAULT 'ok',
+                valid_from TIMESTAMP NOT NULL,
+                valid_to TIMESTAMP
+            )
+        """)
+        # Open-interval lookup by listing key (ingest, history)...
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_intervals_key
+            ON listing_intervals(provider, instance_type, region, is_spot, valid_to)
+        """)
+        # ...and point-in-time reconstruction (the gpu_prices view).
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_intervals_valid
+            ON listing_intervals(valid_to, valid_from)
+        """)
+
+    def _migrate_v4(self, cursor):
+        """Dimension tables and the slim fact table for star storage.
+
+        Like listing_intervals these stay empty until a database is
+        switched over, here with `convert_to_star`.
+        """
+        for dim in _STAR_DIMENSIONS:
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS dim_{dim} (
+                    id INTEGER PRIMARY KEY,
+                    value TEXT NOT NULL UNIQUE
+                )
+            """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS price_facts (
+                id INTEGER PRIMARY KEY,
+                timestamp TIMESTAMP NOT NULL,
+                provider_id INTEGER NOT NULL,
+                instance_type_id INTEGER NOT NULL,
+                gpu_type_id INTEGER NOT NULL,
+                gpu_count INTEGER NOT NULL,
+                gpu_memory_gb INTEGER,
+                vcpus INTEGER NOT NULL,
+                ram_gb REAL NOT NULL,
+                region_id INTEGER NOT NULL,
+                price_per_hour REAL NOT NULL,
+                is_spot BOOLEAN NOT NULL DEFAULT 0,
+                available BOOLEAN,
+                availability_zone TEXT,
+                quality_id INTEGER NOT NULL,
+                UNIQUE(timestamp, provider_id, instance_type_id, region_id, is_spot)
+            )
+        """)
+        # The UNIQUE index leads with timestamp, which serves MAX(timestamp)
+        # and per-snapshot reads; these two serve history and trends.
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_facts_listing
+            ON price_facts(instance_type_id, provider_id, region_id, timestamp)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_facts_gpu_type
+            ON price_facts(gpu_type_id, timestamp)
+        """)
+
+    def _migrate_v5(self, cursor):
+        """Per-snapshot rollups, backfilled for every stored snapshot."""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS price_rollups (
+                timestamp TIMESTAMP NOT NULL,
+                gpu_type TEXT NOT NULL,
+                provider TEXT NOT NULL,
+                is_spot BOOLEAN NOT NULL,
+                instance_count INTEGER NOT NULL,
+                price_min REAL NOT NULL,
+                price_max REAL NOT NULL,
+                price_sum REAL NOT NULL,
+                price_sumsq REAL NOT NULL,
+                per_gpu_min REAL NOT NULL,
+                per_gpu_max REAL NOT NULL,
+                per_gpu_sum REAL NOT NULL,
+                per_gpu_sketch TEXT NOT NULL,
+                PRIMARY KEY (timestamp, gpu_type, provider, is_spot)
+            )
+        """)
+        timestamps = [r[0] for r in cursor.execute(
+            "SELECT DISTINCT timestamp FROM gpu_prices"
+        ).fetchall()]
+        for ts in timestamps:
+            self._update_rollups(cursor, ts)
+
+    def _migrate_v6(self, cursor):
+        """Indexes matched to the read paths' query shapes.
+
+        Replaces gpu_prices' single-column indexes: the UNIQUE snapshot-key
+        index already leads with timestamp (MAX(timestamp), per-snapshot
+        reads), and no query filters on gpu_type or region alone since
+        trends moved to price_rollups.
+        """
+        cursor.execute("SELECT type FROM sqlite_master WHERE name = 'gpu_prices'")
+        if cursor.fetchone()[0] == 'table':
+            for name in ('idx_timestamp', 'idx_provider_instance', 'idx_gpu_type', 'idx_region'):
+                cursor.execute(f"DROP INDEX IF EXISTS {name}")
+            self._create_row_indexes(cursor)
+        # Star history: same shape as idx_history, on integer keys.
+        cursor.execute("DROP INDEX IF EXISTS idx_facts_listing")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_facts_history
+            ON price_facts(instance_type_id, provider_id, region_id, timestamp,
+                           price_per_hour, available)
+        """)
+        # Trends filtered by GPU type (and provider); unfiltered or
+        # provider-only trends range-scan the primary key on timestamp.
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_rollups_group
+            ON price_rollups(gpu_type, provider, timestamp)
+        """)
+
+    @staticmethod
+    def _create_row_indexes(cursor):
+        """Secondary indexes on a gpu_prices table (row and clustered storage)."""
+        # get_price_history: equality on the listing, range and order on
+        # timestamp, and the selected columns, so it never reads the table.
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_history
+            ON gpu_prices(provider, instance_type, region, timestamp,
+                          price_per_hour, available)
+        """)
+
+    def _migrate_v7(self, cursor):
+        """Make price_snapshots the authoritative snapshot catalog.
+
+        Adds status and parquet_emitted, and recomputes every snapshot's
+        summary from price_rollups so total_instances is the stored row
+        count (it used to be the number of rows passed in, duplicates
+        included) and snapshots missing from the catalog are added.
+        """
+        cursor.execute(
+            f"ALTER TABLE price_snapshots ADD COLUMN status TEXT NOT NULL "
+            f"DEFAULT '{SNAPSHOT_COMPLETE}'"
+        )
+        cursor.execute(
+            "ALTER TABLE price_snapshots ADD COLUMN parquet_emitted BOOLEAN NOT NULL DEFAULT 0"
+        )
+        timestamps = [r[0] for r in cursor.execute(
+            "SELECT DISTINCT timestamp FROM price_rollups"
+        ).fetchall()]
+        for ts in timestamps:
+            self._store_snapshot(cursor, ts, SNAPSHOT_COMPLETE)
+
+    def _migrate_v8(self, cursor):
+        """Write-time get_stats cache: scalars in db_meta, distinct sets here."""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stats_distinct (
+                kind TEXT NOT NULL,
+                value TEXT NOT NULL,
+                PRIMARY KEY (kind, value)
+            ) WITHOUT ROWID
+        """)
+        self._rebuild_stats(cursor, *self._compute_stats(cursor))
+
+    # Indexed by target version - 1. Append new migrations; never edit old ones.
+    _MIGRATIONS = [_migrate_v1, _migrate_v2, _migrate_v3, _migrate_v4, _migrate_v5,
+                   _migrate_v6, _migrate_v7, _migrate_v8]
+
+    def _get_meta(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        row = self._connect().execute(
+            "SELECT value FROM db_meta WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else default
+
+    @staticmethod
+    def _set_meta(cursor, key: str, value: str):
+        cursor.execute(
+            "INSERT OR REPLACE INTO db_meta (key, value) VALUES (?, ?)", (key, value)
+        )
     
-    def store_prices(self, instances: List[GPUInstance], timestamp: Optional[datetime] = None) -> int:
+    def store_prices(self, instances: Union[List[GPUInstance], GPUInstanceBatch], timestamp: Optional[datetime] = None) -> int:
         """
         Store GPU pricing data in the database.
         
         Args:
-            instances: List of GPUInstance objects
+            instances: List of GPUInstance objects or a GPUInstanceBatch
             timestamp: Optional timestamp (defaults to now)
             
         Returns:
-            Number of records inserted
+            Number of new records inserted (rows that replaced an existing
+            record for the same snapshot key are not counted; see
+            `ingest_prices` for both counts)
+        """
+        return self.ingest_prices(instances, timestamp=timestamp).inserted
+
+    def ingest_prices(
+        self,
+        instances: Union[List[GPUInstance], GPUInstanceBatch],
+        timestamp: Optional[datetime] = None,
+        batch_size: Optional[int] = None,
+        status: str = SNAPSHOT_COMPLETE,
+    ) -> IngestResult:
+        """
+        Bulk-store GPU pricing data in a single transaction.
+
+        Rows are converted to parameter tuples up front and written with
+        `executemany` in chunks of `batch_size`, together with the snapshot
+        summary, inside one explicit transaction: a failure part-way through
+        leaves the database untouched.
+
+        Args:
+            instances: List of GPUInstance objects or a GPUInstanceBatch
+            timestamp: Optional timestamp (defaults to now)
+            batch_size: Rows per `executemany` call (defaults to the
+                database's `batch_size`)
+            status: Catalog status, SNAPSHOT_COMPLETE or SNAPSHOT_PARTIAL.
+                Merging into an existing snapshot keeps it complete if
+                either side was.
+
+        Returns:
+            IngestResult with exact inserted vs. replaced counts
         """
         if timestamp is None:
             timestamp = datetime.now()
-        
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        inserted = 0
-        for inst in instances:
-            try:
-                cursor.execute("""
-                    INSERT OR REPLACE INTO gpu_prices (
-                        timestamp, provider, instance_type, gpu_type, gpu_count,
-                        gpu_memory_gb, vcpus, ram_gb, region, price_per_hour,
-                        is_spot, available, availability_zone, quality
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
+        batch_size = batch_size or self.batch_size
+
+        if isinstance(instances, GPUInstanceBatch):
+            rows = self._batch_rows(instances, timestamp)
+        else:
+            rows = [
+                (
                     timestamp,
                     inst.provider,
                     inst.instance_type,
@@ -147,47 +612,851 @@ class PriceDatabase:
                     inst.available,
                     inst.availability_zone,
                     inst.quality,
-                ))
-                inserted += 1
-            except sqlite3.IntegrityError:
-                # Record already exists for this timestamp
-                pass
-        
-        # Store snapshot metadata
-        self._store_snapshot(cursor, timestamp, instances)
-        
+                )
+                for inst in instances
+            ]
+
+        metrics = instrumentation.active()
+        conn = self._connect()
+        cursor = conn.cursor()
+        price_table = 'gpu_prices'
+        if self.storage == STORAGE_SHARDED:
+            # ATTACH can't run inside a transaction, so open the shard first.
+            price_table = self._attach_shard(conn, timestamp, create=True)
+        try:
+            with metrics.stage("sqlite_insert", rows=len(rows)) as rec:
+                cursor.execute("BEGIN IMMEDIATE")
+                if self.storage == STORAGE_INTERVALS:
+                    inserted = self._ingest_intervals(cursor, rows, timestamp, batch_size)
+                else:
+                    if self.storage == STORAGE_STAR:
+                        table, sql = 'price_facts', _INSERT_FACT_SQL
+                        params = self._star_rows(cursor, rows)
+                    else:
+                        table, params = price_table, rows
+                        sql = _INSERT_PRICE_SQL.format(table=table)
+                    # Every row is written, so anything that did not grow the
+                    # snapshot's row count replaced an existing key (either a row
+                    # already in the DB or an earlier duplicate in this batch).
+                    before = self._count_snapshot_rows(cursor, timestamp, table)
+                    for start in range(0, len(params), batch_size):
+                        cursor.executemany(sql, params[start:start + batch_size])
+                    inserted = self._count_snapshot_rows(cursor, timestamp, table) - before
+                rec["inserted"] = inserted
+
+            with metrics.stage("rollups") as rec:
+                rec["groups"] = self._update_rollups(cursor, timestamp, price_table)
+
+            # Catalog entry, summarised from the rollups just written
+            with metrics.stage("snapshot_summary"):
+                count, providers, gpu_types = self._store_snapshot(cursor, timestamp, status)
+                self._update_stats(cursor, timestamp, count, inserted, providers, gpu_types)
+
+            with metrics.stage("sqlite_commit"):
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        return IngestResult(inserted=inserted, replaced=len(rows) - inserted)
+
+    def _ingest_intervals(self, cursor, rows: List[tuple], timestamp: datetime,
+                          batch_size: int) -> int:
+        """Apply one snapshot to listing_intervals. Returns rows it added.
+
+        Interval storage is append-only: a snapshot older than the latest
+        one is rejected. Re-ingesting the latest snapshot (e.g. a replay
+        after a normalisation fix) merges into it, matching row storage.
+        """
+        cursor.execute("SELECT MAX(timestamp) FROM price_snapshots")
+        latest = cursor.fetchone()[0]
+        ts = str(timestamp)
+        if latest is not None and ts < latest:
+            raise ValueError(
+                f"interval storage is append-only: snapshot {ts} is older "
+                f"than the latest stored snapshot {latest}"
+            )
+        self._reset_incoming(cursor)
+        if latest == ts:
+            # Start from the stored state so new rows replace matching
+            # listings and the rest carry over, as INSERT OR REPLACE does
+            # in row storage; then undo the snapshot and re-apply it.
+            cursor.execute(f"""
+                INSERT INTO temp._incoming ({', '.join(_INTERVAL_COLUMNS)})
+                SELECT {', '.join(_INTERVAL_COLUMNS)} FROM listing_intervals
+                WHERE valid_to IS NULL
+            """)
+            cursor.execute("DELETE FROM listing_intervals WHERE valid_from = ?", (ts,))
+            cursor.execute(
+                "UPDATE listing_intervals SET valid_to = NULL WHERE valid_to = ?", (ts,)
+            )
+        cursor.execute("SELECT COUNT(*) FROM temp._incoming")
+        before = cursor.fetchone()[0]
+
+        placeholders = ', '.join('?' * len(_INTERVAL_COLUMNS))
+        insert = (f"INSERT OR REPLACE INTO temp._incoming ({', '.join(_INTERVAL_COLUMNS)}) "
+                  f"VALUES ({placeholders})")
+        for start in range(0, len(rows), batch_size):
+            # Rows carry the snapshot timestamp first; _incoming has no such column.
+            cursor.executemany(insert, (r[1:] for r in rows[start:start + batch_size]))
+        self._advance_intervals(cursor, ts)
+        # The gpu_prices view enumerates snapshots from the catalog, so the
+        # entry must exist before rollups read it back; _store_snapshot
+        # fills in the summary. A new entry starts partial so the status
+        # passed to ingest_prices decides.
+        cursor.execute("""
+            INSERT OR IGNORE INTO price_snapshots (
+                timestamp, total_instances, providers_count, gpu_types_count,
+                min_price, max_price, avg_price, status
+            ) VALUES (?, 0, 0, 0, 0, 0, 0, ?)
+        """, (ts, SNAPSHOT_PARTIAL))
+        cursor.execute("SELECT COUNT(*) FROM temp._incoming")
+        return cursor.fetchone()[0] - before
+
+    @staticmethod
+    def _reset_incoming(cursor):
+        """Create or empty the per-connection staging table for one snapshot."""
+        cursor.execute(f"""
+            CREATE TEMP TABLE IF NOT EXISTS _incoming (
+                {', '.join(_INTERVAL_COLUMNS)},
+                PRIMARY KEY ({', '.join(_INTERVAL_KEY)})
+            )
+        """)
+        cursor.execute("DELETE FROM temp._incoming")
+
+    @staticmethod
+    def _advance_intervals(cursor, ts: str):
+        """Close and open intervals so temp._incoming is the state at `ts`."""
+        def match(cols, op, table):
+            return ' AND '.join(f"i.{c} {op} {table}.{c}" for c in cols)
+
+        # Listings that disappeared or changed: close at this snapshot.
+        # (No UPDATE alias: that needs SQLite 3.33+.)
+        cursor.execute(f"""
+            UPDATE listing_intervals SET valid_to = ?
+            WHERE valid_to IS NULL
+              AND NOT EXISTS (
+                  SELECT 1 FROM temp._incoming i
+                  WHERE {match(_INTERVAL_KEY, '=', 'listing_intervals')}
+                    AND {match(_INTERVAL_ATTRS, 'IS', 'listing_intervals')})
+        """, (ts,))
+        # Listings that are new or just changed: open a fresh interval.
+        cursor.execute(f"""
+            INSERT INTO listing_intervals ({', '.join(_INTERVAL_COLUMNS)}, valid_from)
+            SELECT {', '.join('i.' + c for c in _INTERVAL_COLUMNS)}, ?
+            FROM temp._incoming i
+            WHERE NOT EXISTS (SELECT 1 FROM listing_intervals l
+                              WHERE l.valid_to IS NULL AND {match(_INTERVAL_KEY, '=', 'l')})
+        """, (ts,))
+
+    @staticmethod
+    def _star_rows(cursor, rows: List[tuple]) -> List[tuple]:
+        """Map _INSERT_PRICE_SQL tuples to _INSERT_FACT_SQL tuples.
+
+        Values not yet in a dimension table are added to it first. IDs are
+        looked up per call rather than cached, so a rolled-back ingest
+        cannot leave stale IDs behind.
+        """
+        # Positions of the dimension columns in an _INSERT_PRICE_SQL tuple.
+        positions = {'provider': 1, 'instance_type': 2, 'gpu_type': 3,
+                     'region': 8, 'quality': 13}
+        rows = [list(r) for r in rows]
+        for dim in _STAR_DIMENSIONS:
+            pos = positions[dim]
+            values = {r[pos] for r in rows}
+            cursor.executemany(
+                f"INSERT OR IGNORE INTO dim_{dim} (value) VALUES (?)",
+                ((v,) for v in values),
+            )
+            ids = dict((v, i) for i, v in cursor.execute(f"SELECT id, value FROM dim_{dim}"))
+            for r in rows:
+                r[pos] = ids[r[pos]]
+        return [tuple(r) for r in rows]
+
+    def convert_to_intervals(self) -> int:
+        """
+        Switch this database from row (or star) storage to interval storage.
+
+        Replays every snapshot, oldest first, into listing_intervals, then
+        replaces the gpu_prices table with a view that reconstructs each
+        snapshot from the intervals. Snapshots present in gpu_prices but
+        missing from price_snapshots are added to it first, since the view
+        enumerates snapshots from there. Runs in one transaction; VACUUM
+        afterwards to reclaim the space.
+
+        Returns:
+            Number of intervals written (0 if already converted)
+        """
+        if self.storage == STORAGE_INTERVALS:
+            return 0
+        self._require_single_file()
+
+        conn = self._connect()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("""
+                INSERT OR IGNORE INTO price_snapshots (
+                    timestamp, total_instances, providers_count, gpu_types_count,
+                    min_price, max_price, avg_price, metadata
+                )
+                SELECT timestamp, COUNT(*), COUNT(DISTINCT provider),
+                       COUNT(DISTINCT gpu_type), MIN(price_per_hour),
+                       MAX(price_per_hour), AVG(price_per_hour), NULL
+                FROM gpu_prices GROUP BY timestamp
+            """)
+            cursor.execute("DELETE FROM listing_intervals")
+            snapshots = [r[0] for r in cursor.execute(
+                "SELECT timestamp FROM price_snapshots ORDER BY timestamp"
+            ).fetchall()]
+            for ts in snapshots:
+                self._reset_incoming(cursor)
+                cursor.execute(f"""
+                    INSERT OR REPLACE INTO temp._incoming ({', '.join(_INTERVAL_COLUMNS)})
+                    SELECT {', '.join(_INTERVAL_COLUMNS)} FROM gpu_prices
+                    WHERE timestamp = ?
+                """, (ts,))
+                self._advance_intervals(cursor, ts)
+
+            self._drop_gpu_prices(cursor)
+            cursor.execute(_INTERVAL_VIEW_SQL)
+            self._set_meta(cursor, 'storage', STORAGE_INTERVALS)
+            cursor.execute("SELECT COUNT(*) FROM listing_intervals")
+            written = cursor.fetchone()[0]
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        self.storage = STORAGE_INTERVALS
+        return written
+
+    def convert_to_star(self) -> int:
+        """
+        Switch this database from row (or interval) storage to star storage.
+
+        Fills the dim_* tables with every distinct provider, instance type,
+        GPU type, region and quality value, copies all rows into price_facts
+        as integer keys, then replaces gpu_prices with a view that joins
+        them back. Runs in one transaction; VACUUM afterwards to reclaim
+        the space.
+
+        Returns:
+            Number of fact rows written (0 if already converted)
+        """
+        if self.storage == STORAGE_STAR:
+            return 0
+        self._require_single_file()
+
+        conn = self._connect()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("DELETE FROM price_facts")
+            for dim in _STAR_DIMENSIONS:
+                cursor.execute(f"""
+                    INSERT OR IGNORE INTO dim_{dim} (value)
+                    SELECT DISTINCT {dim} FROM gpu_prices
+                """)
+            cursor.execute("""
+                INSERT INTO price_facts (
+                    timestamp, provider_id, instance_type_id, gpu_type_id, gpu_count,
+                    gpu_memory_gb, vcpus, ram_gb, region_id, price_per_hour,
+                    is_spot, available, availability_zone, quality_id
+                )
+                SELECT g.timestamp, p.id, it.id, gt.id, g.gpu_count,
+                       g.gpu_memory_gb, g.vcpus, g.ram_gb, r.id, g.price_per_hour,
+                       g.is_spot, g.available, g.availability_zone, q.id
+                FROM gpu_prices g
+                JOIN dim_provider p ON p.value = g.provider
+                JOIN dim_instance_type it ON it.value = g.instance_type
+                JOIN dim_gpu_type gt ON gt.value = g.gpu_type
+                JOIN dim_region r ON r.value = g.region
+                JOIN dim_quality q ON q.value = g.quality
+            """)
+            written = cursor.rowcount
+            self._drop_gpu_prices(cursor)
+            cursor.execute(_STAR_VIEW_SQL)
+            self._set_meta(cursor, 'storage', STORAGE_STAR)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        self.storage = STORAGE_STAR
+        return written
+
+    def convert_to_clustered(self) -> int:
+        """
+        Rebuild gpu_prices as a WITHOUT ROWID table clustered on its key.
+
+        The table is stored in (timestamp, provider, instance_type, region,
+        is_spot) order, so reading a snapshot is one contiguous range and
+        the separate UNIQUE index (a second copy of every key) goes away.
+        Otherwise it behaves exactly like row storage. The id column is
+        kept for SELECT * compatibility but is always NULL. Runs in one
+        transaction; VACUUM afterwards to reclaim the space.
+
+        Returns:
+            Number of rows written (0 if already converted)
+        """
+        if self.storage == STORAGE_CLUSTERED:
+            return 0
+        self._require_single_file()
+
+        conn = self._connect()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("""
+                CREATE TABLE gpu_prices_clustered (
+                    id INTEGER,
+                    timestamp TIMESTAMP NOT NULL,
+                    provider TEXT NOT NULL,
+                    instance_type TEXT NOT NULL,
+                    gpu_type TEXT NOT NULL,
+                    gpu_count INTEGER NOT NULL,
+                    gpu_memory_gb INTEGER,
+                    vcpus INTEGER NOT NULL,
+                    ram_gb REAL NOT NULL,
+                    region TEXT NOT NULL,
+                    price_per_hour REAL NOT NULL,
+                    is_spot BOOLEAN NOT NULL DEFAULT 0,
+                    available BOOLEAN,
+                    availability_zone TEXT,
+                    quality TEXT NOT NULL DEFAULT 'ok',
+                    PRIMARY KEY (timestamp, provider, instance_type, region, is_spot)
+                ) WITHOUT ROWID
+            """)
+            cursor.execute(f"""
+                INSERT OR REPLACE INTO gpu_prices_clustered ({', '.join(_INSERT_COLUMNS)})
+                SELECT {', '.join(_INSERT_COLUMNS)} FROM gpu_prices
+            """)
+            written = cursor.rowcount
+            self._drop_gpu_prices(cursor)
+            cursor.execute("ALTER TABLE gpu_prices_clustered RENAME TO gpu_prices")
+            self._create_row_indexes(cursor)
+            self._set_meta(cursor, 'storage', STORAGE_CLUSTERED)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        self.storage = STORAGE_CLUSTERED
+        return written
+
+    def split_into_shards(self) -> Dict[str, int]:
+        """
+        Move gpu_prices into one SQLite file per month (sharded storage).
+
+        Each month's rows are copied into `shard_path(db_path, month)` and
+        committed on their own, so an interrupted split can simply be run
+        again; gpu_prices is dropped from the main file only once every
+        month is copied. The catalog, rollups and stats stay in the main
+        file. VACUUM the main file afterwards to reclaim the space.
+
+        Returns:
+            Rows written per month ('YYYY-MM'), empty if already sharded
+        """
+        if self.storage == STORAGE_SHARDED:
+            return {}
+        if self.storage not in (STORAGE_ROWS, STORAGE_CLUSTERED):
+            raise ValueError(f"only row or clustered storage can be split, not {self.storage!r}")
+
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute("SELECT DISTINCT substr(timestamp, 1, 7) FROM price_snapshots ORDER BY 1")
+        months = [r[0] for r in cursor.fetchall()]
+
+        written = {}
+        for month in months:
+            table = self._attach_shard(conn, month, create=True)
+            year, mon = int(month[:4]), int(month[5:7])
+            next_month = f"{year + mon // 12:04d}-{mon % 12 + 1:02d}"
+            try:
+                cursor.execute("BEGIN IMMEDIATE")
+                cursor.execute(f"""
+                    INSERT OR REPLACE INTO {table} ({', '.join(_INSERT_COLUMNS)})
+                    SELECT {', '.join(_INSERT_COLUMNS)} FROM main.gpu_prices
+                    WHERE timestamp >= ? AND timestamp < ?
+                """, (month, next_month))
+                written[month] = cursor.rowcount
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("DROP TABLE main.gpu_prices")
+            self._set_meta(cursor, 'storage', STORAGE_SHARDED)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        self.storage = STORAGE_SHARDED
+        return written
+
+    def _require_single_file(self):
+        if self.storage == STORAGE_SHARDED:
+            raise ValueError("sharded storage can't be converted to another layout")
+
+    def _shard_months(self, since=None) -> List[str]:
+        """Months ('YYYY-MM') that have a shard file, oldest first.
+
+        With `since`, only months from the one containing it onwards: the
+        shards a query bounded below by `since` has to read. A shard moved
+        out of the directory (e.g. archived) is simply not read.
+        """
+        shard_dir = shard_path(self.db_path, '0000-00').parent
+        if not shard_dir.is_dir():
+            return []
+        months = sorted(
+            p.stem for p in shard_dir.glob('[0-9][0-9][0-9][0-9]-[0-9][0-9].db')
+        )
+        if since is not None:
+            months = [m for m in months if m >= _shard_month(since)]
+        return months
+
+    def _attach_shard(self, conn: sqlite3.Connection, timestamp,
+                      create: bool = False) -> Optional[str]:
+        """
+        ATTACH the shard holding `timestamp`'s month on this connection.
+
+        Attached shards stay attached for reuse; past _MAX_ATTACHED_SHARDS
+        the least recently used one is detached. Must not be called inside
+        a transaction.
+
+        Args:
+            conn: This thread's connection
+            timestamp: Any timestamp in the month, or 'YYYY-MM'
+            create: Create the shard file and its schema if missing
+
+        Returns:
+            Schema-qualified gpu_prices table of the shard, or None if the
+            shard does not exist and `create` is False
+        """
+        month = _shard_month(timestamp)
+        alias = f"shard_{month.replace('-', '_')}"
+        attached = getattr(self._local, 'shards', None)
+        if attached is None:
+            attached = self._local.shards = OrderedDict()
+        if month in attached:
+            attached.move_to_end(month)
+            return f"{alias}.gpu_prices"
+
+        path = shard_path(self.db_path, month)
+        if not path.exists():
+            if not create:
+                return None
+            path.parent.mkdir(parents=True, exist_ok=True)
+        while len(attached) >= _MAX_ATTACHED_SHARDS:
+            _, old_alias = attached.popitem(last=False)
+            conn.execute(f"DETACH DATABASE {old_alias}")
+        conn.execute(f"ATTACH DATABASE ? AS {alias}", (str(path),))
+        attached[month] = alias
+        if create:
+            self._create_shard_schema(conn, alias)
+        return f"{alias}.gpu_prices"
+
+    @staticmethod
+    def _create_shard_schema(conn: sqlite3.Connection, alias: str):
+        """gpu_prices and its indexes in an attached shard (row storage layout)."""
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {alias}.gpu_prices (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TIMESTAMP NOT NULL,
+                provider TEXT NOT NULL,
+                instance_type TEXT NOT NULL,
+                gpu_type TEXT NOT NULL,
+                gpu_count INTEGER NOT NULL,
+                gpu_memory_gb INTEGER,
+                vcpus INTEGER NOT NULL,
+                ram_gb REAL NOT NULL,
+                region TEXT NOT NULL,
+                price_per_hour REAL NOT NULL,
+                is_spot BOOLEAN NOT NULL DEFAULT 0,
+                available BOOLEAN,
+                availability_zone TEXT,
+                quality TEXT NOT NULL DEFAULT 'ok',
+                UNIQUE(timestamp, provider, instance_type, region, is_spot)
+            )
+        """)
+        conn.execute(f"""
+            CREATE INDEX IF NOT EXISTS {alias}.idx_history
+            ON gpu_prices(provider, instance_type, region, timestamp,
+                          price_per_hour, available)
+        """)
+
+    def _price_tables(self, conn: sqlite3.Connection) -> Iterator[str]:
+        """Every table holding price rows, attaching shards one at a time."""
+        if self.storage != STORAGE_SHARDED:
+            yield 'gpu_prices'
+            return
+        for month in self._shard_months():
+            yield self._attach_shard(conn, month)
+
+    def _drop_gpu_prices(self, cursor):
+        """Drop gpu_prices and empty whatever backs it in the current mode."""
+        if self.storage in (STORAGE_ROWS, STORAGE_CLUSTERED):
+            cursor.execute("DROP TABLE gpu_prices")
+            return
+        cursor.execute("DROP VIEW gpu_prices")
+        if self.storage == STORAGE_INTERVALS:
+            cursor.execute("DELETE FROM listing_intervals")
+        elif self.storage == STORAGE_STAR:
+            cursor.execute("DELETE FROM price_facts")
+
+    def record_run(self, run: "instrumentation.RunMetrics") -> None:
+        """Append a finished run's metrics to the collection_runs table."""
+        data = run.to_dict()
+        conn = self._connect()
+        conn.execute("""
+            INSERT OR REPLACE INTO collection_runs (
+                run_id, run_type, started_at, finished_at, snapshot_timestamp,
+                total_seconds, peak_rss_mb, rows_stored, bytes_written, stages
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            data['run_id'],
+            data['run_type'],
+            data['started_at'],
+            data['finished_at'],
+            data['snapshot_timestamp'],
+            data['total_seconds'],
+            data['peak_rss_mb'],
+            data['rows_stored'],
+            data['bytes_written'],
+            json.dumps(data['stages'], default=str),
+        ))
         conn.commit()
-        conn.close()
-        
-        return inserted
+
+    @staticmethod
+    def _count_snapshot_rows(cursor, timestamp: datetime, table: str = 'gpu_prices') -> int:
+        """Number of rows stored under one snapshot timestamp."""
+        cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE timestamp = ?", (timestamp,))
+        return cursor.fetchone()[0]
     
-    def _store_snapshot(self, cursor, timestamp: datetime, instances: List[GPUInstance]):
-        """Store summary snapshot."""
-        providers = set(i.provider for i in instances)
-        gpu_types = set(i.gpu_type for i in instances)
-        prices = [i.price_per_hour for i in instances]
+    @staticmethod
+    def _batch_rows(batch: GPUInstanceBatch, timestamp: datetime) -> List[tuple]:
+        """Parameter tuples for _INSERT_PRICE_SQL from a columnar batch."""
+        # tolist() yields Python scalars, which sqlite3 can bind (NumPy
+        # integer and bool scalars it cannot).
+        memory = [None if m != m else int(m) for m in batch.gpu_memory_gb.tolist()]
+        available = [None if a < 0 else bool(a) for a in batch.available.tolist()]
+        return list(zip(
+            [timestamp] * len(batch),
+            batch.column('provider').tolist(),
+            batch.instance_type.tolist(),
+            batch.column('gpu_type').tolist(),
+            batch.gpu_count.tolist(),
+            memory,
+            batch.vcpus.tolist(),
+            batch.ram_gb.tolist(),
+            batch.column('region').tolist(),
+            batch.price_per_hour.tolist(),
+            batch.is_spot.tolist(),
+            available,
+            batch.availability_zone.tolist(),
+            batch.column('quality').tolist(),
+        ))
+
+    @staticmethod
+    def _store_snapshot(cursor, timestamp, status: str):
+        """Upsert a snapshot's catalog entry from its price_rollups rows.
+
+        The row id is stable across re-ingests (upsert, not replace). A
+        re-ingest clears parquet_emitted, since any emitted file is stale.
+        """
+        cursor.execute("""
+            SELECT COALESCE(SUM(instance_count), 0), COALESCE(MIN(price_min), 0),
+                   COALESCE(MAX(price_max), 0), COALESCE(SUM(price_sum), 0)
+            FROM price_rollups WHERE timestamp = ?
+        """, (timestamp,))
+        count, min_price, max_price, price_sum = cursor.fetchone()
+        cursor.execute(
+            "SELECT DISTINCT provider FROM price_rollups WHERE timestamp = ?", (timestamp,)
+        )
+        providers = sorted(r[0] for r in cursor.fetchall())
+        cursor.execute(
+            "SELECT DISTINCT gpu_type FROM price_rollups WHERE timestamp = ?", (timestamp,)
+        )
+        gpu_types = sorted(r[0] for r in cursor.fetchall())
         
         metadata = {
-            'providers': list(providers),
-            'gpu_types': list(gpu_types)
+            'providers': providers,
+            'gpu_types': gpu_types
         }
         
-        cursor.execute("""
-            INSERT OR REPLACE INTO price_snapshots (
+        cursor.execute(f"""
+            INSERT INTO price_snapshots (
                 timestamp, total_instances, providers_count, gpu_types_count,
-                min_price, max_price, avg_price, metadata
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                min_price, max_price, avg_price, metadata, status, parquet_emitted
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0)
+            ON CONFLICT(timestamp) DO UPDATE SET
+                total_instances = excluded.total_instances,
+                providers_count = excluded.providers_count,
+                gpu_types_count = excluded.gpu_types_count,
+                min_price = excluded.min_price,
+                max_price = excluded.max_price,
+                avg_price = excluded.avg_price,
+                metadata = excluded.metadata,
+                status = CASE WHEN '{SNAPSHOT_COMPLETE}' IN (status, excluded.status)
+                              THEN '{SNAPSHOT_COMPLETE}' ELSE excluded.status END,
+                parquet_emitted = 0
         """, (
             timestamp,
-            len(instances),
+            count,
             len(providers),
             len(gpu_types),
-            min(prices) if prices else 0,
-            max(prices) if prices else 0,
-            sum(prices) / len(prices) if prices else 0,
-            json.dumps(metadata)
+            min_price,
+            max_price,
+            price_sum / count if count else 0,
+            json.dumps(metadata),
+            status,
         ))
+        return count, providers, gpu_types
+
+    @classmethod
+    def _update_stats(cls, cursor, timestamp, count: int, inserted: int,
+                      providers: List[str], gpu_types: List[str]):
+        """Fold one ingest into the cached get_stats values.
+
+        `count` is the snapshot's row count after the ingest and `inserted`
+        how much it grew, so a snapshot is new to the stats when it had no
+        rows before. Rows are never deleted by ingest, so the distinct sets
+        only grow.
+        """
+        stats = cls._read_stats(cursor)
+        stats['total_records'] += inserted
+        if count and count == inserted:
+            stats['snapshots'] += 1
+        if count:
+            ts = str(timestamp)
+            if stats['first_snapshot'] is None or ts < stats['first_snapshot']:
+                stats['first_snapshot'] = ts
+            if stats['last_snapshot'] is None or ts > stats['last_snapshot']:
+                stats['last_snapshot'] = ts
+        for kind, values in (('providers', providers), ('gpu_types', gpu_types)):
+            cursor.executemany(
+                "INSERT OR IGNORE INTO stats_distinct (kind, value) VALUES (?, ?)",
+                ((kind, v) for v in values),
+            )
+            # executemany's rowcount is the total over all statements.
+            stats[kind] += max(cursor.rowcount, 0)
+        cls._write_stats(cursor, stats)
+
+    @staticmethod
+    def _read_stats(cursor) -> Dict[str, Any]:
+        """Cached get_stats values from db_meta (a few primary-key reads)."""
+        cursor.execute(
+            f"SELECT key, value FROM db_meta WHERE key IN "
+            f"({', '.join('?' * len(_STATS_KEYS))})",
+            [f"stats.{k}" for k in _STATS_KEYS],
+        )
+        found = {key[len('stats.'):]: value for key, value in cursor.fetchall()}
+        return {
+            k: (found.get(k) if k in ('first_snapshot', 'last_snapshot')
+                else int(found.get(k) or 0))
+            for k in _STATS_KEYS
+        }
+
+    @classmethod
+    def _write_stats(cls, cursor, stats: Dict[str, Any]):
+        cursor.executemany(
+            "INSERT OR REPLACE INTO db_meta (key, value) VALUES (?, ?)",
+            ((f"stats.{k}", None if stats[k] is None else str(stats[k])) for k in _STATS_KEYS),
+        )
+
+    @staticmethod
+    def _compute_stats(cursor, tables: Iterable[str] = ('gpu_prices',)) -> tuple:
+        """get_stats values recomputed from the price rows (full scans).
+
+        Args:
+            tables: Tables holding the rows; shards each hold whole snapshots
+
+        Returns:
+            (stats dict, {'providers': set, 'gpu_types': set})
+        """
+        first = last = None
+        snapshots = total = 0
+        distinct = {'providers': set(), 'gpu_types': set()}
+        for table in tables:
+            cursor.execute(
+                "SELECT MIN(timestamp), MAX(timestamp), COUNT(DISTINCT timestamp), COUNT(*) "
+                f"FROM {table}"
+            )
+            lo, hi, count, rows = cursor.fetchone()
+            if lo is not None:
+                first = lo if first is None else min(first, lo)
+                last = hi if last is None else max(last, hi)
+            snapshots += count
+            total += rows
+            for kind, column in (('providers', 'provider'), ('gpu_types', 'gpu_type')):
+                cursor.execute(f"SELECT DISTINCT {column} FROM {table} WHERE {column} IS NOT NULL")
+                distinct[kind].update(r[0] for r in cursor.fetchall())
+        stats = {
+            'total_records': total,
+            'snapshots': snapshots,
+            'first_snapshot': first,
+            'last_snapshot': last,
+            'providers': len(distinct['providers']),
+            'gpu_types': len(distinct['gpu_types']),
+        }
+        return stats, distinct
+
+    @classmethod
+    def _rebuild_stats(cls, cursor, stats: Dict[str, Any], distinct: Dict[str, set]):
+        """Replace the cache (db_meta values and stats_distinct) wholesale."""
+        cursor.execute("DELETE FROM stats_distinct")
+        for kind, values in distinct.items():
+            cursor.executemany(
+                "INSERT INTO stats_distinct (kind, value) VALUES (?, ?)",
+                ((kind, v) for v in values),
+            )
+        cls._write_stats(cursor, stats)
+
+    def verify_stats(self, repair: bool = False) -> Dict[str, tuple]:
+        """
+        Recompute get_stats from scratch and compare with the cache.
+
+        Args:
+            repair: Overwrite the cache with the recomputed values
+
+        Returns:
+            {key: (cached, actual)} for every value that drifted (empty if
+            the cache is exact)
+        """
+        conn = self._connect()
+        cursor = conn.cursor()
+        try:
+            if self.storage == STORAGE_SHARDED:
+                # Shards are attached one by one, which a transaction forbids;
+                # only the comparison and repair below are transactional.
+                actual, distinct = self._compute_stats(cursor, self._price_tables(conn))
+                cursor.execute("BEGIN IMMEDIATE" if repair else "BEGIN")
+            else:
+                cursor.execute("BEGIN IMMEDIATE" if repair else "BEGIN")
+                actual, distinct = self._compute_stats(cursor)
+            cached = self._read_stats(cursor)
+            if repair:
+                self._rebuild_stats(cursor, actual, distinct)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return {k: (cached[k], actual[k]) for k in _STATS_KEYS if cached[k] != actual[k]}
+
+    def mark_parquet_emitted(self, timestamps: Iterable[str]) -> None:
+        """Flag snapshots whose Parquet file has been written."""
+        conn = self._connect()
+        conn.executemany(
+            "UPDATE price_snapshots SET parquet_emitted = 1 WHERE timestamp = ?",
+            ((ts,) for ts in timestamps),
+        )
+        conn.commit()
+
+    def list_snapshots(
+        self,
+        status: Optional[str] = None,
+        parquet_emitted: Optional[bool] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Read the snapshot catalog, newest first.
+
+        Args:
+            status: Only snapshots with this status
+            parquet_emitted: Only snapshots with (True) or without (False)
+                an emitted Parquet file
+            limit: At most this many snapshots
+
+        Returns:
+            List of dicts with id, timestamp, row_count, providers, status
+            and parquet_emitted
+        """
+        query = """
+            SELECT id, timestamp, total_instances, metadata, status, parquet_emitted
+            FROM price_snapshots WHERE 1 = 1
+        """
+        params: list = []
+        if status is not None:
+            query += " AND status = ?"
+            params.append(status)
+        if parquet_emitted is not None:
+            query += " AND parquet_emitted = ?"
+            params.append(int(parquet_emitted))
+        query += " ORDER BY timestamp DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        rows = self._connect().execute(query, params).fetchall()
+        return [
+            {
+                'id': row[0],
+                'timestamp': row[1],
+                'row_count': row[2],
+                'providers': json.loads(row[3]).get('providers', []) if row[3] else [],
+                'status': row[4],
+                'parquet_emitted': bool(row[5]),
+            }
+            for row in rows
+        ]
     
+    @staticmethod
+    def _update_rollups(cursor, timestamp, table: str = 'gpu_prices') -> int:
+        """Recompute one snapshot's price_rollups rows from gpu_prices.
+
+        Reads the stored snapshot rather than the incoming rows, so a
+        re-ingest that merges into an existing snapshot is summarised in
+        full, and works the same in every storage mode.
+
+        Args:
+            table: gpu_prices, or the snapshot's shard in sharded storage
+
+        Returns:
+            Number of (gpu_type, provider, is_spot) groups written
+        """
+        cursor.execute("DELETE FROM price_rollups WHERE timestamp = ?", (timestamp,))
+        cursor.execute(f"""
+            SELECT gpu_type, provider, is_spot, price_per_hour, gpu_count
+            FROM {table} WHERE timestamp = ?
+        """, (timestamp,))
+        groups = defaultdict(list)
+        for gpu_type, provider, is_spot, price, gpu_count in cursor.fetchall():
+            groups[(gpu_type, provider, int(bool(is_spot)))].append((price, gpu_count))
+
+        rows = []
+        for (gpu_type, provider, is_spot), values in groups.items():
+            values = np.asarray(values, dtype=np.float64)
+            prices, gpu_counts = values[:, 0], values[:, 1]
+            # Same definition as GPUInstance.price_per_gpu_hour.
+            per_gpu = np.zeros(len(prices))
+            np.divide(prices, gpu_counts, out=per_gpu, where=gpu_counts > 0)
+            rows.append((
+                timestamp, gpu_type, provider, is_spot, len(prices),
+                float(prices.min()), float(prices.max()),
+                float(prices.sum()), float((prices * prices).sum()),
+                float(per_gpu.min()), float(per_gpu.max()), float(per_gpu.sum()),
+                json.dumps(_build_sketch(per_gpu)),
+            ))
+        cursor.executemany("""
+            INSERT INTO price_rollups (
+                timestamp, gpu_type, provider, is_spot, instance_count,
+                price_min, price_max, price_sum, price_sumsq,
+                per_gpu_min, per_gpu_max, per_gpu_sum, per_gpu_sketch
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        return len(rows)
+
+    @staticmethod
+    def _latest_timestamp(cursor) -> Optional[str]:
+        """Timestamp of the most recent snapshot, or None if there is none."""
+        # One probe of the catalog's timestamp index, in every storage mode.
+        cursor.execute("SELECT MAX(timestamp) FROM price_snapshots")
+        return cursor.fetchone()[0]
+
     def get_latest_prices(self, provider: Optional[str] = None) -> List[GPUInstance]:
         """
         Get the most recent prices.
@@ -198,30 +1467,120 @@ class PriceDatabase:
         Returns:
             List of GPUInstance objects
         """
-        conn = sqlite3.connect(self.db_path)
+        return list(self.iter_latest_prices(provider))
+    
+    def iter_latest_prices(
+        self,
+        provider: Optional[str] = None,
+        chunk_size: Optional[int] = None,
+    ) -> Iterator[GPUInstance]:
+        """
+        Stream the most recent prices, fetching `chunk_size` rows at a time.
+
+        Args:
+            provider: Optional provider filter
+            chunk_size: Rows per fetch (defaults to the database's `batch_size`)
+
+        Yields:
+            GPUInstance objects
+        """
+        for rows in self._latest_chunks("*", provider, chunk_size):
+            for row in rows:
+                yield self._row_to_instance(row)
+
+    def iter_latest_batches(
+        self,
+        provider: Optional[str] = None,
+        chunk_size: Optional[int] = None,
+    ) -> Iterator[GPUInstanceBatch]:
+        """
+        Stream the most recent prices as columnar batches.
+
+        Each batch is dictionary-encoded on its own, so category codes are
+        not comparable across batches; group on the decoded values.
+
+        Args:
+            provider: Optional provider filter
+            chunk_size: Rows per batch (defaults to the database's `batch_size`)
+
+        Yields:
+            GPUInstanceBatch of at most `chunk_size` rows
+        """
+        for rows in self._latest_chunks(_BATCH_SELECT, provider, chunk_size):
+            yield GPUInstanceBatch.from_rows(rows)
+
+    def iter_latest_record_batches(
+        self,
+        provider: Optional[str] = None,
+        chunk_size: Optional[int] = None,
+    ) -> Iterator['pyarrow.RecordBatch']:
+        """
+        Stream the most recent prices as Arrow record batches (needs pyarrow).
+
+        Columns match `GPUInstanceBatch.to_arrow()`.
+
+        Args:
+            provider: Optional provider filter
+            chunk_size: Rows per batch (defaults to the database's `batch_size`)
+
+        Yields:
+            pyarrow.RecordBatch of at most `chunk_size` rows
+        """
+        for batch in self.iter_latest_batches(provider, chunk_size):
+            yield from batch.to_arrow().to_batches()
+
+    def _latest_chunks(self, columns: str, provider: Optional[str],
+                       chunk_size: Optional[int]) -> Iterator[list]:
+        """Row chunks of the latest snapshot, selecting `columns`."""
+        conn = self._connect()
         cursor = conn.cursor()
-        
-        # Get latest timestamp
-        cursor.execute("SELECT MAX(timestamp) FROM gpu_prices")
-        latest_timestamp = cursor.fetchone()[0]
-        
+
+        latest_timestamp = self._latest_timestamp(cursor)
+
         if not latest_timestamp:
-            conn.close()
-            return []
-        
-        # Get prices for latest timestamp
-        query = "SELECT * FROM gpu_prices WHERE timestamp = ?"
+            return
+
+        table = 'gpu_prices'
+        if self.storage == STORAGE_SHARDED:
+            table = self._attach_shard(conn, latest_timestamp)
+            if table is None:
+                return
+
+        query = f"SELECT {columns} FROM {table} WHERE timestamp = ?"
         params = [latest_timestamp]
-        
+
         if provider:
             query += " AND provider = ?"
             params.append(provider)
-        
+
         cursor.execute(query, params)
-        rows = cursor.fetchall()
-        conn.close()
-        
-        return [self._row_to_instance(row) for row in rows]
+        yield from self._fetch_chunks(cursor, chunk_size)
+
+    def _fetch_chunks(self, cursor, chunk_size: Optional[int]) -> Iterator[list]:
+        """fetchmany() until the cursor is exhausted."""
+        chunk_size = chunk_size or self.batch_size
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield rows
+
+    def get_latest_batch(self, provider: Optional[str] = None) -> GPUInstanceBatch:
+        """
+        Get the most recent prices as a columnar batch.
+
+        Same rows as `get_latest_prices`, without building one GPUInstance
+        per row.
+
+        Args:
+            provider: Optional provider filter
+
+        Returns:
+            GPUInstanceBatch (empty if the database has no rows)
+        """
+        return GPUInstanceBatch.from_rows(
+            row for rows in self._latest_chunks(_BATCH_SELECT, provider, None) for row in rows
+        )
     
     def get_price_history(
         self,
@@ -242,30 +1601,120 @@ class PriceDatabase:
         Returns:
             List of price records with timestamps
         """
-        conn = sqlite3.connect(self.db_path)
+        return list(self.iter_price_history(instance_type, provider, region, days))
+    
+    def iter_price_history(
+        self,
+        instance_type: str,
+        provider: str,
+        region: str,
+        days: int = 7,
+        chunk_size: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream the price history for a specific instance, oldest first.
+
+        Args:
+            instance_type: Instance type
+            provider: Cloud provider
+            region: Region
+            days: Number of days to look back
+            chunk_size: Rows per fetch (defaults to the database's `batch_size`)
+
+        Yields:
+            Price records with timestamps, as in `get_price_history`
+        """
+        for rows in self._history_chunks(instance_type, provider, region, days, chunk_size):
+            for row in rows:
+                yield {
+                    'timestamp': row[0],
+                    'price_per_hour': row[1],
+                    'available': row[2]
+                }
+
+    def iter_price_history_record_batches(
+        self,
+        instance_type: str,
+        provider: str,
+        region: str,
+        days: int = 7,
+        chunk_size: Optional[int] = None,
+    ) -> Iterator['pyarrow.RecordBatch']:
+        """
+        Stream the price history as Arrow record batches (needs pyarrow).
+
+        Args:
+            instance_type: Instance type
+            provider: Cloud provider
+            region: Region
+            days: Number of days to look back
+            chunk_size: Rows per batch (defaults to the database's `batch_size`)
+
+        Yields:
+            pyarrow.RecordBatch with timestamp, price_per_hour and available
+        """
+        import pyarrow as pa
+
+        schema = pa.schema([
+            ('timestamp', pa.string()),
+            ('price_per_hour', pa.float64()),
+            ('available', pa.bool_()),
+        ])
+        for rows in self._history_chunks(instance_type, provider, region, days, chunk_size):
+            timestamps, prices, available = zip(*rows)
+            yield pa.RecordBatch.from_arrays([
+                pa.array(timestamps, type=pa.string()),
+                pa.array(prices, type=pa.float64()),
+                pa.array([None if v is None else bool(v) for v in available], type=pa.bool_()),
+            ], schema=schema)
+
+    def _history_chunks(self, instance_type: str, provider: str, region: str,
+                        days: int, chunk_size: Optional[int]) -> Iterator[list]:
+        """(timestamp, price_per_hour, available) chunks for one listing."""
+        conn = self._connect()
         cursor = conn.cursor()
         
         cutoff = datetime.now() - timedelta(days=days)
         
-        cursor.execute("""
-            SELECT timestamp, price_per_hour, available
-            FROM gpu_prices
-            WHERE provider = ? AND instance_type = ? AND region = ?
-                AND timestamp >= ?
-            ORDER BY timestamp ASC
-        """, (provider, instance_type, region, cutoff))
+        if self.storage == STORAGE_SHARDED:
+            # Only the months the window overlaps, oldest first, so the
+            # concatenation is in timestamp order.
+            for month in self._shard_months(since=cutoff):
+                table = self._attach_shard(conn, month)
+                cursor.execute(f"""
+                    SELECT timestamp, price_per_hour, available
+                    FROM {table}
+                    WHERE provider = ? AND instance_type = ? AND region = ?
+                        AND timestamp >= ?
+                    ORDER BY timestamp ASC
+                """, (provider, instance_type, region, cutoff))
+                yield from self._fetch_chunks(cursor, chunk_size)
+            return
         
-        rows = cursor.fetchall()
-        conn.close()
+        if self.storage == STORAGE_INTERVALS:
+            # Range scan over the listing's few intervals, expanded to the
+            # snapshots each one covers.
+            cursor.execute("""
+                SELECT s.timestamp, l.price_per_hour, l.available
+                FROM listing_intervals l
+                JOIN price_snapshots s
+                  ON s.timestamp >= l.valid_from
+                 AND (l.valid_to IS NULL OR s.timestamp < l.valid_to)
+                WHERE l.provider = ? AND l.instance_type = ? AND l.region = ?
+                    AND (l.valid_to IS NULL OR l.valid_to > ?)
+                    AND s.timestamp >= ?
+                ORDER BY s.timestamp ASC
+            """, (provider, instance_type, region, cutoff, cutoff))
+        else:
+            cursor.execute("""
+                SELECT timestamp, price_per_hour, available
+                FROM gpu_prices
+                WHERE provider = ? AND instance_type = ? AND region = ?
+                    AND timestamp >= ?
+                ORDER BY timestamp ASC
+            """, (provider, instance_type, region, cutoff))
         
-        return [
-            {
-                'timestamp': row[0],
-                'price_per_hour': row[1],
-                'available': row[2]
-            }
-            for row in rows
-        ]
+        yield from self._fetch_chunks(cursor, chunk_size)
     
     def get_price_trends(
         self,
@@ -284,17 +1733,39 @@ class PriceDatabase:
         Returns:
             List of average prices by timestamp
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        return list(self.iter_price_trends(gpu_type, provider, days))
+    
+    def iter_price_trends(
+        self,
+        gpu_type: Optional[str] = None,
+        provider: Optional[str] = None,
+        days: int = 30,
+        chunk_size: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream average price trends, one record per snapshot, oldest first.
+
+        Args:
+            gpu_type: Optional GPU type filter
+            provider: Optional provider filter
+            days: Number of days to analyze
+            chunk_size: Rows per fetch (defaults to the database's `batch_size`)
+
+        Yields:
+            Records as in `get_price_trends`
+        """
+        cursor = self._connect().cursor()
         
         cutoff = datetime.now() - timedelta(days=days)
         
+        # Served from price_rollups: one row per snapshot x group, however
+        # many listings each snapshot holds.
         query = """
-            SELECT timestamp, AVG(price_per_hour) as avg_price, 
-                   MIN(price_per_hour) as min_price,
-                   MAX(price_per_hour) as max_price,
-                   COUNT(*) as instance_count
-            FROM gpu_prices
+            SELECT timestamp, SUM(price_sum) / SUM(instance_count) as avg_price,
+                   MIN(price_min) as min_price,
+                   MAX(price_max) as max_price,
+                   SUM(instance_count) as instance_count
+            FROM price_rollups
             WHERE timestamp >= ?
         """
         params = [cutoff]
@@ -310,20 +1781,79 @@ class PriceDatabase:
         query += " GROUP BY timestamp ORDER BY timestamp ASC"
         
         cursor.execute(query, params)
-        rows = cursor.fetchall()
-        conn.close()
         
-        return [
-            {
-                'timestamp': row[0],
-                'avg_price': row[1],
-                'min_price': row[2],
-                'max_price': row[3],
-                'instance_count': row[4]
-            }
-            for row in rows
-        ]
+        for rows in self._fetch_chunks(cursor, chunk_size):
+            for row in rows:
+                yield {
+                    'timestamp': row[0],
+                    'avg_price': row[1],
+                    'min_price': row[2],
+                    'max_price': row[3],
+                    'instance_count': row[4]
+                }
     
+    def get_rollup_summary(
+        self,
+        by: str = 'gpu_type',
+        timestamp: Optional[str] = None,
+        quantiles: Iterable[float] = (0.5,),
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Summarise one snapshot per GPU type or provider from price_rollups.
+
+        Args:
+            by: 'gpu_type' or 'provider'
+            timestamp: Snapshot to summarise (defaults to the latest)
+            quantiles: $/GPU-hr quantiles to estimate from the sketches,
+                returned as e.g. 'p50_price_per_gpu' (within ~1%)
+
+        Returns:
+            Dict keyed by GPU type (or provider) with count, min/max/avg/std
+            $/hr, min/max/avg $/GPU-hr, the requested quantiles, and the
+            sorted lists of providers and GPU types in the group
+        """
+        if by not in ('gpu_type', 'provider'):
+            raise ValueError(f"by must be 'gpu_type' or 'provider', not {by!r}")
+        cursor = self._connect().cursor()
+        if timestamp is None:
+            timestamp = self._latest_timestamp(cursor)
+            if not timestamp:
+                return {}
+
+        cursor.execute("""
+            SELECT gpu_type, provider, instance_count, price_min, price_max,
+                   price_sum, price_sumsq, per_gpu_min, per_gpu_max,
+                   per_gpu_sum, per_gpu_sketch
+            FROM price_rollups WHERE timestamp = ?
+        """, (timestamp,))
+        groups = defaultdict(list)
+        for row in cursor.fetchall():
+            groups[row[0] if by == 'gpu_type' else row[1]].append(row)
+
+        summary = {}
+        for key, rows in groups.items():
+            n = sum(r[2] for r in rows)
+            price_sum = sum(r[5] for r in rows)
+            mean = price_sum / n
+            variance = max(sum(r[6] for r in rows) / n - mean * mean, 0.0)
+            entry = {
+                'count': n,
+                'min_price': min(r[3] for r in rows),
+                'max_price': max(r[4] for r in rows),
+                'avg_price': mean,
+                'std_price': variance ** 0.5,
+                'min_price_per_gpu': min(r[7] for r in rows),
+                'max_price_per_gpu': max(r[8] for r in rows),
+                'avg_price_per_gpu': sum(r[9] for r in rows) / n,
+                'providers': sorted({r[1] for r in rows}),
+                'gpu_types': sorted({r[0] for r in rows}),
+            }
+            sketches = [json.loads(r[10]) for r in rows]
+            for q in quantiles:
+                entry[f"p{q * 100:g}_price_per_gpu"] = _sketch_quantile(sketches, q)
+            summary[key] = entry
+        return summary
+
     def get_snapshots(self, days: int = 30) -> List[Dict[str, Any]]:
         """
         Get snapshot summaries.
@@ -334,35 +1864,47 @@ class PriceDatabase:
         Returns:
             List of snapshot summaries
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        return list(self.iter_snapshots(days))
+    
+    def iter_snapshots(self, days: int = 30,
+                       chunk_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream snapshot summaries, oldest first.
+
+        Args:
+            days: Number of days to look back
+            chunk_size: Rows per fetch (defaults to the database's `batch_size`)
+
+        Yields:
+            Snapshot summaries as in `get_snapshots`
+        """
+        cursor = self._connect().cursor()
         
         cutoff = datetime.now() - timedelta(days=days)
         
         cursor.execute("""
             SELECT timestamp, total_instances, providers_count, gpu_types_count,
-                   min_price, max_price, avg_price, metadata
+                   min_price, max_price, avg_price, metadata, status,
+                   parquet_emitted
             FROM price_snapshots
             WHERE timestamp >= ?
             ORDER BY timestamp ASC
         """, (cutoff,))
         
-        rows = cursor.fetchall()
-        conn.close()
-        
-        return [
-            {
-                'timestamp': row[0],
-                'total_instances': row[1],
-                'providers_count': row[2],
-                'gpu_types_count': row[3],
-                'min_price': row[4],
-                'max_price': row[5],
-                'avg_price': row[6],
-                'metadata': json.loads(row[7]) if row[7] else {}
-            }
-            for row in rows
-        ]
+        for rows in self._fetch_chunks(cursor, chunk_size):
+            for row in rows:
+                yield {
+                    'timestamp': row[0],
+                    'total_instances': row[1],
+                    'providers_count': row[2],
+                    'gpu_types_count': row[3],
+                    'min_price': row[4],
+                    'max_price': row[5],
+                    'avg_price': row[6],
+                    'metadata': json.loads(row[7]) if row[7] else {},
+                    'status': row[8],
+                    'parquet_emitted': bool(row[9])
+                }
     
     def _row_to_instance(self, row: tuple) -> GPUInstance:
         """Convert database row to GPUInstance."""
@@ -390,30 +1932,11 @@ class PriceDatabase:
         )
     
     def get_stats(self) -> Dict[str, Any]:
-        """Get database statistics."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT MIN(timestamp), MAX(timestamp), COUNT(DISTINCT timestamp) FROM gpu_prices")
-        first, last, snapshot_count = cursor.fetchone()
-        
-        cursor.execute("SELECT COUNT(*) FROM gpu_prices")
-        total_records = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(DISTINCT provider) FROM gpu_prices")
-        provider_count = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(DISTINCT gpu_type) FROM gpu_prices")
-        gpu_type_count = cursor.fetchone()[0]
-        
-        conn.close()
-        
-        return {
-            'total_records': total_records,
-            'snapshots': snapshot_count,
-            'first_snapshot': first,
-            'last_snapshot': last,
-            'providers': provider_count,
-            'gpu_types': gpu_type_count
-        }
+        """
+        Get database statistics.
+
+        Served from the cache ingest_prices maintains, so the cost does not
+        grow with the table; `verify_stats` recomputes it from scratch.
+        """
+        return self._read_stats(self._connect().cursor())
 
@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
 """Analysis for GPU price-tracker slide deck. Generates figures + findings.json."""
-import duckdb, json, datetime
+import duckdb, json, datetime, sys
 import matplotlib
 matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 import matplotlib.ticker as mticker
+sys.path.insert(0, ".")  # run from the repo root, like the data/ and deck/ paths below
+import parquet_dataset  # repo root: compacted + snapshot tiers
 
 plt.rcParams.update({
     "figure.dpi": 140, "font.size": 11,
@@ -14,7 +16,7 @@ plt.rcParams.update({
 ACCENT = "#2563eb"; PALETTE = ["#2563eb","#dc2626","#059669","#d97706","#7c3aed","#0891b2","#db2777","#65a30d"]
 FIG = "deck/figures"
 con = duckdb.connect()
-P = "read_parquet('data/parquet/prices/**/*.parquet', hive_partitioning=1)"
+P = parquet_dataset.prices_relation(con, "data/parquet/prices")  # compacted months + open snapshots
 GPU = f"FROM {P} WHERE gpu_count>0 AND price_per_hour>0 AND gpu_type<>'Unknown'"
 findings = {}
 
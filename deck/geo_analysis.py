@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 """Geographic analysis of US GPU supply -> maps + heatmap for the deck."""
-import duckdb, json, warnings
+import duckdb, json, warnings, sys
 import numpy as np
 import geopandas as gpd
 import matplotlib
@@ -8,13 +8,15 @@ matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 from matplotlib.colors import LogNorm
 from matplotlib.lines import Line2D
+sys.path.insert(0, ".")  # run from the repo root, like the data/ and deck/ paths below
+import parquet_dataset  # repo root: compacted + snapshot tiers
 warnings.filterwarnings("ignore")
 
 plt.rcParams.update({"figure.dpi": 140, "font.size": 11, "font.family": "DejaVu Sans"})
 FIG = "deck/figures"
 con = duckdb.connect()
 con.execute("CREATE TABLE regions AS SELECT * FROM read_csv_auto('data/regions.csv')")
-P = "read_parquet('data/parquet/prices/**/*.parquet', hive_partitioning=1)"
+P = parquet_dataset.prices_relation(con, "data/parquet/prices")  # compacted months + open snapshots
 
 # US outline (lower-48 clip) from geopandas' bundled Natural Earth dataset.
 # Clip to the continental bbox first — the raw USA polygon includes Alaska's
@@ -0,0 +1,144 @@
+"""Per-stage timing and resource instrumentation for the collection pipeline.
+
+A `RunMetrics` records one entry per pipeline stage (fetch per provider,
+conversion, SQLite insert, snapshot summary, Parquet emission, region
+enrichment) with wall-clock seconds, row counts, bytes written and the
+process's peak RSS at the end of the stage. At the end of a run it is
+emitted as a single JSON line and appended to the `collection_runs` table
+(see `database.PriceDatabase.record_run`), so slow runs can be attributed
+to a stage and trended over time.
+
+Library code records into whichever run is active:
+
+    with instrumentation.active().stage("conversion", rows_in=n) as rec:
+        ...
+        rec["rows"] = len(batch)
+
+When no run has been started, `active()` returns a no-op recorder, so
+instrumented functions cost nothing extra when called from elsewhere.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB, if the OS reports it."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux but bytes on macOS.
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class RunMetrics:
+    """Stage timings and totals for one pipeline run."""
+
+    def __init__(self, run_type: str):
+        self.run_id = uuid.uuid4().hex
+        self.run_type = run_type
+        self.started_at = datetime.now(timezone.utc)
+        self.finished_at: Optional[datetime] = None
+        self.snapshot_timestamp: Optional[datetime] = None
+        self.stages: list[dict] = []
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+
+    @contextlib.contextmanager
+    def stage(self, name: str, **fields):
+        """Time a block; the yielded dict can be filled with rows/bytes."""
+        rec = {"stage": name, **fields}
+        start = time.perf_counter()
+        try:
+            yield rec
+        finally:
+            self.record(name, time.perf_counter() - start, **rec)
+
+    def record(self, name: str, seconds: float, **fields):
+        """Add a stage measured elsewhere (e.g. on a worker thread)."""
+        fields.pop("stage", None)
+        rec = {"stage": name, "seconds": round(seconds, 4), **fields,
+               "peak_rss_mb": peak_rss_mb()}
+        with self._lock:
+            self.stages.append(rec)
+
+    def finish(self) -> "RunMetrics":
+        if self.finished_at is None:
+            self.finished_at = datetime.now(timezone.utc)
+            self.total_seconds = round(time.perf_counter() - self._t0, 4)
+        return self
+
+    def _total(self, key: str) -> int:
+        return sum(s.get(key) or 0 for s in self.stages)
+
+    def to_dict(self) -> dict:
+        self.finish()
+        return {
+            "run_id": self.run_id,
+            "run_type": self.run_type,
+            "started_at": self.started_at.isoformat(),
+            "finished_at": self.finished_at.isoformat(),
+            "snapshot_timestamp": (
+                self.snapshot_timestamp.isoformat() if self.snapshot_timestamp else None
+            ),
+            "total_seconds": self.total_seconds,
+            "peak_rss_mb": peak_rss_mb(),
+            "rows_stored": sum(
+                s.get("rows") or 0 for s in self.stages if s["stage"] == "sqlite_insert"
+            ),
+            "bytes_written": self._total("bytes_written"),
+            "stages": self.stages,
+        }
+
+    def emit(self, path: Optional[str] = None) -> dict:
+        """Write the run as one JSON line to `path` (appended) or stderr."""
+        data = self.to_dict()
+        line = json.dumps(data, default=str)
+        if path:
+            with open(path, "a") as fh:
+                fh.write(line + "\n")
+        else:
+            print(line, file=sys.stderr)
+        return data
+
+
+class _NullRun:
+    """Recorder used when no run is active: same API, records nothing."""
+
+    snapshot_timestamp = None
+
+    @contextlib.contextmanager
+    def stage(self, name: str, **fields):
+        yield {}
+
+    def record(self, name: str, seconds: float, **fields):
+        pass
+
+
+_NULL = _NullRun()
+_active: Optional[RunMetrics] = None
+
+
+def start_run(run_type: str) -> RunMetrics:
+    """Start a run and make it the one `active()` returns."""
+    global _active
+    _active = RunMetrics(run_type)
+    return _active
+
+
+def active():
+    """The current run, or a no-op recorder if none was started."""
+    return _active if _active is not None else _NULL
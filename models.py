@@ -4,6 +4,8 @@ from dataclasses import dataclass
 from typing import Optional
 from datetime import datetime
 
+import numpy as np
+
 
 @dataclass
 class GPUInstance:
@@ -66,3 +68,192 @@ class GPUInstance:
             data['last_updated'] = datetime.fromisoformat(data['last_updated'])
         return cls(**data)
 
+
+# Columns of GPUInstanceBatch, in GPUInstance field order. Low-cardinality
+# string columns are dictionary-encoded; the rest are plain NumPy arrays.
+BATCH_DICT_COLUMNS = ('provider', 'gpu_type', 'region', 'quality')
+BATCH_COLUMNS = (
+    'provider', 'instance_type', 'gpu_type', 'gpu_count', 'gpu_memory_gb',
+    'vcpus', 'ram_gb', 'region', 'price_per_hour', 'is_spot', 'available',
+    'availability_zone', 'last_updated', 'quality',
+)
+
+
+@dataclass
+class DictColumn:
+    """Dictionary-encoded string column: int32 codes into a category array."""
+
+    codes: np.ndarray  # int32, one per row
+    categories: np.ndarray  # object array of distinct strings
+
+    @classmethod
+    def encode(cls, values) -> 'DictColumn':
+        categories, codes = np.unique(np.asarray(values, dtype=object), return_inverse=True)
+        return cls(codes.astype(np.int32), categories)
+
+    def decode(self) -> np.ndarray:
+        """Materialise the column as an object array of strings."""
+        return self.categories[self.codes]
+
+    def take(self, indices) -> 'DictColumn':
+        return DictColumn(self.codes[indices], self.categories)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+
+class GPUInstanceBatch:
+    """Columnar set of GPU instance offerings.
+
+    Holds the same fields as a list of GPUInstance, one NumPy array per
+    column, with provider / gpu_type / region / quality dictionary-encoded.
+    Nullable columns use sentinels: `gpu_memory_gb` is float64 with NaN,
+    `available` is int8 with -1 for unknown, `availability_zone` is an object
+    array holding None. Use this on hot paths (whole-snapshot reads, group-bys)
+    and `to_instances()` only for the handful of rows that get displayed.
+    """
+
+    def __init__(self, **columns):
+        missing = [c for c in BATCH_COLUMNS if c not in columns]
+        if missing:
+            raise ValueError(f"missing batch columns: {', '.join(missing)}")
+        for name in BATCH_COLUMNS:
+            setattr(self, name, columns[name])
+
+    @classmethod
+    def empty(cls) -> 'GPUInstanceBatch':
+        return cls.from_columns({name: [] for name in BATCH_COLUMNS})
+
+    @classmethod
+    def from_columns(cls, columns: dict) -> 'GPUInstanceBatch':
+        """Build a batch from per-column sequences of Python values."""
+        def as_dict(values):
+            return values if isinstance(values, DictColumn) else DictColumn.encode(values)
+
+        available = np.asarray(
+            [-1 if v is None else int(bool(v)) for v in columns['available']],
+            dtype=np.int8,
+        )
+        memory = np.asarray(
+            [np.nan if v is None else v for v in columns['gpu_memory_gb']],
+            dtype=np.float64,
+        )
+        last_updated = columns['last_updated']
+        if isinstance(last_updated, datetime):
+            # One timestamp for the whole batch (a single snapshot).
+            last_updated = [last_updated] * len(columns['price_per_hour'])
+        return cls(
+            provider=as_dict(columns['provider']),
+            instance_type=np.asarray(columns['instance_type'], dtype=object),
+            gpu_type=as_dict(columns['gpu_type']),
+            gpu_count=np.asarray(columns['gpu_count'], dtype=np.int32),
+            gpu_memory_gb=memory,
+            vcpus=np.asarray(columns['vcpus'], dtype=np.int32),
+            ram_gb=np.asarray(columns['ram_gb'], dtype=np.float64),
+            region=as_dict(columns['region']),
+            price_per_hour=np.asarray(columns['price_per_hour'], dtype=np.float64),
+            is_spot=np.asarray(columns['is_spot'], dtype=bool),
+            available=available,
+            availability_zone=np.asarray(columns['availability_zone'], dtype=object),
+            last_updated=np.asarray(last_updated, dtype='datetime64[us]'),
+            quality=as_dict(columns['quality']),
+        )
+
+    @classmethod
+    def from_rows(cls, rows) -> 'GPUInstanceBatch':
+        """Build a batch from row tuples laid out in `BATCH_COLUMNS` order."""
+        rows = list(rows)
+        if not rows:
+            return cls.empty()
+        return cls.from_columns(dict(zip(BATCH_COLUMNS, zip(*rows))))
+
+    @classmethod
+    def from_instances(cls, instances) -> 'GPUInstanceBatch':
+        return cls.from_rows(
+            tuple(getattr(inst, name) for name in BATCH_COLUMNS) for inst in instances
+        )
+
+    def __len__(self) -> int:
+        return len(self.price_per_hour)
+
+    @property
+    def price_per_gpu_hour(self) -> np.ndarray:
+        """Price per GPU per hour; 0.0 where gpu_count is not positive."""
+        out = np.zeros(len(self), dtype=np.float64)
+        np.divide(self.price_per_hour, self.gpu_count, out=out, where=self.gpu_count > 0)
+        return out
+
+    def column(self, name: str) -> np.ndarray:
+        """Return a column as a plain array, decoding dictionary columns."""
+        values = getattr(self, name)
+        return values.decode() if isinstance(values, DictColumn) else values
+
+    def take(self, indices) -> 'GPUInstanceBatch':
+        """Select rows by integer indices or a boolean mask."""
+        columns = {}
+        for name in BATCH_COLUMNS:
+            values = getattr(self, name)
+            columns[name] = values.take(indices) if isinstance(values, DictColumn) else values[indices]
+        return GPUInstanceBatch(**columns)
+
+    def groups(self, name: str):
+        """Yield (value, sub-batch) per distinct value of a dictionary column."""
+        col: DictColumn = getattr(self, name)
+        order = np.argsort(col.codes, kind='stable')
+        bounds = np.flatnonzero(np.diff(col.codes[order])) + 1
+        for idx in np.split(order, bounds) if len(order) else []:
+            yield col.categories[col.codes[idx[0]]], self.take(idx)
+
+    def to_instances(self) -> list:
+        """Materialise one GPUInstance per row (use on small selections)."""
+        columns = [self.column(name) for name in BATCH_COLUMNS]
+        columns[BATCH_COLUMNS.index('gpu_memory_gb')] = [
+            None if np.isnan(v) else int(v) for v in self.gpu_memory_gb
+        ]
+        columns[BATCH_COLUMNS.index('available')] = [
+            None if v < 0 else bool(v) for v in self.available
+        ]
+        columns[BATCH_COLUMNS.index('last_updated')] = self.last_updated.astype(object)
+        return [
+            GPUInstance(**{name: (v.item() if isinstance(v, np.generic) else v)
+                           for name, v in zip(BATCH_COLUMNS, row)})
+            for row in zip(*columns)
+        ]
+
+    def to_arrow(self):
+        """Convert to a pyarrow.Table; numeric columns and codes are zero-copy."""
+        import pyarrow as pa
+
+        arrays = {}
+        for name in BATCH_COLUMNS:
+            values = getattr(self, name)
+            if isinstance(values, DictColumn):
+                arrays[name] = pa.DictionaryArray.from_arrays(
+                    pa.array(values.codes), pa.array(values.categories, type=pa.string())
+                )
+            elif name == 'available':
+                arrays[name] = pa.array(values.astype(bool), mask=values < 0)
+            elif name == 'gpu_memory_gb':
+                arrays[name] = pa.array(values, from_pandas=True)
+            elif values.dtype == object:
+                arrays[name] = pa.array(values, type=pa.string())
+            else:
+                arrays[name] = pa.array(values)
+        arrays['price_per_gpu_hour'] = pa.array(self.price_per_gpu_hour)
+        return pa.table(arrays)
+
+    def to_pandas(self):
+        """Convert to a pandas DataFrame with categorical dictionary columns."""
+        import pandas as pd
+
+        data = {}
+        for name in BATCH_COLUMNS:
+            values = getattr(self, name)
+            if isinstance(values, DictColumn):
+                data[name] = pd.Categorical.from_codes(values.codes, values.categories)
+            elif name == 'available':
+                data[name] = pd.arrays.BooleanArray(values > 0, values < 0)
+            else:
+                data[name] = values
+        data['price_per_gpu_hour'] = self.price_per_gpu_hour
+        return pd.DataFrame(data, copy=False)
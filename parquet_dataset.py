@@ -0,0 +1,358 @@
+"""Locating the files of the published Parquet dataset.
+
+The dataset root (`data/parquet` locally, the bucket on S3) holds:
+
+- `prices/dt=YYYY-MM-DD/snapshot_*.parquet` — one immutable file per
+  snapshot, written by `scripts/emit_latest_parquet.py`.
+- `manifest/snapshots.parquet` — one row per snapshot file (path, dt,
+  timestamp, row count, size, MD5, schema version, per-column min/max, and
+  the sizes and MD5s of its cube files), kept up to date by the same script.
+- `compacted/prices_YYYY-MM.parquet` — one file per closed month, built from
+  the snapshot files by `scripts/compact_parquet.py`, plus
+  `compacted/manifest.json` recording which months it covers.
+- `latest/latest.parquet` and `latest/stats.json` — fixed-path copies of the
+  newest snapshot and whole-dataset summary statistics, rewritten on every
+  publish, so a landing page needs no scan of the history.
+- `cube/<table>/dt=YYYY-MM-DD/snapshot_*.parquet` — per-snapshot aggregates
+  of $/GPU-hour (`daily`: by gpu_type, provider, region_group, is_spot and
+  quality; `regional`: by canonical region; `spread`: matched spot /
+  on-demand pairs), one file per table at the snapshot file's relative
+  path. Written with the snapshot; the manifest's `cube` column records
+  which snapshots have them.
+
+`load_layout()` reads both manifests; `DatasetLayout.relation()` then names
+the files to read explicitly: the compacted months up to the manifest's
+`compacted_through` date, then the snapshot files after it, optionally only
+those within a lookback window. Explicit lists spare DuckDB the recursive
+(S3 LIST) glob. Without a snapshot manifest the snapshot tier is read by
+glob, and without a compaction manifest it is read alone, so readers work
+the same on trees published before either existed.
+`DatasetLayout.cube_relation()` names a window's cube files the same way,
+or returns None when a snapshot in the window has none (the caller then
+aggregates the listings itself).
+
+The manifests record the size and MD5 of every file they list, so a
+`LocalFileCache` handed to `load_layout()` can mirror them to local disk,
+keyed by content: the relations then name the local copies, and a warm
+query reads no S3.
+
+Used by the Streamlit app (`streamlit_app/queries.py`) and the deck scripts
+(`deck/analyze.py`, `deck/geo_analysis.py`).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+COMPACTED_DIR = "compacted"
+COMPACTION_MANIFEST = f"{COMPACTED_DIR}/manifest.json"
+SNAPSHOT_MANIFEST = "manifest/snapshots.parquet"
+LATEST_SNAPSHOT = "latest/latest.parquet"
+LATEST_STATS = "latest/stats.json"
+CUBE_DIR = "cube"
+CUBE_TABLES = ("daily", "regional", "spread")
+
+
+def dataset_root(prices_url: str) -> str:
+    """Dataset root for a `.../prices` URL or path (its parent)."""
+    head, _, _ = prices_url.rstrip("/").rpartition("/")
+    return head or "."
+
+
+def _read_json(con, url: str) -> Optional[dict]:
+    """JSON document at `url`, or None if it does not exist.
+
+    Read through DuckDB so S3 roots use the connection's httpfs settings.
+    """
+    import duckdb
+
+    try:
+        row = con.execute("SELECT content FROM read_text(?)", [url]).fetchone()
+    except duckdb.IOException:
+        return None
+    return json.loads(row[0]) if row else None
+
+
+def load_compaction_manifest(con, root: str) -> Optional[dict]:
+    """The compaction manifest under `root`, or None if there is none yet."""
+    return _read_json(con, f"{root}/{COMPACTION_MANIFEST}")
+
+
+def load_latest_stats(con, root: str) -> Optional[dict]:
+    """`latest/stats.json` under `root`, or None if it is not published."""
+    return _read_json(con, f"{root}/{LATEST_STATS}")
+
+
+def load_snapshot_manifest(con, root: str) -> Optional[list]:
+    """[(path, dt, epoch_us, schema_version, cube, bytes, md5, cube_bytes,
+    cube_md5)] by timestamp, or None if there is no manifest.
+
+    `path` is relative to the `prices/` directory; `dt` is an ISO date;
+    `cube` is True if the snapshot's cube files are published; `bytes` and
+    `md5` are the file's size and content hash; `cube_bytes` and `cube_md5`
+    those of its cube files, in `CUBE_TABLES` order. Manifests written
+    before the cube or the hashes lack those columns: False and None.
+    """
+    import duckdb
+
+    wanted = ("path", "schema_version", "cube", "bytes", "md5", "cube_bytes", "cube_md5")
+    sql = f"""
+        SELECT CAST(dt AS VARCHAR) AS dt_iso, epoch_us(timestamp) AS epoch_us,
+               COLUMNS(c -> c IN {wanted!r})
+        FROM read_parquet(?)
+        ORDER BY timestamp
+    """
+    try:
+        cursor = con.execute(sql, [f"{root}/{SNAPSHOT_MANIFEST}"])
+    except duckdb.IOException:
+        return None
+    names = [column[0] for column in cursor.description]
+    rows = [dict(zip(names, row)) for row in cursor.fetchall()]
+    return [(r["path"], r["dt_iso"], r["epoch_us"], r["schema_version"], bool(r.get("cube")),
+             r["bytes"], r.get("md5"), r.get("cube_bytes"), r.get("cube_md5")) for r in rows]
+
+
+def _sql_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _file_list(urls: list) -> str:
+    return "[" + ", ".join(_sql_literal(url) for url in urls) + "]"
+
+
+class LocalFileCache:
+    """Read-through local mirror of immutable dataset files.
+
+    A file is stored under `directory` at its URL's path with its version
+    (the content hash its manifest entry records) in the name, so a
+    rewritten file, such as a re-compacted month or a rebuilt cube, is a new
+    entry even at the same size. Files without a version (manifests written
+    before the hashes) are read in place. Once the directory holds more than
+    `max_bytes`, the least recently used files are evicted, except those
+    used within the last `grace` seconds, which live views may still read.
+
+    Args:
+        con: DuckDB connection that fetches misses (`read_blob`), so S3 URLs
+            use its httpfs settings.
+        directory: Cache directory; created on first use.
+        max_bytes: Size budget of the directory.
+        grace: Seconds a used file is protected from eviction.
+    """
+
+    FETCH_BATCH = 32
+
+    def __init__(self, con, directory, max_bytes: int, grace: float = 600):
+        self.con = con
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.grace = grace
+
+    def _local_path(self, url: str, version) -> Path:
+        stem, _, suffix = url.split("://", 1)[-1].lstrip("/").rpartition(".")
+        return self.directory / f"{stem}.v{version}.{suffix}"
+
+    def localize(self, files: list) -> list:
+        """Local paths for `files`, fetching the ones not cached yet.
+
+        Args:
+            files: [(url, version, size)]; `version` is the content hash
+                (None: not cached) and `size` is checked against the
+                fetched bytes.
+
+        Returns:
+            One path or URL per file: the URL where the file could not be
+            cached (no version, fetch failed, size mismatch) and for every
+            file if together they exceed the budget.
+        """
+        if sum(size or 0 for _, _, size in files) > self.max_bytes:
+            return [url for url, _, _ in files]
+        paths = [None if version is None else self._local_path(url, version)
+                 for url, version, _ in files]
+        now = time.time()
+        missing = []
+        for (url, _, size), path in zip(files, paths):
+            if path is None:
+                continue
+            try:
+                os.utime(path, (now, now))  # mtime is the LRU clock
+            except FileNotFoundError:
+                missing.append((url, size, path))
+        if missing:
+            self._fetch(missing)
+            self._evict(keep=set(paths))
+        return [str(path) if path is not None and path.exists() else url
+                for (url, _, _), path in zip(files, paths)]
+
+    def _fetch(self, missing: list) -> None:
+        import duckdb
+
+        for i in range(0, len(missing), self.FETCH_BATCH):
+            batch = missing[i:i + self.FETCH_BATCH]
+            try:
+                content = dict(self.con.execute(
+                    "SELECT filename, content FROM read_blob(?)", [[url for url, _, _ in batch]]
+                ).fetchall())
+            except duckdb.Error as e:
+                print(f"WARNING: parquet cache fetch failed: {e}", file=sys.stderr)
+                continue
+            for url, size, path in batch:
+                data = content.get(url)
+                if data is None or (size is not None and len(data) != size):
+                    continue
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+                tmp.write_bytes(data)
+                os.replace(tmp, path)
+
+    def _evict(self, keep: set) -> None:
+        entries = []
+        for path in self.directory.rglob("*.parquet"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        cutoff = time.time() - self.grace
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path in keep or mtime > cutoff:
+                continue
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+@dataclass
+class DatasetLayout:
+    """Which files hold the listings, as recorded by the two manifests."""
+
+    prices_url: str
+    compacted: list = field(default_factory=list)  # compaction manifest entries
+    compacted_through: Optional[str] = None        # ISO date, inclusive
+    snapshots: Optional[list] = None               # load_snapshot_manifest() rows
+    cache: Optional[LocalFileCache] = None         # mirrors the named files
+
+    def _urls(self, files: list) -> list:
+        """URLs, or local copies if cached, of `files` [(url, version, size)]."""
+        if self.cache is None:
+            return [url for url, _, _ in files]
+        return self.cache.localize(files)
+
+    def _since(self, days: Optional[float]) -> Optional[int]:
+        """Epoch microseconds where a `days` window ends, or None (no bound)."""
+        if days is None or not self.snapshots:
+            return None
+        return self.snapshots[-1][2] - int(days * 86_400_000_000)
+
+    def relation(self, days: Optional[float] = None) -> str:
+        """SQL usable after FROM that reads the listings.
+
+        Args:
+            days: If given (and the snapshot manifest is available), read only
+                the files that can hold rows from the last `days` days before
+                the newest snapshot, i.e. the window of
+                `timestamp >= MAX(timestamp) - INTERVAL 'days days'`. 0 reads
+                just the newest snapshot.
+
+        Returns:
+            A parenthesized subquery. Both tiers expose the same columns,
+            including `dt` (hive partition column for snapshot files, a
+            stored column in compacted files).
+        """
+        glob = (
+            f"read_parquet({_sql_literal(self.prices_url + '/**/*.parquet')}, "
+            "hive_partitioning = true, union_by_name = true)"
+        )
+        since = self._since(days)
+        if since is not None:
+            since_dt = datetime.fromtimestamp(since / 1e6, tz=timezone.utc).date().isoformat()
+
+        parts = []
+        months = [m for m in self.compacted if since is None or m["last_dt"] >= since_dt]
+        if months:
+            root = dataset_root(self.prices_url)
+            urls = self._urls([(f"{root}/{m['path']}", m.get("md5"), m["bytes"])
+                               for m in months])
+            parts.append(f"SELECT * FROM read_parquet({_file_list(urls)}, union_by_name = true)")
+        if self.snapshots is None:
+            where = (f" WHERE dt > DATE {_sql_literal(self.compacted_through)}"
+                     if self.compacted_through else "")
+            parts.append(f"SELECT * FROM {glob}{where}")
+        else:
+            files = [
+                row for row in self.snapshots
+                if (self.compacted_through is None or row[1] > self.compacted_through)
+                and (since is None or row[2] >= since)
+            ]
+            if files:
+                # A uniform schema version means identical schemas: skip the
+                # per-file schema reconciliation.
+                union = ", union_by_name = true" if len({row[3] for row in files}) > 1 else ""
+                urls = self._urls([(f"{self.prices_url}/{row[0]}", row[6], row[5])
+                                   for row in files])
+                parts.append(
+                    f"SELECT * FROM read_parquet({_file_list(urls)}, "
+                    f"hive_partitioning = true{union})"
+                )
+        if not parts:
+            parts.append(f"SELECT * FROM {glob}")
+        return "(" + " UNION ALL BY NAME ".join(parts) + ")"
+
+    def cube_relation(self, table: str, days: Optional[float] = None) -> Optional[str]:
+        """SQL usable after FROM that reads one cube table, or None.
+
+        Args:
+            table: One of `CUBE_TABLES`.
+            days: As for `relation()`: only the snapshots of the last `days`
+                days before the newest one.
+
+        Returns:
+            A parenthesized subquery over the cube files of the window's
+            snapshots, or None if there is no snapshot manifest or any
+            snapshot in the window has no cube files.
+        """
+        since = self._since(days)
+        files = [row for row in self.snapshots or () if since is None or row[2] >= since]
+        if not files or not all(row[4] for row in files):
+            return None
+        root = dataset_root(self.prices_url)
+        i = CUBE_TABLES.index(table)
+        urls = self._urls([(f"{root}/{CUBE_DIR}/{table}/{row[0]}",
+                            row[8][i] if row[8] else None, row[7][i] if row[7] else None)
+                           for row in files])
+        return f"(SELECT * FROM read_parquet({_file_list(urls)}))"
+
+
+def load_layout(con, prices_url: str, cache: Optional[LocalFileCache] = None) -> DatasetLayout:
+    """Read both manifests for the snapshot tier at `prices_url`.
+
+    Args:
+        con: DuckDB connection used to fetch them (configured for S3 when
+            `prices_url` is an s3:// URL).
+        prices_url: The snapshot tier, e.g. `data/parquet/prices` or
+            `s3://bucket/prices`; the manifests and compacted tier are its
+            siblings.
+        cache: If given, the relations name local copies of their files.
+    """
+    prices_url = prices_url.rstrip("/")
+    root = dataset_root(prices_url)
+    layout = DatasetLayout(prices_url, snapshots=load_snapshot_manifest(con, root), cache=cache)
+    compaction = load_compaction_manifest(con, root)
+    if compaction and compaction.get("months"):
+        layout.compacted = compaction["months"]
+        layout.compacted_through = compaction["compacted_through"]
+    return layout
+
+
+def prices_relation(con, prices_url: str, days: Optional[float] = None) -> str:
+    """`load_layout(con, prices_url).relation(days)`."""
+    return load_layout(con, prices_url).relation(days)
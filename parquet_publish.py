@@ -0,0 +1,645 @@
+"""Writing the published Parquet dataset.
+
+The write side of `parquet_dataset.py`, shared by the scripts that build the
+dataset (`scripts/sqlite_to_parquet.py`, `scripts/emit_latest_parquet.py`,
+`scripts/compact_parquet.py`, `scripts/upgrade_parquet_schema.py`,
+`scripts/build_daily_cube.py`):
+
+- the snapshot file format: `SNAPSHOT_SCHEMA`, the `SORT_KEYS` order and
+  `parquet_write_options()`, plus the provenance metadata of each file;
+- the snapshot manifest (`update_snapshot_manifest()`), one row per snapshot
+  file built from its footer;
+- `latest/stats.json` (`snapshot_summary()`, `fold_stats()`) and the
+  fixed-path `latest/` copies (`publish_latest()`);
+- the daily aggregate cube (`cube_tables()`, `write_cube()`).
+
+Every file is written under a temporary name and renamed into place.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import inspect
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+import price_sketch
+import regions
+from parquet_dataset import (
+    CUBE_DIR, CUBE_TABLES, LATEST_SNAPSHOT, LATEST_STATS, SNAPSHOT_MANIFEST,
+)
+
+
+def _git_sha() -> str:
+    """Return the current commit SHA, or empty string if unavailable."""
+    if not shutil.which("git"):
+        return ""
+    try:
+        out = subprocess.check_output(
+            ["git", "rev-parse", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            stderr=subprocess.DEVNULL,
+            timeout=2,
+        )
+        return out.decode().strip()
+    except (subprocess.SubprocessError, FileNotFoundError):
+        return ""
+
+
+def _gpuhunt_version() -> str:
+    """Return the installed gpuhunt version, or empty string if missing."""
+    try:
+        import importlib.metadata as md
+        return md.version("gpuhunt")
+    except Exception:
+        return ""
+
+
+# Physical schema of every emitted file. Low-cardinality strings are
+# dictionary-encoded; `available` is a nullable bool.
+SNAPSHOT_SCHEMA = pa.schema([
+    ("timestamp", pa.timestamp("us", tz="UTC")),
+    ("provider", pa.dictionary(pa.int32(), pa.string())),
+    ("instance_type", pa.string()),
+    ("gpu_type", pa.dictionary(pa.int32(), pa.string())),
+    ("gpu_count", pa.int64()),
+    ("gpu_memory_gb", pa.float64()),
+    ("vcpus", pa.int64()),
+    ("ram_gb", pa.float64()),
+    ("region", pa.dictionary(pa.int32(), pa.string())),
+    ("price_per_hour", pa.float64()),
+    ("is_spot", pa.bool_()),
+    ("available", pa.bool_()),
+    ("availability_zone", pa.string()),
+    ("quality", pa.dictionary(pa.int32(), pa.string())),
+    ("region_canonical", pa.dictionary(pa.int32(), pa.string())),
+    ("country", pa.dictionary(pa.int32(), pa.string())),
+    ("region_lat", pa.float64()),
+    ("region_lon", pa.float64()),
+    ("region_group", pa.dictionary(pa.int32(), pa.string())),
+])
+
+# Rows within a file are sorted by these columns (the dashboard's usual
+# filters, least selective first), so each row group and page covers a
+# narrow range of them and min/max statistics let readers skip the rest.
+SORT_KEYS = ("quality", "gpu_type", "provider", "region")
+
+# Row groups are the unit DuckDB skips on statistics; pages (with the page
+# index) the finer unit within one. A snapshot spans a handful of groups.
+ROW_GROUP_SIZE = 16_384
+DATA_PAGE_SIZE = 64 * 1024
+
+# Equality-filtered columns get Bloom filters when the installed pyarrow
+# can write them; older versions write the file without.
+BLOOM_FILTER_COLUMNS = ("gpu_type", "provider", "instance_type")
+_CAN_WRITE_BLOOM = "bloom_filter_options" in inspect.signature(pq.ParquetWriter.__init__).parameters
+
+# Recorded as `schema_version` in each file's metadata. 1.2: same columns
+# as 1.1, with the explicit types of SNAPSHOT_SCHEMA.
+FILE_SCHEMA_VERSION = b"1.2"
+
+
+def provenance() -> dict:
+    """File-level provenance that is the same for every snapshot of a run.
+
+    Compute once and pass to `write_snapshot`; `_git_sha` shells out.
+    """
+    return {"git_sha": _git_sha(), "gpuhunt_version": _gpuhunt_version()}
+
+
+def snapshot_filename(ts: datetime) -> str:
+    return f"snapshot_{ts.strftime('%Y%m%dT%H%M%SZ')}.parquet"
+
+
+def partition_dir(out: Path, ts: datetime) -> Path:
+    return out / "prices" / f"dt={ts.strftime('%Y-%m-%d')}"
+
+
+def quality_tag(gpu_count, gpu_type, gpu_memory_gb) -> str:
+    """Row-quality tag for sources that predate the `quality` column."""
+    if gpu_count is None or gpu_count <= 0:
+        return "cpu_only"
+    if gpu_type == "Unknown":
+        return "unknown_gpu"
+    if gpu_memory_gb is None or gpu_memory_gb != gpu_memory_gb:  # None or NaN
+        return "missing_memory"
+    return "ok"
+
+
+def value_type(name: str) -> pa.DataType:
+    """SNAPSHOT_SCHEMA type of `name`, with dictionaries as their values."""
+    kind = SNAPSHOT_SCHEMA.field(name).type
+    return kind.value_type if pa.types.is_dictionary(kind) else kind
+
+
+def file_metadata(ts: datetime, row_count: int, quality_counts: dict, prov: dict) -> dict:
+    """Provenance stored in every file's Parquet metadata (bytes -> bytes)."""
+    return {
+        b"snapshot_timestamp": str(ts).encode(),
+        b"snapshot_timestamp_utc": ts.astimezone(timezone.utc).isoformat().encode()
+            if ts.tzinfo
+            else ts.isoformat().encode(),
+        b"emitted_at_utc": datetime.now(timezone.utc).isoformat().encode(),
+        b"git_sha": prov["git_sha"].encode(),
+        b"gpuhunt_version": prov["gpuhunt_version"].encode(),
+        b"row_count": str(row_count).encode(),
+        b"quality_summary": ",".join(
+            f"{k}={v}" for k, v in sorted(quality_counts.items())
+        ).encode(),
+        b"schema_version": FILE_SCHEMA_VERSION,
+    }
+
+
+def parquet_write_options(table: pa.Table, sort_keys: tuple = SORT_KEYS) -> dict:
+    """Keyword arguments for `pq.write_table` of a finished snapshot table.
+
+    Args:
+        table: Rows already sorted by `sort_keys` (see `sort_rows`).
+        sort_keys: The columns the rows are sorted by, declared in the file.
+
+    Returns:
+        zstd compression, sized row groups and pages, statistics and page
+        index, the declared sort order and, where supported, Bloom filters.
+    """
+    options = {
+        "compression": "zstd",
+        "row_group_size": ROW_GROUP_SIZE,
+        "data_page_size": DATA_PAGE_SIZE,
+        "write_statistics": True,
+        "write_page_index": True,
+        "sorting_columns": pq.SortingColumn.from_ordering(
+            table.schema, [(name, "ascending") for name in sort_keys]
+        ),
+    }
+    if _CAN_WRITE_BLOOM and table.num_rows:
+        options["bloom_filter_options"] = {
+            name: {"ndv": max(1, len(table[name].unique())), "fpp": 0.01}
+            for name in BLOOM_FILTER_COLUMNS
+        }
+    return options
+
+
+def sort_rows(table: pa.Table, sort_keys: tuple = SORT_KEYS) -> pa.Table:
+    """`table` ordered by `sort_keys` (nulls last).
+
+    Dictionary-encoded keys are compared by value: Arrow cannot sort them
+    directly, so the keys are decoded for the sort only.
+    """
+    keys = table.select(list(sort_keys))
+    keys = keys.cast(pa.schema([
+        (field.name, field.type.value_type if pa.types.is_dictionary(field.type) else field.type)
+        for field in keys.schema
+    ]))
+    order = pc.sort_indices(keys, sort_keys=[(name, "ascending") for name in sort_keys])
+    return table.take(order)
+
+
+# Columns with a min/max pair in the snapshot manifest: all but the
+# timestamp, which is the same for every row of a snapshot.
+_RANGE_COLUMNS = tuple(name for name in SNAPSHOT_SCHEMA.names if name != "timestamp")
+
+MANIFEST_SCHEMA = pa.schema(
+    [
+        ("path", pa.string()),  # relative to <out>/prices
+        ("dt", pa.date32()),
+        ("timestamp", pa.timestamp("us", tz="UTC")),
+        ("row_count", pa.int64()),
+        ("bytes", pa.int64()),
+        ("schema_version", pa.string()),
+        ("md5", pa.string()),  # of the file's content: its version in the app's cache
+        ("cube", pa.bool_()),  # cube files written for this snapshot
+        # Sizes and MD5s of the cube files, in CUBE_TABLES order (if cube).
+        ("cube_bytes", pa.list_(pa.int64())),
+        ("cube_md5", pa.list_(pa.string())),
+    ]
+    + [(f"{bound}_{name}", value_type(name)) for name in _RANGE_COLUMNS for bound in ("min", "max")]
+)
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _stat_value(value, kind: pa.DataType):
+    """A footer statistic as a plain value of manifest type `kind`."""
+    if value is None:
+        return None
+    if pa.types.is_integer(kind):
+        return int(value)
+    if pa.types.is_floating(kind):
+        return float(value)
+    if pa.types.is_boolean(kind):
+        return bool(value)
+    return str(value)
+
+
+def file_md5(path: Path) -> str:
+    """Hex MD5 of the content of `path`."""
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def has_cube(out: Path, pfile: Path) -> bool:
+    """Whether every cube table has a file for snapshot file `pfile`."""
+    rel = pfile.relative_to(out / "prices")
+    return all((out / CUBE_DIR / name / rel).exists() for name in CUBE_TABLES)
+
+
+def _cube_fields(out: Path, pfile: Path) -> dict:
+    """The manifest's `cube*` fields for snapshot file `pfile`."""
+    if not has_cube(out, pfile):
+        return {"cube": False, "cube_bytes": None, "cube_md5": None}
+    rel = pfile.relative_to(out / "prices")
+    paths = [out / CUBE_DIR / name / rel for name in CUBE_TABLES]
+    return {"cube": True, "cube_bytes": [path.stat().st_size for path in paths],
+            "cube_md5": [file_md5(path) for path in paths]}
+
+
+def manifest_entry(out: Path, pfile: Path) -> dict:
+    """Manifest row for one snapshot file, from its footer alone."""
+    meta = pq.read_metadata(pfile)
+    ranges = {}
+    for rg in range(meta.num_row_groups):
+        group = meta.row_group(rg)
+        for i in range(group.num_columns):
+            column = group.column(i)
+            stats = column.statistics
+            if stats is None or not stats.has_min_max:
+                continue
+            lo, hi = ranges.get(column.path_in_schema, (stats.min, stats.max))
+            ranges[column.path_in_schema] = (min(lo, stats.min), max(hi, stats.max))
+    file_md = meta.metadata or {}
+    ts = ranges.get("timestamp", (None, None))[1]
+    if ts is None and b"snapshot_timestamp_utc" in file_md:
+        ts = datetime.fromisoformat(file_md[b"snapshot_timestamp_utc"].decode())
+    if ts is not None and ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)  # naive timestamps are UTC
+    entry = {
+        "path": pfile.relative_to(out / "prices").as_posix(),
+        "dt": datetime.strptime(pfile.parent.name, "dt=%Y-%m-%d").date(),
+        "timestamp": ts,
+        "row_count": meta.num_rows,
+        "bytes": pfile.stat().st_size,
+        "schema_version": (file_md.get(b"schema_version") or b"1.0").decode(),
+        "md5": file_md5(pfile),
+        **_cube_fields(out, pfile),
+    }
+    for name in _RANGE_COLUMNS:
+        lo, hi = ranges.get(name, (None, None))
+        kind = value_type(name)
+        entry[f"min_{name}"] = _stat_value(lo, kind)
+        entry[f"max_{name}"] = _stat_value(hi, kind)
+    return entry
+
+
+def update_snapshot_manifest(out: Path, files: Optional[list] = None) -> Path:
+    """Add `files` to `<out>/manifest/snapshots.parquet`, or rebuild it.
+
+    Args:
+        out: Dataset root (holds `prices/`).
+        files: Snapshot files to add or refresh. None rebuilds the manifest
+            from every file under `out/prices`, reusing the entries of files
+            whose content is unchanged; only do that on a complete local tree.
+
+    Returns:
+        The manifest path. It is written atomically, sorted by timestamp.
+    """
+    path = out / SNAPSHOT_MANIFEST
+    entries = {}
+    if path.exists():
+        entries = {e["path"]: e for e in pq.read_table(path).to_pylist()}
+    if files is None:
+        known, entries = entries, {}
+        for pfile in sorted((out / "prices").glob("dt=*/*.parquet")):
+            rel = pfile.relative_to(out / "prices").as_posix()
+            entry = known.get(rel)
+            if entry is None or entry.get("md5") != file_md5(pfile):
+                entry = manifest_entry(out, pfile)
+            else:
+                entry.update(_cube_fields(out, pfile))
+            entries[rel] = entry
+    else:
+        for pfile in files:
+            entry = manifest_entry(out, Path(pfile))
+            entries[entry["path"]] = entry
+
+    rows = sorted(entries.values(), key=lambda e: (e["timestamp"] or _EPOCH, e["path"]))
+    table = pa.Table.from_pylist(rows, schema=MANIFEST_SCHEMA)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    pq.write_table(table, tmp, compression="zstd")
+    os.replace(tmp, path)
+    return path
+
+
+def snapshot_summary(table: pa.Table) -> Optional[dict]:
+    """What one snapshot file's rows contribute to `latest/stats.json`.
+
+    Returns None for an empty snapshot (it has no timestamp to count).
+    """
+    if not table.num_rows:
+        return None
+    columns = {name: table[name].to_pylist() for name in table.column_names}
+    if "quality" not in columns:
+        columns["quality"] = [
+            quality_tag(c, g, m)
+            for c, g, m in zip(columns["gpu_count"], columns["gpu_type"], columns["gpu_memory_gb"])
+        ]
+    if "region_group" not in columns:
+        lookup = regions.lookup_table()
+        columns["region_group"] = [
+            lookup.get(key, (None,) * 5)[4] for key in zip(columns["provider"], columns["region"])
+        ]
+    ok = [quality == "ok" for quality in columns["quality"]]
+    ts = columns["timestamp"][0]
+    summary = {
+        "timestamp": ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc),
+        "rows": table.num_rows,
+        "providers": {p for p in columns["provider"] if p is not None},
+        "gpu_types": {g for g in columns["gpu_type"] if g is not None},
+    }
+    for name in ("gpu_type", "provider", "region_group"):
+        summary[f"ok_{name}"] = Counter(
+            v for v, is_ok in zip(columns[name], ok) if is_ok and v is not None
+        )
+    return summary
+
+
+def fold_stats(stats: Optional[dict], summary: Optional[dict]) -> dict:
+    """`stats` (the parsed stats.json, or None) with one more snapshot added.
+
+    Snapshots no newer than `stats["last_snapshot"]` are already counted and
+    leave it unchanged, so re-publishing a snapshot is harmless.
+    """
+    stats = stats or {
+        "first_snapshot": None, "last_snapshot": None, "snapshots": 0, "total_records": 0,
+        "providers": 0, "gpu_types": 0, "provider_names": [], "gpu_type_names": [],
+        "provider_last_seen": {},
+        "ok_listings": {"gpu_type": {}, "provider": {}, "region_group": {}},
+    }
+    if summary is None:
+        return stats
+    # str() of an aware datetime, as DuckDB TIMESTAMPTZ values print in the app.
+    ts = str(summary["timestamp"])
+    last = stats["last_snapshot"]
+    if last and summary["timestamp"] <= datetime.fromisoformat(last):
+        return stats
+
+    stats["first_snapshot"] = stats["first_snapshot"] or ts
+    stats["last_snapshot"] = ts
+    stats["snapshots"] += 1
+    stats["total_records"] += summary["rows"]
+    stats["provider_names"] = sorted(set(stats["provider_names"]) | summary["providers"])
+    stats["gpu_type_names"] = sorted(set(stats["gpu_type_names"]) | summary["gpu_types"])
+    stats["providers"] = len(stats["provider_names"])
+    stats["gpu_types"] = len(stats["gpu_type_names"])
+    for provider in summary["ok_provider"]:
+        stats["provider_last_seen"][provider] = ts
+    for name, counts in stats["ok_listings"].items():
+        for value, n in summary[f"ok_{name}"].items():
+            counts[value] = counts.get(value, 0) + n
+    stats["updated_at_utc"] = datetime.now(timezone.utc).isoformat()
+    return stats
+
+
+def rebuild_latest_stats(out: Path) -> Optional[dict]:
+    """stats.json content folded from every snapshot file under `out/prices`.
+
+    Only meaningful on a complete local tree. None if there are no rows.
+    """
+    stats = None
+    wanted = ("timestamp", "provider", "gpu_type", "gpu_count", "gpu_memory_gb", "region",
+              "quality", "region_group")
+    for pfile in sorted((out / "prices").glob("dt=*/*.parquet")):
+        present = set(pq.read_schema(pfile).names)
+        table = pq.read_table(pfile, columns=[c for c in wanted if c in present], partitioning=None)
+        summary = snapshot_summary(table)
+        if summary is not None:
+            stats = fold_stats(stats, summary)
+    return stats
+
+
+def publish_latest(out: Path, pfile: Path, stats: Optional[dict]) -> None:
+    """Copy `pfile` to `<out>/latest/latest.parquet` and write `stats`
+    (unless None) to `<out>/latest/stats.json`, each atomically."""
+    target = out / LATEST_SNAPSHOT
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    shutil.copyfile(pfile, tmp)
+    os.replace(tmp, target)
+    if stats is not None:
+        target = out / LATEST_STATS
+        tmp = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(stats, indent=2, sort_keys=True) + "\n")
+        os.replace(tmp, target)
+
+
+# ---------------------------------------------------------------------------
+# Daily aggregate cube: <out>/cube/<table>/dt=YYYY-MM-DD/<snapshot file name>
+# ---------------------------------------------------------------------------
+
+CUBE_VERSION = b"1"
+_CUBE_MEASURES = [
+    ("listings", pa.int64()),
+    ("priced", pa.int64()),       # listings with a $/GPU-hour
+    ("price_sum", pa.float64()),  # of $/GPU-hour = price_per_hour / gpu_count
+    ("price_min", pa.float64()),
+    ("price_max", pa.float64()),
+]
+CUBE_KEYS = {
+    "daily": ("timestamp", "gpu_type", "provider", "region_group", "is_spot", "quality"),
+    # quality = 'ok' only; region is region_canonical, else the raw region.
+    "regional": ("timestamp", "gpu_type", "provider", "region", "region_group"),
+    # Spot listings (quality = 'ok') paired with every on-demand listing of
+    # the same provider, instance_type and region; grouped by the spot side.
+    "spread": ("timestamp", "provider", "gpu_type"),
+}
+CUBE_SCHEMAS = {
+    "daily": pa.schema(
+        [(name, value_type(name)) for name in CUBE_KEYS["daily"]]
+        + _CUBE_MEASURES
+        + [("sketch_bins", pa.list_(pa.int32())), ("sketch_counts", pa.list_(pa.int64()))]
+    ),
+    "regional": pa.schema(
+        [(name, value_type(name)) for name in CUBE_KEYS["regional"]] + _CUBE_MEASURES
+    ),
+    "spread": pa.schema(
+        [(name, value_type(name)) for name in CUBE_KEYS["spread"]]
+        + [("pairs", pa.int64())]
+        + [(f"{side}_{m}", kind) for side in ("spot", "on_demand", "spread")
+           for m, kind in (("priced", pa.int64()), ("sum", pa.float64()))]
+    ),
+}
+
+
+def _per_gpu(price, gpu_count) -> Optional[float]:
+    """price / gpu_count with SQL float semantics (x / 0 is ±inf or NaN)."""
+    if price is None or gpu_count is None:
+        return None
+    if gpu_count == 0:
+        return math.copysign(math.inf, price) if price else math.nan
+    return price / gpu_count
+
+
+class _Measures:
+    """Count, sum, min and max of one group's $/GPU-hour values."""
+
+    __slots__ = ("listings", "priced", "total", "lo", "hi", "bins")
+
+    def __init__(self, sketch: bool = False):
+        self.listings = self.priced = 0
+        self.total = 0.0
+        self.lo = self.hi = None
+        self.bins = Counter() if sketch else None
+
+    def add(self, value: Optional[float]) -> None:
+        self.listings += 1
+        if value is None:
+            return
+        self.priced += 1
+        self.total += value
+        # NaN sorts above every number, as in DuckDB's MIN/MAX.
+        key = lambda v: (math.isnan(v), v)  # noqa: E731
+        self.lo = value if self.lo is None else min(self.lo, value, key=key)
+        self.hi = value if self.hi is None else max(self.hi, value, key=key)
+        if self.bins is not None and not math.isnan(value):
+            self.bins[price_sketch.bin_index(value)] += 1
+
+    def row(self) -> dict:
+        row = {"listings": self.listings, "priced": self.priced, "price_sum": self.total,
+               "price_min": self.lo, "price_max": self.hi}
+        if self.bins is not None:
+            bins = sorted(self.bins)
+            row["sketch_bins"] = bins
+            row["sketch_counts"] = [self.bins[k] for k in bins]
+        return row
+
+
+def _cube_table(name: str, groups: dict) -> pa.Table:
+    """Cube table `name` from {key tuple: measures}, sorted by key."""
+    order = lambda key: tuple((v is None, v) for v in key)  # noqa: E731
+    rows = []
+    for key in sorted(groups, key=order):
+        measures = groups[key]
+        if isinstance(measures, _Measures):
+            measures = measures.row()
+        rows.append({**dict(zip(CUBE_KEYS[name], key)), **measures})
+    return pa.Table.from_pylist(rows, schema=CUBE_SCHEMAS[name]).replace_schema_metadata(
+        {b"cube_version": CUBE_VERSION})
+
+
+def cube_tables(table: pa.Table) -> dict:
+    """The cube tables ({name: table}, see `CUBE_SCHEMAS`) of one snapshot.
+
+    `table` is a snapshot at the current schema version. Region fields the
+    snapshot left NULL are filled from `data/regions.csv`, as the app's
+    `prices` view does.
+    """
+    columns = {name: table[name].to_pylist() for name in (
+        "timestamp", "provider", "instance_type", "gpu_type", "gpu_count", "region",
+        "price_per_hour", "is_spot", "quality", "region_canonical", "region_group")}
+    lookup = regions.lookup_table()
+    daily, regional = defaultdict(lambda: _Measures(sketch=True)), defaultdict(_Measures)
+    on_demand = defaultdict(list)
+    rows = [dict(zip(columns, values)) for values in zip(*columns.values())]
+    for r in rows:
+        known = lookup.get((r["provider"], r["region"]), (None,) * 5)
+        if r["region_canonical"] is None:
+            r["region_canonical"] = known[0]
+        if r["region_group"] is None:
+            r["region_group"] = known[4]
+        r["p"] = _per_gpu(r["price_per_hour"], r["gpu_count"])
+        daily[(r["timestamp"], r["gpu_type"], r["provider"], r["region_group"],
+               r["is_spot"], r["quality"])].add(r["p"])
+        if r["quality"] == "ok":
+            regional[(r["timestamp"], r["gpu_type"], r["provider"],
+                      r["region"] if r["region_canonical"] is None else r["region_canonical"],
+                      r["region_group"])].add(r["p"])
+        key = (r["timestamp"], r["provider"], r["instance_type"], r["region"])
+        if r["is_spot"] is False and None not in key:
+            on_demand[key].append(r)
+
+    spread = {}
+    for s in rows:
+        if not (s["is_spot"] and s["quality"] == "ok"):
+            continue
+        pair_key = (s["timestamp"], s["provider"], s["instance_type"], s["region"])
+        for od in on_demand.get(pair_key, ()):
+            group = spread.setdefault((s["timestamp"], s["provider"], s["gpu_type"]), {
+                name: 0 if name.endswith(("pairs", "priced")) else 0.0
+                for name in CUBE_SCHEMAS["spread"].names[3:]})
+            group["pairs"] += 1
+            diff = (None if od["price_per_hour"] is None or s["price_per_hour"] is None
+                    else od["price_per_hour"] - s["price_per_hour"])
+            for side, value in (("spot", s["p"]), ("on_demand", od["p"]),
+                                ("spread", _per_gpu(diff, s["gpu_count"]))):
+                if value is not None:
+                    group[f"{side}_priced"] += 1
+                    group[f"{side}_sum"] += value
+
+    return {"daily": _cube_table("daily", daily),
+            "regional": _cube_table("regional", regional),
+            "spread": _cube_table("spread", spread)}
+
+
+def write_cube(out: Path, pfile: Path, table: Optional[pa.Table] = None) -> list:
+    """Write the cube files of snapshot file `pfile`, each atomically.
+
+    Args:
+        out: Dataset root (holds `prices/`).
+        pfile: The snapshot file under `out/prices`.
+        table: Its contents, if already in memory.
+
+    Returns:
+        The paths written, one per cube table.
+    """
+    if table is None:
+        table = pq.read_table(pfile, partitioning=None)
+    rel = pfile.relative_to(out / "prices")
+    paths = []
+    for name, cube in cube_tables(table).items():
+        path = out / CUBE_DIR / name / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        pq.write_table(cube, tmp, compression="zstd")
+        os.replace(tmp, path)
+        paths.append(path)
+    return paths
+
+
+def build_missing_cubes(out: Path, force: bool = False) -> tuple:
+    """Write the cube of every snapshot file under `out/prices` lacking one.
+
+    Files not at `FILE_SCHEMA_VERSION` are skipped with a warning; upgrade
+    them with `upgrade_parquet_schema.py` first.
+
+    Returns:
+        (built, skipped) counts.
+    """
+    built = skipped = 0
+    for pfile in sorted((out / "prices").glob("dt=*/*.parquet")):
+        if not force and has_cube(out, pfile):
+            continue
+        version = (pq.read_schema(pfile).metadata or {}).get(b"schema_version")
+        if version != FILE_SCHEMA_VERSION:
+            print(f"WARNING: no cube for {pfile}: schema_version {version!r}, expected "
+                  f"{FILE_SCHEMA_VERSION!r}", file=sys.stderr)
+            skipped += 1
+            continue
+        write_cube(out, pfile)
+        built += 1
+    return built, skipped
@@ -10,7 +10,6 @@ import sys
 import argparse
 from datetime import datetime
 from pathlib import Path
-from collections import defaultdict
 
 try:
     import matplotlib
@@ -35,39 +34,19 @@ def get_gpu_summary(exclude_unknown=True):
         Dictionary with GPU type statistics
     """
     db = PriceDatabase()
-    instances = db.get_latest_prices()
     
-    if not instances:
-        return {}
-    
-    summary = defaultdict(lambda: {
-        'count': 0,
-        'total_price': 0,
-        'prices_per_gpu': [],
-        'providers': set()
-    })
-    
-    for inst in instances:
-        gpu_type = inst.gpu_type
-        
+    result = {}
+    for gpu_type, stats in db.get_rollup_summary('gpu_type').items():
         # Skip unknown GPUs if requested
         if exclude_unknown and gpu_type.upper() == 'UNKNOWN':
             continue
-            
-        summary[gpu_type]['count'] += 1
-        summary[gpu_type]['total_price'] += inst.price_per_hour
-        summary[gpu_type]['prices_per_gpu'].append(inst.price_per_gpu_hour)
-        summary[gpu_type]['providers'].add(inst.provider)
-    
-    # Calculate averages
-    result = {}
-    for gpu_type, data in summary.items():
+        
         result[gpu_type] = {
-            'count': data['count'],
-            'avg_price_per_gpu': sum(data['prices_per_gpu']) / len(data['prices_per_gpu']),
-            'min_price_per_gpu': min(data['prices_per_gpu']),
-            'max_price_per_gpu': max(data['prices_per_gpu']),
-            'providers': len(data['providers'])
+            'count': stats['count'],
+            'avg_price_per_gpu': stats['avg_price_per_gpu'],
+            'min_price_per_gpu': stats['min_price_per_gpu'],
+            'max_price_per_gpu': stats['max_price_per_gpu'],
+            'providers': len(stats['providers'])
         }
     
     return result
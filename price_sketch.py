@@ -0,0 +1,86 @@
+"""Log-bucket quantile sketch of $/GPU-hour values.
+
+Bin k counts the values in (GAMMA^(k-1), GAMMA^k]; its representative value
+2·GAMMA^k / (GAMMA + 1) is within ALPHA (1%) of any value in the bin, so every
+quantile read back from the counts is too. Sketches of different groups or
+snapshots merge by adding counts. Two sentinel bins hold the values no
+logarithm reaches: ZERO_BIN those <= 0, INF_BIN +inf (a price over zero
+GPUs); both still count towards every rank. NaN goes in no bin.
+
+Shared by the `price_rollups` table (`database.py`, bins as JSON dicts) and
+the `daily` table of the Parquet cube (`parquet_publish.py` writes
+`sketch_bins` / `sketch_counts`, `streamlit_app/queries.py` reads medians
+back with `bin_value_sql()`), so both agree on every bin.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Dict, Optional
+
+import numpy as np
+
+
+ALPHA = 0.01
+GAMMA = (1 + ALPHA) / (1 - ALPHA)
+ZERO_BIN = -(2**31 - 1)
+INF_BIN = 2**31 - 1
+
+_LOG_GAMMA = math.log(GAMMA)
+
+
+def bin_index(value: float) -> Optional[int]:
+    """The bin of `value`; None for NaN, which no bin holds."""
+    if math.isnan(value):
+        return None
+    if value <= 0:
+        return ZERO_BIN
+    if math.isinf(value):
+        return INF_BIN
+    return math.ceil(math.log(value) / _LOG_GAMMA)
+
+
+def bin_indexes(values: np.ndarray) -> np.ndarray:
+    """`bin_index()` of every non-NaN entry of `values`, as int64."""
+    values = values[~np.isnan(values)]
+    bins = np.full(len(values), INF_BIN, dtype=np.int64)
+    bins[values <= 0] = ZERO_BIN
+    finite = (values > 0) & np.isfinite(values)
+    bins[finite] = np.ceil(np.log(values[finite]) / _LOG_GAMMA)
+    return bins
+
+
+def bin_value(k: int) -> float:
+    """The representative value of bin `k`."""
+    if k == ZERO_BIN:
+        return 0.0
+    if k == INF_BIN:
+        return math.inf
+    return 2 * GAMMA**k / (GAMMA + 1)
+
+
+def bin_value_sql(bin_expr: str) -> str:
+    """SQL for `bin_value()` of the integer expression `bin_expr`."""
+    return (
+        f"(CASE {bin_expr} WHEN {ZERO_BIN} THEN 0.0"
+        f" WHEN {INF_BIN} THEN 'inf'::DOUBLE"
+        f" ELSE 2 * POW({GAMMA!r}, {bin_expr}) / ({GAMMA!r} + 1) END)"
+    )
+
+
+def quantile(counts: Dict[int, int], q: float) -> Optional[float]:
+    """Approximate q-quantile (0..1) of the values counted in {bin: count}.
+
+    Returns the value of the bin holding rank q·(n - 1), or None when the
+    sketch is empty.
+    """
+    total = sum(counts.values())
+    if not total:
+        return None
+    rank = q * (total - 1)
+    seen = 0
+    for k in sorted(counts):
+        seen += counts[k]
+        if rank < seen:
+            return bin_value(k)
+    return None
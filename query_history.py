@@ -133,7 +133,8 @@ def show_snapshots(days: int = 30):
     print(f"\n{Fore.CYAN}Collection Snapshots{Style.RESET_ALL}")
     print(f"Period: Last {days} days\n")
     
-    headers = ['Timestamp', 'Instances', 'Providers', 'GPU Types', 'Min $', 'Max $', 'Avg $']
+    headers = ['Timestamp', 'Instances', 'Providers', 'GPU Types', 'Min $', 'Max $', 'Avg $',
+               'Status', 'Parquet']
     rows = []
     
     for snap in snapshots:
@@ -144,7 +145,9 @@ def show_snapshots(days: int = 30):
             snap['gpu_types_count'],
             f"${snap['min_price']:.2f}",
             f"${snap['max_price']:.2f}",
-            f"${snap['avg_price']:.2f}"
+            f"${snap['avg_price']:.2f}",
+            snap['status'],
+            'yes' if snap['parquet_emitted'] else 'no'
         ])
     
     print(tabulate(rows, headers=headers, tablefmt='grid'))
@@ -182,6 +185,26 @@ def show_database_stats():
     print()
 
 
+def verify_database_stats(repair: bool = False) -> bool:
+    """Compare cached statistics with a full recount. Returns True if they match."""
+    db = PriceDatabase()
+    drift = db.verify_stats(repair=repair)
+
+    if not drift:
+        print(f"{Fore.GREEN}Statistics cache matches the data{Style.RESET_ALL}")
+        return True
+
+    headers = ['Statistic', 'Cached', 'Actual']
+    rows = [[key, cached, actual] for key, (cached, actual) in drift.items()]
+    print(f"\n{Fore.YELLOW}Statistics cache has drifted:{Style.RESET_ALL}\n")
+    print(tabulate(rows, headers=headers, tablefmt='grid'))
+    if repair:
+        print(f"\n{Fore.GREEN}Cache rewritten from the data{Style.RESET_ALL}\n")
+        return True
+    print(f"\nRun with --repair-stats to rewrite the cache.\n")
+    return False
+
+
 def main():
     """Main entry point."""
     parser = argparse.ArgumentParser(
@@ -198,12 +221,19 @@ Examples:
   # Show price trends for A100 GPUs
   python query_history.py --trends --gpu-type A100 --days 30
   
+  # Check the cached statistics against a full recount
+  python query_history.py --verify-stats
+  
   # Show price history for specific instance
   python query_history.py --instance p3.2xlarge --provider aws --region us-east-1
         """
     )
     
     parser.add_argument('--stats', action='store_true', help='Show database statistics')
+    parser.add_argument('--verify-stats', action='store_true',
+                        help='Recount statistics and report drift from the cache (exit 1 on drift)')
+    parser.add_argument('--repair-stats', action='store_true',
+                        help='Recount statistics and rewrite the cache')
     parser.add_argument('--snapshots', action='store_true', help='Show collection snapshots')
     parser.add_argument('--trends', action='store_true', help='Show price trends')
     parser.add_argument('--instance', type=str, help='Specific instance type to query')
@@ -214,6 +244,10 @@ Examples:
     
     args = parser.parse_args()
     
+    if args.verify_stats or args.repair_stats:
+        if not verify_database_stats(repair=args.repair_stats):
+            sys.exit(1)
+    
     if args.stats:
         show_database_stats()
     
@@ -229,7 +263,8 @@ Examples:
             sys.exit(1)
         show_instance_history(args.instance, args.provider, args.region, days=args.days)
     
-    if not any([args.stats, args.snapshots, args.trends, args.instance]):
+    if not any([args.stats, args.snapshots, args.trends, args.instance,
+                args.verify_stats, args.repair_stats]):
         # Default: show stats
         show_database_stats()
 
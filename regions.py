@@ -3,6 +3,7 @@
 Loads `data/regions.csv` once and exposes:
 
 - `load_regions()` — returns the lookup as a DataFrame (cached on disk path).
+- `lookup_table()` — the same lookup as a `(provider, raw_region)` dict.
 - `enrich(df)` — left-joins canonical fields onto a DataFrame keyed on
   `(provider, region)`. Adds columns: `region_canonical`, `country`,
   `region_lat`, `region_lon`, `region_group`. Missing rows in the lookup
@@ -65,6 +66,25 @@ def load_regions(path: Optional[Path | str] = None) -> pd.DataFrame:
     return df
 
 
+@functools.lru_cache(maxsize=1)
+def lookup_table() -> dict:
+    """`(provider, raw_region) -> ENRICHED_COLUMNS values` as a plain dict.
+
+    For row-wise enrichment without pandas (e.g. building Arrow tables).
+    Missing values are None. Cached like `load_regions()`.
+    """
+    df = load_regions()
+    values = df[["region_canonical", "country", "lat", "lon", "region_group"]]
+    values = values.astype(object).where(values.notna(), None)
+    return {
+        key: tuple(row)
+        for key, row in zip(
+            zip(df["provider"], df["raw_region"]),
+            values.itertuples(index=False, name=None),
+        )
+    }
+
+
 def enrich(df: pd.DataFrame, region_col: str = "region") -> pd.DataFrame:
     """Add canonical region fields to `df` via left-join on (provider, region).
 
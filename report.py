@@ -6,9 +6,10 @@ Displays prices and availability grouped by GPU type.
 
 import sys
 import argparse
+from collections import Counter, defaultdict
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
-from collections import defaultdict
+import numpy as np
 from tabulate import tabulate
 from colorama import init, Fore, Style
 
@@ -32,17 +33,13 @@ class GPUHuntReporter:
         Returns:
             Dictionary mapping GPU type to list of instances
         """
-        instances = self.db.get_latest_prices()
-        
-        by_gpu = defaultdict(list)
-        for inst in instances:
-            by_gpu[inst.gpu_type].append(inst)
+        batch = self.db.get_latest_batch()
         
         # Sort instances within each GPU type by price
-        for gpu_type in by_gpu:
-            by_gpu[gpu_type].sort(key=lambda x: x.price_per_hour)
-        
-        return dict(by_gpu)
+        return {
+            gpu_type: group.take(np.argsort(group.price_per_hour, kind='stable')).to_instances()
+            for gpu_type, group in batch.groups('gpu_type')
+        }
     
     def generate_summary_report(self, verbose: bool = False):
         """
@@ -67,10 +64,10 @@ class GPUHuntReporter:
         print(f"Providers: {stats['providers']}")
         print(f"GPU Types: {stats['gpu_types']}\n")
         
-        # Group by GPU type
-        by_gpu = self.get_latest_by_gpu()
+        # Per-GPU-type aggregates come from the snapshot's rollups
+        summary = self.db.get_rollup_summary('gpu_type')
         
-        if not by_gpu:
+        if not summary:
             print(f"{Fore.YELLOW}No instances found in latest snapshot.{Style.RESET_ALL}")
             return
         
@@ -80,19 +77,17 @@ class GPUHuntReporter:
         print(f"{Fore.CYAN}{'='*80}{Style.RESET_ALL}\n")
         
         summary_rows = []
-        for gpu_type in sorted(by_gpu.keys()):
-            instances = by_gpu[gpu_type]
-            prices = [i.price_per_hour for i in instances]
-            providers = set(i.provider for i in instances)
+        for gpu_type in sorted(summary.keys()):
+            stats = summary[gpu_type]
             
             summary_rows.append([
                 gpu_type,
-                len(instances),
-                ', '.join(sorted(providers)),
-                f"${min(prices):.3f}",
-                f"${max(prices):.3f}",
-                f"${sum(prices)/len(prices):.3f}",
-                f"${min(i.price_per_gpu_hour for i in instances):.3f}"
+                stats['count'],
+                ', '.join(stats['providers']),
+                f"${stats['min_price']:.3f}",
+                f"${stats['max_price']:.3f}",
+                f"${stats['avg_price']:.3f}",
+                f"${stats['min_price_per_gpu']:.3f}"
             ])
         
         headers = ['GPU Type', 'Instances', 'Providers', 'Min $/hr', 'Max $/hr', 'Avg $/hr', 'Best $/GPU/hr']
@@ -105,13 +100,26 @@ class GPUHuntReporter:
             print(f"{Fore.CYAN}Detailed Pricing by GPU Type{Style.RESET_ALL}")
             print(f"{Fore.CYAN}{'='*80}{Style.RESET_ALL}\n")
             
-            for gpu_type in sorted(by_gpu.keys()):
-                instances = by_gpu[gpu_type]
+            # Listing-level detail: stream the snapshot, keeping only the
+            # 10 cheapest listings per GPU type
+            counts = defaultdict(int)
+            cheapest = defaultdict(list)
+            for batch in self.db.iter_latest_batches():
+                for gpu_type, group in batch.groups('gpu_type'):
+                    counts[gpu_type] += len(group)
+                    top = group.take(np.argsort(group.price_per_hour, kind='stable')[:10])
+                    cheapest[gpu_type] = sorted(
+                        cheapest[gpu_type] + top.to_instances(),
+                        key=lambda inst: inst.price_per_hour,
+                    )[:10]
+            
+            for gpu_type in sorted(counts.keys()):
+                count = counts[gpu_type]
                 
-                print(f"\n{Fore.YELLOW}=== {gpu_type} ({len(instances)} instances) ==={Style.RESET_ALL}\n")
+                print(f"\n{Fore.YELLOW}=== {gpu_type} ({count} instances) ==={Style.RESET_ALL}\n")
                 
                 detail_rows = []
-                for inst in instances[:10]:  # Show top 10 cheapest
+                for inst in cheapest[gpu_type]:  # Show top 10 cheapest
                     detail_rows.append([
                         self._colorize_provider(inst.provider),
                         inst.instance_type,
@@ -126,8 +134,8 @@ class GPUHuntReporter:
                 headers = ['Provider', 'Instance', 'GPUs', 'vCPUs', 'RAM (GB)', 'Region', '$/hr', '$/GPU/hr']
                 print(tabulate(detail_rows, headers=headers, tablefmt='grid'))
                 
-                if len(instances) > 10:
-                    print(f"\n  ... and {len(instances) - 10} more instances")
+                if count > 10:
+                    print(f"\n  ... and {count - 10} more instances")
     
     def generate_provider_report(self):
         """Generate report grouped by provider."""
@@ -135,25 +143,29 @@ class GPUHuntReporter:
         print(f"{Fore.CYAN}Prices by Provider{Style.RESET_ALL}")
         print(f"{Fore.CYAN}{'='*80}{Style.RESET_ALL}\n")
         
-        instances = self.db.get_latest_prices()
-        
-        by_provider = defaultdict(list)
-        for inst in instances:
-            by_provider[inst.provider].append(inst)
+        # Per provider: [count, GPU types, min, max, sum], folded over chunks
+        totals = {}
+        for batch in self.db.iter_latest_batches():
+            for provider, group in batch.groups('provider'):
+                prices = group.price_per_hour
+                acc = totals.setdefault(provider, [0, set(), np.inf, -np.inf, 0.0])
+                acc[0] += len(group)
+                acc[1].update(group.gpu_type.categories[np.unique(group.gpu_type.codes)])
+                acc[2] = min(acc[2], prices.min())
+                acc[3] = max(acc[3], prices.max())
+                acc[4] += prices.sum()
         
         provider_rows = []
-        for provider in sorted(by_provider.keys()):
-            insts = by_provider[provider]
-            prices = [i.price_per_hour for i in insts]
-            gpu_types = set(i.gpu_type for i in insts)
+        for provider in sorted(totals.keys()):
+            count, gpu_types, min_price, max_price, price_sum = totals[provider]
             
             provider_rows.append([
                 self._colorize_provider(provider),
-                len(insts),
+                count,
                 len(gpu_types),
-                f"${min(prices):.3f}",
-                f"${max(prices):.3f}",
-                f"${sum(prices)/len(prices):.3f}"
+                f"${min_price:.3f}",
+                f"${max_price:.3f}",
+                f"${price_sum / count:.3f}"
             ])
         
         headers = ['Provider', 'Instances', 'GPU Types', 'Min $/hr', 'Max $/hr', 'Avg $/hr']
@@ -174,20 +186,25 @@ class GPUHuntReporter:
             print(f"{Fore.CYAN}GPU Type: {gpu_type}{Style.RESET_ALL}")
         print(f"{Fore.CYAN}{'='*80}{Style.RESET_ALL}\n")
         
-        instances = self.db.get_latest_prices()
-        
-        if gpu_type:
-            instances = [i for i in instances if gpu_type.upper() in i.gpu_type.upper()]
-        
-        if not instances:
+        # Stream the snapshot, keeping the `limit` cheapest per GPU hour;
+        # only those rows become objects
+        deals = []
+        for batch in self.db.iter_latest_batches():
+            if gpu_type:
+                # Match against the (few) distinct GPU names, then map to rows.
+                wanted = np.array([gpu_type.upper() in g.upper() for g in batch.gpu_type.categories],
+                                  dtype=bool)
+                batch = batch.take(wanted[batch.gpu_type.codes])
+            cheapest = np.argsort(batch.price_per_gpu_hour, kind='stable')[:limit]
+            deals = sorted(deals + batch.take(cheapest).to_instances(),
+                           key=lambda inst: inst.price_per_gpu_hour)[:limit]
+        
+        if not deals:
             print(f"{Fore.YELLOW}No instances found.{Style.RESET_ALL}")
             return
         
-        # Sort by price per GPU hour
-        instances.sort(key=lambda x: x.price_per_gpu_hour)
-        
         deal_rows = []
-        for inst in instances[:limit]:
+        for inst in deals:
             deal_rows.append([
                 self._colorize_provider(inst.provider),
                 inst.instance_type,
@@ -210,25 +227,28 @@ class GPUHuntReporter:
         print(f"{Fore.CYAN}Availability by Region{Style.RESET_ALL}")
         print(f"{Fore.CYAN}{'='*80}{Style.RESET_ALL}\n")
         
-        instances = self.db.get_latest_prices()
-        
-        by_region = defaultdict(lambda: defaultdict(int))
-        for inst in instances:
-            by_region[inst.region][inst.gpu_type] += inst.gpu_count
+        # GPUs per GPU type within each region, folded over chunks
+        by_region = defaultdict(Counter)
+        for batch in self.db.iter_latest_batches():
+            gpu_names = batch.gpu_type.categories
+            for region, group in batch.groups('region'):
+                gpu_counts = np.bincount(group.gpu_type.codes, weights=group.gpu_count,
+                                         minlength=len(gpu_names))
+                present = np.bincount(group.gpu_type.codes, minlength=len(gpu_names)) > 0
+                for name, n in zip(gpu_names[present], gpu_counts[present]):
+                    by_region[region][name] += int(n)
         
         region_rows = []
         for region in sorted(by_region.keys()):
             gpu_counts = by_region[region]
-            total_gpus = sum(gpu_counts.values())
-            gpu_types = len(gpu_counts)
-            
-            top_gpu = max(gpu_counts.items(), key=lambda x: x[1])
+            # Ties go to the alphabetically first GPU type
+            top = min(gpu_counts, key=lambda name: (-gpu_counts[name], name))
             
             region_rows.append([
                 region,
-                total_gpus,
-                gpu_types,
-                f"{top_gpu[0]} ({top_gpu[1]})"
+                sum(gpu_counts.values()),
+                len(gpu_counts),
+                f"{top} ({gpu_counts[top]})"
             ])
         
         headers = ['Region', 'Total GPUs', 'GPU Types', 'Most Common']
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Build the daily aggregate cube for a local copy of the snapshot tier.
+
+For every `<out>/prices/dt=YYYY-MM-DD/<file>.parquet` without one, writes
+`<out>/cube/<table>/dt=YYYY-MM-DD/<file>.parquet` for each cube table
+(`daily`, `regional`, `spread`; see `CUBE_SCHEMAS` in `parquet_publish.py`),
+then refreshes the snapshot manifest's `cube` column. The dashboard reads a
+lookback window from the cube only when every snapshot in it has its cube
+files, and aggregates the listings otherwise.
+
+`emit_latest_parquet.py` writes the cube of each new snapshot and
+`sqlite_to_parquet.py` that of each converted one, so this is needed once,
+for trees published before the cube existed. The rebuilt manifest also
+records the content hashes (`md5`, `cube_md5`) that older manifests lack;
+the dashboard's file cache reads files without one from S3 every time.
+Upload the cube files before the manifest.
+
+Snapshot files must be at the current schema version; run
+`scripts/upgrade_parquet_schema.py` first on older trees.
+
+Usage:
+    python3 scripts/build_daily_cube.py --out data/parquet [--force]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from parquet_publish import build_missing_cubes, update_snapshot_manifest  # noqa: E402
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--out", default="data/parquet", help="dataset root (holds prices/)")
+    ap.add_argument("--force", action="store_true",
+                    help="rebuild the cube files of every snapshot, not just missing ones")
+    args = ap.parse_args()
+
+    out = Path(args.out)
+    if not any((out / "prices").glob("dt=*/*.parquet")):
+        print(f"ERROR: no snapshot files under {out / 'prices'}", file=sys.stderr)
+        sys.exit(2)
+    built, skipped = build_missing_cubes(out, force=args.force)
+    manifest = update_snapshot_manifest(out)
+    print(f"Done. built={built} skipped={skipped}; manifest {manifest}")
+
+
+if __name__ == "__main__":
+    main()
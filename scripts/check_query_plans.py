@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""Fail if any PriceDatabase read query falls back to a full table scan.
+
+Calls every read method of `PriceDatabase` with SQL tracing on, runs
+`EXPLAIN QUERY PLAN` on each statement it issued, and reports every plan
+step that SCANs, or builds an automatic index over, one of the tables that
+grow with the number of listings (`gpu_prices`, `price_facts`,
+`listing_intervals`, `price_rollups`).
+Small catalog tables (`price_snapshots`, `dim_*`) may be scanned.
+
+By default a synthetic database is built in each storage layout, so the
+check covers all of them; pass `--db` to check a real file (read-only use,
+but opening it applies pending migrations).
+
+Exits 1 if any offending plan is found.
+
+Usage:
+    python3 scripts/check_query_plans.py
+    python3 scripts/check_query_plans.py --db data/gpu_prices.db -v
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from database import (  # noqa: E402
+    STORAGE_CLUSTERED, STORAGE_INTERVALS, STORAGE_ROWS, STORAGE_SHARDED, STORAGE_STAR,
+    PriceDatabase,
+)
+from models import GPUInstance  # noqa: E402
+
+LARGE_TABLES = {"gpu_prices", "price_facts", "listing_intervals", "price_rollups"}
+
+_ALIAS_RE = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+# A SCAN reads the whole table (or index); an AUTOMATIC index is built by
+# reading the whole table first.
+_SCAN_RE = re.compile(r"^(?:SCAN (\w+)|SEARCH (\w+) USING AUTOMATIC)")
+
+
+def build_synthetic(path: Path, snapshots: int = 6, listings: int = 400) -> None:
+    """Row-storage database with a few snapshots of varying prices."""
+    db = PriceDatabase(str(path))
+    start = datetime(2024, 1, 1)
+    for k in range(snapshots):
+        db.ingest_prices([
+            GPUInstance(
+                provider=["aws", "gcp", "vastai", "runpod"][i % 4],
+                instance_type=f"type-{i}",
+                gpu_type=["H100", "A100", "L4", "RTX4090"][i % 4],
+                gpu_count=1 + i % 8,
+                gpu_memory_gb=80,
+                vcpus=8,
+                ram_gb=64.0,
+                region=["us-east-1", "eu-west-1"][i % 2],
+                price_per_hour=1.0 + (i + k * (i % 3)) % 40 / 4,
+                is_spot=bool(i % 2),
+            )
+            for i in range(listings)
+        ], timestamp=start + timedelta(hours=12 * k))
+    db.close()
+
+
+def read_calls(db: PriceDatabase) -> list:
+    """(label, callable) for every read path, with arguments that match data."""
+    sample = db.get_latest_prices()
+    inst = sample[0] if sample else None
+    calls = [
+        ("get_latest_prices", lambda: db.get_latest_prices()),
+        ("get_latest_prices(provider)", lambda: db.get_latest_prices(inst.provider if inst else "aws")),
+        ("get_latest_batch(provider)", lambda: db.get_latest_batch(inst.provider if inst else "aws")),
+        ("get_price_trends", lambda: db.get_price_trends(days=36500)),
+        ("get_price_trends(gpu_type)", lambda: db.get_price_trends(gpu_type="H100", days=36500)),
+        ("get_price_trends(provider)", lambda: db.get_price_trends(provider="aws", days=36500)),
+        ("get_price_trends(gpu_type, provider)",
+         lambda: db.get_price_trends(gpu_type="H100", provider="aws", days=36500)),
+        ("get_snapshots", lambda: db.get_snapshots(days=36500)),
+        ("get_rollup_summary", lambda: db.get_rollup_summary()),
+        ("get_rollup_summary(provider)", lambda: db.get_rollup_summary("provider")),
+        ("get_stats", lambda: db.get_stats()),
+    ]
+    if inst:
+        calls.append(("get_price_history", lambda: db.get_price_history(
+            inst.instance_type, inst.provider, inst.region, days=36500)))
+    return calls
+
+
+def traced_statements(db: PriceDatabase, call) -> list:
+    """SQL statements (with bound values expanded) issued by one call."""
+    conn = db._connect()
+    issued = []
+    conn.set_trace_callback(issued.append)
+    try:
+        call()
+    finally:
+        conn.set_trace_callback(None)
+    return [sql for sql in issued if sql.lstrip().upper().startswith("SELECT")]
+
+
+def full_scans(conn, sql: str, aliases: dict) -> list:
+    """Plan steps of `sql` that scan a large table."""
+    found = []
+    for row in conn.execute("EXPLAIN QUERY PLAN " + sql):
+        detail = row[-1]
+        match = _SCAN_RE.match(detail)
+        name = match and (match.group(1) or match.group(2))
+        if name and aliases.get(name, name) in LARGE_TABLES:
+            found.append(detail)
+    return found
+
+
+def view_aliases(conn) -> dict:
+    """Alias -> table for the FROM/JOIN clauses of every view."""
+    aliases = {}
+    for (sql,) in conn.execute("SELECT sql FROM sqlite_master WHERE type = 'view'"):
+        for table, alias in _ALIAS_RE.findall(sql):
+            aliases[alias or table] = table
+    return aliases
+
+
+def check(db: PriceDatabase, verbose: bool = False) -> int:
+    """Print the findings for one database; return the number of failures."""
+    conn = db._connect()
+    base_aliases = view_aliases(conn)
+    failures = 0
+    for label, call in read_calls(db):
+        for sql in traced_statements(db, call):
+            aliases = dict(base_aliases)
+            for table, alias in _ALIAS_RE.findall(sql):
+                aliases[alias or table] = table
+            scans = full_scans(conn, sql, aliases)
+            failures += bool(scans)
+            if verbose or scans:
+                print(f"  [{'FAIL' if scans else 'ok'}] {label}: {' '.join(sql.split())[:120]}")
+                for detail in scans:
+                    print(f"      {detail}")
+    return failures
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--db", help="check this database instead of synthetic ones")
+    ap.add_argument("-v", "--verbose", action="store_true", help="list every statement")
+    args = ap.parse_args()
+
+    failures = 0
+    if args.db:
+        with PriceDatabase(args.db) as db:
+            print(f"{args.db} ({db.storage} storage)")
+            failures += check(db, args.verbose)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            for storage in (STORAGE_ROWS, STORAGE_CLUSTERED, STORAGE_INTERVALS, STORAGE_STAR,
+                            STORAGE_SHARDED):
+                path = Path(tmp) / f"{storage}.db"
+                build_synthetic(path)
+                with PriceDatabase(str(path)) as db:
+                    if storage == STORAGE_CLUSTERED:
+                        db.convert_to_clustered()
+                    elif storage == STORAGE_INTERVALS:
+                        db.convert_to_intervals()
+                    elif storage == STORAGE_STAR:
+                        db.convert_to_star()
+                    elif storage == STORAGE_SHARDED:
+                        db.split_into_shards()
+                    print(f"{storage} storage")
+                    failures += check(db, args.verbose)
+
+    if failures:
+        print(f"FAILED: {failures} statement(s) scan a large table.", file=sys.stderr)
+        sys.exit(1)
+    print("OK: no read query scans a large table.")
+
+
+if __name__ == "__main__":
+    main()
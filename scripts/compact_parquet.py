@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""Compact closed months of per-snapshot Parquet files into monthly files.
+
+Reads `<out>/prices/dt=YYYY-MM-DD/*.parquet` and, for every closed month,
+writes `<out>/compacted/prices_YYYY-MM.parquet`: all of the month's rows with
+a stored `dt` column, sorted by day and then by the snapshot sort keys, in the
+same statistics-rich layout as snapshot files. A month is closed once a
+snapshot from a later month exists.
+
+`<out>/compacted/manifest.json` records the compacted months and
+`compacted_through`, the last day they cover; readers
+(`parquet_dataset.prices_relation`) read compacted files up to that day and
+snapshot files after it. Only a contiguous run of months from the start of
+the history is compacted, so that boundary is a single date.
+
+Idempotent: a month is rebuilt only if its number of snapshot files changed
+since it was compacted (e.g. after a backfill). Files and the manifest are
+written under a temporary name and renamed into place; upload the monthly
+files before the manifest.
+
+Snapshot files must be at the current schema version; run
+`scripts/upgrade_parquet_schema.py` first on older trees.
+
+Usage:
+    python3 scripts/compact_parquet.py --out data/parquet [--dry-run]
+"""
+
+from __future__ import annotations
+
+import argparse
+import calendar
+import json
+import os
+import sys
+from datetime import date, datetime, timezone
+from itertools import groupby
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from parquet_dataset import COMPACTED_DIR, COMPACTION_MANIFEST  # noqa: E402  — repo root
+from parquet_publish import (  # noqa: E402  — repo root
+    FILE_SCHEMA_VERSION, SNAPSHOT_SCHEMA, SORT_KEYS, file_md5, parquet_write_options,
+    provenance, sort_rows,
+)
+
+MONTHLY_SORT_KEYS = ("dt",) + SORT_KEYS
+MONTHLY_SCHEMA = SNAPSHOT_SCHEMA.append(pa.field("dt", pa.date32()))
+
+
+def snapshot_files_by_month(out: Path) -> dict:
+    """{'YYYY-MM': [snapshot files]} for the per-snapshot tier under `out`."""
+    files = sorted((out / "prices").glob("dt=*/*.parquet"))
+    month_of = lambda f: f.parent.name[len("dt="):][:7]  # noqa: E731
+    return {month: list(group) for month, group in groupby(files, key=month_of)}
+
+
+def load_manifest(out: Path) -> dict:
+    path = out / COMPACTION_MANIFEST
+    if path.exists():
+        return json.loads(path.read_text())
+    return {"months": []}
+
+
+def _write_atomic(path: Path, write) -> None:
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def compact_month(out: Path, month: str, files: list, prov: dict) -> dict:
+    """Write one month's compacted file; returns its manifest entry.
+
+    Raises:
+        ValueError: if a snapshot file is not at the current schema version.
+    """
+    tables = []
+    for f in files:
+        table = pq.read_table(f, partitioning=None)
+        version = (table.schema.metadata or {}).get(b"schema_version")
+        if version != FILE_SCHEMA_VERSION:
+            raise ValueError(f"{f} has schema_version {version!r}, expected "
+                             f"{FILE_SCHEMA_VERSION!r}; run upgrade_parquet_schema.py")
+        day = date.fromisoformat(f.parent.name[len("dt="):])
+        table = table.append_column("dt", pa.array([day] * table.num_rows, type=pa.date32()))
+        tables.append(table.replace_schema_metadata(None))
+    table = sort_rows(pa.concat_tables(tables), MONTHLY_SORT_KEYS).cast(MONTHLY_SCHEMA)
+
+    days = sorted({f.parent.name[len("dt="):] for f in files})
+    table = table.replace_schema_metadata({
+        b"compacted_month": month.encode(),
+        b"snapshot_count": str(len(files)).encode(),
+        b"row_count": str(table.num_rows).encode(),
+        b"first_dt": days[0].encode(),
+        b"last_dt": days[-1].encode(),
+        b"emitted_at_utc": datetime.now(timezone.utc).isoformat().encode(),
+        b"git_sha": prov["git_sha"].encode(),
+        b"schema_version": FILE_SCHEMA_VERSION,
+    })
+    relative = f"{COMPACTED_DIR}/prices_{month}.parquet"
+    path = out / relative
+    path.parent.mkdir(parents=True, exist_ok=True)
+    _write_atomic(path, lambda tmp: pq.write_table(
+        table, tmp, **parquet_write_options(table, MONTHLY_SORT_KEYS)))
+    return {
+        "month": month,
+        "path": relative,
+        "first_dt": days[0],
+        "last_dt": days[-1],
+        "snapshots": len(files),
+        "rows": table.num_rows,
+        "bytes": path.stat().st_size,
+        "md5": file_md5(path),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--out", default="data/parquet", help="dataset root (holds prices/)")
+    ap.add_argument("--dry-run", action="store_true")
+    args = ap.parse_args()
+
+    out = Path(args.out)
+    by_month = snapshot_files_by_month(out)
+    if not by_month:
+        print(f"ERROR: no snapshot files under {out / 'prices'}", file=sys.stderr)
+        sys.exit(2)
+    closed = sorted(by_month)[:-1]
+
+    manifest = load_manifest(out)
+    done = {entry["month"]: entry for entry in manifest["months"]}
+    prov = provenance()
+    entries, rebuilt, hashed = [], 0, 0
+    for month in closed:
+        files = by_month[month]
+        entry = done.get(month)
+        if entry is None or entry["snapshots"] != len(files):
+            if args.dry_run:
+                print(f"would compact {month}: {len(files)} snapshot files")
+                rebuilt += 1
+                continue
+            try:
+                entry = compact_month(out, month, files, prov)
+            except ValueError as e:
+                # Stop at the first gap: compacted months must stay contiguous.
+                print(f"WARNING: not compacting {month} or later: {e}", file=sys.stderr)
+                break
+            rebuilt += 1
+            print(f"compacted {month}: {entry['snapshots']} snapshots, "
+                  f"{entry['rows']:,} rows, {entry['bytes']:,} bytes")
+        elif "md5" not in entry:
+            # Entry from before the manifest recorded content hashes, which
+            # the app's file cache keys on: hash the existing file.
+            if not args.dry_run:
+                entry = dict(entry, md5=file_md5(out / entry["path"]))
+            hashed += 1
+        entries.append(entry)
+
+    if args.dry_run:
+        print(f"{rebuilt}/{len(closed)} closed months need compacting, {hashed} hashing.")
+        return
+    if not rebuilt and not hashed:
+        print(f"Nothing to do: {len(entries)} closed months already compacted.")
+        return
+
+    last = entries[-1]["month"]
+    year, mon = int(last[:4]), int(last[5:])
+    manifest = {
+        "version": 1,
+        "updated_at_utc": datetime.now(timezone.utc).isoformat(),
+        "compacted_through": date(year, mon, calendar.monthrange(year, mon)[1]).isoformat(),
+        "months": entries,
+    }
+    path = out / COMPACTION_MANIFEST
+    _write_atomic(path, lambda tmp: tmp.write_text(json.dumps(manifest, indent=2) + "\n"))
+    print(f"Done. compacted={rebuilt} hashed={hashed} months; tier covers through "
+          f"{manifest['compacted_through']}.")
+
+
+if __name__ == "__main__":
+    main()
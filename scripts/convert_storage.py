@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Convert a gpu_prices.db between PriceDatabase storage layouts.
+
+`--to intervals` replays every snapshot into `listing_intervals` (one row
+per run of unchanged listing attributes). `--to star` moves the provider,
+instance type, GPU type, region and quality strings into integer-keyed
+`dim_*` tables and keeps a slim `price_facts` table of keys and prices.
+Either way `gpu_prices` becomes a view with the original columns, so
+existing readers (`query_history.py`, `scripts/sqlite_to_parquet.py`) keep
+working. `--to clustered` keeps one row per listing per snapshot but
+rebuilds `gpu_prices` as a WITHOUT ROWID table ordered by snapshot key.
+The conversion is one transaction; the file is VACUUMed afterwards unless
+`--no-vacuum` is given.
+
+`--to sharded` splits a row or clustered database into one SQLite file per
+month under `<db stem>_shards/` next to it (e.g. `data/gpu_prices_shards/
+2025-01.db`). The catalog, rollups and statistics stay in the main file;
+shards are attached only when a query's time window reaches them. Each
+month is committed on its own, so an interrupted split can be re-run.
+
+Back up the database first: the previous layout is dropped.
+
+Usage:
+    python3 scripts/convert_storage.py --db data/gpu_prices.db --to intervals
+    python3 scripts/convert_storage.py --db data/gpu_prices.db --to star
+    python3 scripts/convert_storage.py --db data/gpu_prices.db --to clustered
+    python3 scripts/convert_storage.py --db data/gpu_prices.db --to sharded
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from database import (  # noqa: E402
+    STORAGE_CLUSTERED, STORAGE_INTERVALS, STORAGE_SHARDED, STORAGE_STAR, PriceDatabase,
+)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--db", default="data/gpu_prices.db")
+    ap.add_argument("--to", required=True,
+                    choices=[STORAGE_INTERVALS, STORAGE_STAR, STORAGE_CLUSTERED, STORAGE_SHARDED])
+    ap.add_argument("--no-vacuum", action="store_true")
+    args = ap.parse_args()
+
+    if not Path(args.db).exists():
+        print(f"ERROR: {args.db} does not exist.", file=sys.stderr)
+        sys.exit(2)
+
+    size_before = Path(args.db).stat().st_size
+    with PriceDatabase(args.db) as db:
+        if db.storage == args.to:
+            print(f"{args.db} already uses {args.to} storage; nothing to do.")
+            return
+        if args.to == STORAGE_SHARDED:
+            written = sum(db.split_into_shards().values())
+        elif args.to == STORAGE_STAR:
+            written = db.convert_to_star()
+        elif args.to == STORAGE_CLUSTERED:
+            written = db.convert_to_clustered()
+        else:
+            written = db.convert_to_intervals()
+        if not args.no_vacuum:
+            db._connect().execute("VACUUM")
+
+    size_after = Path(args.db).stat().st_size
+    print(f"Converted {args.db} to {args.to} storage: {written} rows written, "
+          f"{size_before / 1e6:.1f} MB -> {size_after / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,8 +5,23 @@ Used after `collect.py` to publish the day's snapshot. The resulting file is
 placed under `<out>/prices/dt=YYYY-MM-DD/snapshot_<UTC ISO>.parquet` so a
 subsequent `aws s3 sync` propagates only the new file to S3.
 
-Idempotent: if a Parquet file for the latest timestamp already exists, the
-script is a no-op and exits 0.
+Its daily aggregate cube files (`<out>/cube/<table>/dt=YYYY-MM-DD/...`,
+read by the dashboard's trend, spread and regional tabs) are written next,
+then the file is added to the snapshot manifest
+(`<out>/manifest/snapshots.parquet`), which readers use instead of listing
+the tree. The manifest is only updated, never created here: CI starts from
+an empty `<out>`, so a fresh manifest would list just the new file. Fetch
+the published manifest first, or build one from a complete tree with
+`sqlite_to_parquet.py`.
+
+It then publishes the fixed-path `<out>/latest/latest.parquet` (a copy of the
+snapshot) and folds the snapshot into `<out>/latest/stats.json` (dataset-wide
+counts the dashboard's landing page reads). Like the manifest, stats.json is
+only updated, never started from a partial tree.
+
+Idempotent: if a Parquet file for the latest timestamp already exists, no
+snapshot is written (the manifest entry is still refreshed) and the script
+exits 0.
 
 Usage:
     python3 scripts/emit_latest_parquet.py --db data/gpu_prices.db --out data/parquet
@@ -15,36 +30,95 @@ Usage:
 from __future__ import annotations
 
 import argparse
+import json
 import sqlite3
 import sys
+from datetime import datetime
 from pathlib import Path
 
+import pyarrow.parquet as pq
+
 sys.path.insert(0, str(Path(__file__).resolve().parent))
 
-from sqlite_to_parquet import write_snapshot  # noqa: E402
+from sqlite_to_parquet import mark_emitted, snapshot_timestamps, write_snapshot  # noqa: E402
+
+import instrumentation  # noqa: E402  — repo root, put on sys.path by sqlite_to_parquet
+from database import PriceDatabase  # noqa: E402
+from parquet_dataset import LATEST_STATS, SNAPSHOT_MANIFEST  # noqa: E402
+from parquet_publish import (  # noqa: E402
+    fold_stats, has_cube, partition_dir, publish_latest, snapshot_filename, snapshot_summary,
+    update_snapshot_manifest, write_cube,
+)
 
 
 def main() -> None:
     ap = argparse.ArgumentParser(description=__doc__)
     ap.add_argument("--db", required=True)
     ap.add_argument("--out", required=True)
+    ap.add_argument(
+        "--metrics-file",
+        help="Append this run's stage metrics as one JSON line here "
+             "(default: stderr)",
+    )
     args = ap.parse_args()
 
     out = Path(args.out)
     out.mkdir(parents=True, exist_ok=True)
 
+    run = instrumentation.start_run("emit")
     conn = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
-    row = conn.execute("SELECT MAX(timestamp) FROM gpu_prices").fetchone()
-    latest = row[0] if row else None
+    with run.stage("latest_lookup"):
+        found = snapshot_timestamps(conn, limit=1)
+    latest = found[0] if found else None
     if not latest:
         print("ERROR: SQLite DB has no rows; nothing to emit.", file=sys.stderr)
         sys.exit(2)
+    run.snapshot_timestamp = datetime.fromisoformat(latest)
 
     written = write_snapshot(conn, latest, out)
     if written:
         print(f"Wrote Parquet for snapshot {latest}")
     else:
         print(f"Snapshot {latest} already present; nothing to do.")
+    conn.close()
+    mark_emitted(args.db, [latest])
+
+    ts = run.snapshot_timestamp
+    pfile = partition_dir(out, ts) / snapshot_filename(ts)
+    table = None
+    if pfile.exists() and not has_cube(out, pfile):
+        with run.stage("cube_build"):
+            table = pq.read_table(pfile, partitioning=None)
+            write_cube(out, pfile, table)
+    if not (out / SNAPSHOT_MANIFEST).exists():
+        print(f"WARNING: no snapshot manifest at {out / SNAPSHOT_MANIFEST}; not "
+              "creating one from a partial tree (readers fall back to listing).",
+              file=sys.stderr)
+    elif pfile.exists():
+        with run.stage("manifest_update"):
+            update_snapshot_manifest(out, [pfile])
+
+    if pfile.exists():
+        with run.stage("latest_publish"):
+            stats_path = out / LATEST_STATS
+            stats = None
+            if stats_path.exists():
+                if table is None:
+                    table = pq.read_table(pfile, partitioning=None)
+                stats = fold_stats(json.loads(stats_path.read_text()), snapshot_summary(table))
+            else:
+                print(f"WARNING: no {stats_path}; publishing latest.parquet only "
+                      "(the app computes statistics from the data).", file=sys.stderr)
+            publish_latest(out, pfile, stats)
+
+    run.emit(args.metrics_file)
+    # The snapshot read above is read-only; metrics go through a separate
+    # writable handle so a metrics failure can't affect the emitted file.
+    try:
+        with PriceDatabase(args.db) as db:
+            db.record_run(run)
+    except Exception as e:
+        print(f"WARNING: could not record run metrics: {e}", file=sys.stderr)
 
 
 if __name__ == "__main__":
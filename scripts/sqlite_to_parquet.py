@@ -4,56 +4,62 @@
 Layout (Hive partitioning):
     <out>/prices/dt=YYYY-MM-DD/snapshot_<UTC ISO>.parquet
 
-One Parquet file per distinct `timestamp` value in the source `gpu_prices`
-table. Re-runs are idempotent: existing files are skipped.
+One Parquet file per snapshot in the source database's `price_snapshots`
+catalog (or per distinct `gpu_prices.timestamp` for pre-catalog files).
+Re-runs are idempotent: existing files are skipped. Emitted snapshots are
+flagged in the catalog (`parquet_emitted`). Afterwards the snapshot manifest
+(`<out>/manifest/snapshots.parquet`, see `parquet_dataset.py`) and the
+`<out>/latest/` artifacts (newest snapshot, summary stats) are rebuilt from
+the files in the tree, and the daily aggregate cube (`<out>/cube/`) is
+written for every snapshot that lacks it.
+
+Files are written under a temporary name and renamed into place, so the
+output tree doubles as the checkpoint: an interrupted backfill re-run with
+the same arguments resumes after the last completed snapshot.
+
+By default the rows are read in one ordered pass and each snapshot file is
+built from the stream as Arrow record batches (`export_snapshots`).
+`--workers N` instead converts snapshot by snapshot on a pool of N
+processes, each with its own read-only connection.
+
+Either way, rows go from SQLite straight into Arrow (no pandas) and every
+file is cast to `SNAPSHOT_SCHEMA` (the file format, manifest, stats and cube
+code live in `parquet_publish.py` at the repo root, shared with the other
+publishing scripts), so the published tree has one schema.
+Rows are sorted by `SORT_KEYS` and written with statistics, a page index
+and Bloom filters (`parquet_write_options`), so filtered reads such as
+`gpu_type = 'H100'` skip most row groups and pages.
 
 Usage:
     python3 scripts/sqlite_to_parquet.py --db data/gpu_prices.db --out data/parquet
     python3 scripts/sqlite_to_parquet.py --db ... --out ... --limit-snapshots 5
+    python3 scripts/sqlite_to_parquet.py --db ... --out ... --workers 8
 """
 
 from __future__ import annotations
 
 import argparse
 import os
-import shutil
+from concurrent.futures import ProcessPoolExecutor
 import sqlite3
-import subprocess
 import sys
-from datetime import datetime, timezone
+from datetime import datetime
+from itertools import groupby
 from pathlib import Path
+from typing import Optional
 
-import pandas as pd
 import pyarrow as pa
 import pyarrow.parquet as pq
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import instrumentation  # noqa: E402  — sibling module at repo root
 import regions  # noqa: E402  — sibling module at repo root
-
-
-def _git_sha() -> str:
-    """Return the current commit SHA, or empty string if unavailable."""
-    if not shutil.which("git"):
-        return ""
-    try:
-        out = subprocess.check_output(
-            ["git", "rev-parse", "HEAD"],
-            cwd=Path(__file__).resolve().parent.parent,
-            stderr=subprocess.DEVNULL,
-            timeout=2,
-        )
-        return out.decode().strip()
-    except (subprocess.SubprocessError, FileNotFoundError):
-        return ""
-
-
-def _gpuhunt_version() -> str:
-    """Return the installed gpuhunt version, or empty string if missing."""
-    try:
-        import importlib.metadata as md
-        return md.version("gpuhunt")
-    except Exception:
-        return ""
+from database import PriceDatabase, shard_path  # noqa: E402
+from parquet_publish import (  # noqa: E402  — sibling module at repo root
+    SNAPSHOT_SCHEMA, build_missing_cubes, file_metadata, parquet_write_options, partition_dir,
+    provenance, publish_latest, quality_tag, rebuild_latest_stats, snapshot_filename, sort_rows,
+    update_snapshot_manifest, value_type,
+)
 
 
 SNAPSHOT_COLUMNS = (
@@ -74,81 +80,290 @@ SNAPSHOT_COLUMNS = (
 )
 
 
-def _existing_columns(conn: sqlite3.Connection) -> set:
+def _existing_columns(conn: sqlite3.Connection, table: str = "gpu_prices") -> set:
     """Names of columns that actually exist in gpu_prices today."""
-    return {row[1] for row in conn.execute("PRAGMA table_info(gpu_prices)")}
+    schema, _, name = table.rpartition(".")
+    pragma = f"PRAGMA {schema}.table_info({name})" if schema else f"PRAGMA table_info({name})"
+    return {row[1] for row in conn.execute(pragma)}
+
 
+def _snapshot_table(conn: sqlite3.Connection, ts_str: str) -> str:
+    """Table holding one snapshot: gpu_prices, or its monthly shard.
 
-def snapshot_filename(ts: datetime) -> str:
-    return f"snapshot_{ts.strftime('%Y%m%dT%H%M%SZ')}.parquet"
+    A sharded database has no gpu_prices in the main file. The snapshot's
+    shard is attached read-only as `shard`, replacing the previous one, so
+    walking snapshots in order attaches each month once.
+    """
+    if conn.execute("SELECT 1 FROM main.sqlite_master WHERE name = 'gpu_prices'").fetchone():
+        return "gpu_prices"
+    attached = {row[1]: row[2] for row in conn.execute("PRAGMA database_list")}
+    path = shard_path(attached["main"], ts_str)
+    if attached.get("shard") != str(path):
+        if "shard" in attached:
+            conn.execute("DETACH DATABASE shard")
+        conn.execute("ATTACH DATABASE ? AS shard", (f"file:{path}?mode=ro",))
+    return "shard.gpu_prices"
 
 
-def partition_dir(out: Path, ts: datetime) -> Path:
-    return out / "prices" / f"dt={ts.strftime('%Y-%m-%d')}"
+def snapshot_timestamps(conn: sqlite3.Connection, limit: Optional[int] = None) -> list:
+    """Snapshot timestamps, newest first.
 
+    Read from the price_snapshots catalog when the DB has one (schema v7+);
+    older files fall back to a DISTINCT scan of gpu_prices.
+    """
+    catalog = {row[1] for row in conn.execute("PRAGMA table_info(price_snapshots)")}
+    if "status" in catalog:
+        sql = ("SELECT timestamp FROM price_snapshots WHERE total_instances > 0 "
+               "ORDER BY timestamp DESC")
+    else:
+        sql = "SELECT DISTINCT timestamp FROM gpu_prices ORDER BY timestamp DESC"
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    return [r[0] for r in conn.execute(sql)]
+
+
+def mark_emitted(db_path: str, timestamps: list) -> None:
+    """Set the catalog's parquet_emitted flag; warn rather than fail."""
+    try:
+        with PriceDatabase(db_path) as db:
+            db.mark_parquet_emitted(timestamps)
+    except Exception as e:
+        print(f"WARNING: could not mark snapshots as emitted: {e}", file=sys.stderr)
 
-def write_snapshot(conn: sqlite3.Connection, ts_str: str, out: Path) -> bool:
-    """Write one snapshot file. Returns True if written, False if skipped."""
+
+def _write_table(table: pa.Table, pfile: Path) -> None:
+    """Write `table` to `pfile` atomically (recorded as parquet_write)."""
+    pfile.parent.mkdir(parents=True, exist_ok=True)
+    with instrumentation.active().stage("parquet_write", rows=table.num_rows) as rec:
+        # Rename into place so a killed run never leaves a truncated file
+        # that a resumed run would mistake for a finished one.
+        tmp = pfile.with_name(f".{pfile.name}.{os.getpid()}.tmp")
+        pq.write_table(table, tmp, **parquet_write_options(table))
+        os.replace(tmp, pfile)
+        rec["bytes_written"] = pfile.stat().st_size
+
+
+def write_snapshot(
+    conn: sqlite3.Connection,
+    ts_str: str,
+    out: Path,
+    prov: Optional[dict] = None,
+    column_cache: Optional[dict] = None,
+) -> bool:
+    """Write one snapshot file. Returns True if written, False if skipped.
+
+    `prov` is `provenance()` (computed here if omitted); `column_cache`
+    remembers each source table's columns across calls on one connection.
+    """
     ts = datetime.fromisoformat(ts_str)
     pdir = partition_dir(out, ts)
     pfile = pdir / snapshot_filename(ts)
     if pfile.exists():
         return False
+    if prov is None:
+        prov = provenance()
 
     # Source schema may pre-date the `quality` migration (older SQLite DBs).
-    # Select only what the table actually has, then synthesize defaults.
-    have = _existing_columns(conn)
+    # Select only what the table actually has; _arrow_rows fills the rest.
+    source = _snapshot_table(conn, ts_str)
+    if column_cache is None:
+        have = _existing_columns(conn, source)
+    else:
+        if source not in column_cache:
+            column_cache[source] = _existing_columns(conn, source)
+        have = column_cache[source]
     cols_to_select = [c for c in SNAPSHOT_COLUMNS if c in have]
-    df = pd.read_sql_query(
-        f"SELECT {', '.join(cols_to_select)} FROM gpu_prices WHERE timestamp = ?",
-        conn,
-        params=[ts_str],
-    )
-    if "quality" not in df.columns:
-        # Source SQLite predates the migration — synthesize quality tags so
-        # the published Parquet still carries accurate flags for CPU-only
-        # and Unknown-GPU rows.
-        df["quality"] = [
-            "cpu_only" if (c is None or c <= 0)
-            else "unknown_gpu" if g == "Unknown"
-            else "missing_memory" if (m is None or pd.isna(m))
-            else "ok"
-            for c, g, m in zip(df["gpu_count"], df["gpu_type"], df["gpu_memory_gb"])
-        ]
-    df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
-    df["is_spot"] = df["is_spot"].astype(bool)
-    df["available"] = df["available"].astype("boolean")  # nullable
-    df = regions.enrich(df)  # adds region_canonical/country/region_*/region_group
-    pdir.mkdir(parents=True, exist_ok=True)
-
-    # Embed provenance in Parquet file metadata. Keys/values must be bytes
-    # for pyarrow; we keep the surface small and self-describing.
-    quality_summary = (
-        df["quality"].value_counts().to_dict() if "quality" in df.columns else {}
-    )
-    file_metadata = {
-        b"snapshot_timestamp": str(ts).encode(),
-        b"snapshot_timestamp_utc": ts.astimezone(timezone.utc).isoformat().encode()
-            if ts.tzinfo
-            else ts.isoformat().encode(),
-        b"emitted_at_utc": datetime.now(timezone.utc).isoformat().encode(),
-        b"git_sha": _git_sha().encode(),
-        b"gpuhunt_version": _gpuhunt_version().encode(),
-        b"row_count": str(len(df)).encode(),
-        b"quality_summary": ",".join(
-            f"{k}={v}" for k, v in sorted(quality_summary.items())
-        ).encode(),
-        b"schema_version": b"1.1",
-    }
-    table = pa.Table.from_pandas(df, preserve_index=False)
-    # Merge our keys into any existing pandas metadata so downstream
-    # readers (e.g. pandas.read_parquet) keep their type roundtrip info.
-    existing = table.schema.metadata or {}
-    table = table.replace_schema_metadata({**existing, **file_metadata})
-    pq.write_table(table, pfile, compression="zstd")
+    with instrumentation.active().stage("parquet_read") as rec:
+        rows = conn.execute(
+            f"SELECT {', '.join(cols_to_select)} FROM {source} WHERE timestamp = ?",
+            (ts_str,),
+        ).fetchall()
+        rec["rows"] = len(rows)
+    table = pa.Table.from_batches([_arrow_rows(rows, cols_to_select, ts)])
+    _write_table(_finish_table(table, ts, prov), pfile)
     return True
 
 
+def _arrow_rows(rows: list, columns: list, ts: datetime) -> pa.RecordBatch:
+    """One snapshot's SQLite rows (selected `columns`) as a RecordBatch.
+
+    Every row has timestamp `ts`. Missing `quality` is synthesized with
+    `quality_tag`; region fields are added later, per snapshot.
+    """
+    values = dict(zip(columns, zip(*rows))) if rows else {name: () for name in columns}
+    if "quality" not in values:
+        values["quality"] = [
+            quality_tag(c, g, m)
+            for c, g, m in zip(values["gpu_count"], values["gpu_type"], values["gpu_memory_gb"])
+        ]
+    arrays = []
+    for name in SNAPSHOT_COLUMNS:
+        kind = value_type(name)
+        if name == "timestamp":
+            arrays.append(pa.array([ts] * len(rows), type=kind))
+        elif name not in values:
+            arrays.append(pa.nulls(len(rows), type=kind))
+        elif kind == pa.bool_():
+            arrays.append(pa.array([None if v is None else bool(v) for v in values[name]], type=kind))
+        else:
+            arrays.append(pa.array(values[name], type=kind))
+    return pa.RecordBatch.from_arrays(arrays, names=list(SNAPSHOT_COLUMNS))
+
+
+def _enrich_arrow(table: pa.Table) -> pa.Table:
+    """Append regions.ENRICHED_COLUMNS via the (provider, region) lookup."""
+    lookup = regions.lookup_table()
+    missing = (None,) * len(regions.ENRICHED_COLUMNS)
+    matched = [
+        lookup.get(key, missing)
+        for key in zip(table["provider"].to_pylist(), table["region"].to_pylist())
+    ]
+    columns = list(zip(*matched)) if matched else [()] * len(regions.ENRICHED_COLUMNS)
+    for name, values in zip(regions.ENRICHED_COLUMNS, columns):
+        table = table.append_column(name, pa.array(values, type=value_type(name)))
+    return table
+
+
+def _finish_table(table: pa.Table, ts: datetime, prov: dict) -> pa.Table:
+    """Enrich a snapshot from `_arrow_rows`, sort it by SORT_KEYS, cast it to
+    SNAPSHOT_SCHEMA and attach the file metadata (and nothing else: no
+    pandas metadata)."""
+    with instrumentation.active().stage("region_enrichment", rows=table.num_rows):
+        table = _enrich_arrow(table)
+    table = sort_rows(table)
+    quality = table["quality"].value_counts().to_pylist()
+    metadata = file_metadata(ts, table.num_rows,
+                              {q["values"]: q["counts"] for q in quality}, prov)
+    return table.cast(SNAPSHOT_SCHEMA).replace_schema_metadata(metadata)
+
+
+def export_snapshots(
+    conn: sqlite3.Connection,
+    out: Path,
+    timestamps: list,
+    prov: Optional[dict] = None,
+    chunk_size: int = 5000,
+):
+    """Write the missing files among `timestamps` in one ordered pass.
+
+    Instead of one indexed lookup per snapshot, the rows are streamed once
+    in timestamp order (per monthly shard for sharded databases), `fetchmany`
+    at a time, converted to Arrow record batches and cut at snapshot
+    boundaries. Memory is bounded by one snapshot plus one chunk.
+
+    Yields (timestamp, written) per snapshot: already-present files first,
+    then written ones in ascending order.
+    """
+    prov = prov or provenance()
+    missing = set()
+    for ts_str in timestamps:
+        ts = datetime.fromisoformat(ts_str)
+        if (partition_dir(out, ts) / snapshot_filename(ts)).exists():
+            yield ts_str, False
+        else:
+            missing.add(ts_str)
+    if not missing:
+        return
+
+    def flush(ts_str, batches):
+        ts = datetime.fromisoformat(ts_str)
+        table = _finish_table(pa.Table.from_batches(batches), ts, prov)
+        _write_table(table, partition_dir(out, ts) / snapshot_filename(ts))
+
+    # Sharded databases keep each month in its own file: one pass per month.
+    months = sorted({ts[:7] for ts in missing})
+    if _snapshot_table(conn, months[0]) == "gpu_prices":
+        passes = [sorted(missing)]
+    else:
+        passes = [sorted(ts for ts in missing if ts[:7] == month) for month in months]
+
+    for wanted in passes:
+        source = _snapshot_table(conn, wanted[0])
+        columns = [c for c in SNAPSHOT_COLUMNS if c in _existing_columns(conn, source)]
+        cursor = conn.execute(
+            f"SELECT {', '.join(columns)} FROM {source} "
+            "WHERE timestamp >= ? AND timestamp <= ? ORDER BY timestamp",
+            (wanted[0], wanted[-1]),
+        )
+        current, batches = None, []
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            for ts_str, group in groupby(rows, key=lambda row: row[0]):
+                if ts_str != current:
+                    if batches:
+                        flush(current, batches)
+                        missing.discard(current)
+                        yield current, True
+                    current, batches = ts_str, []
+                if ts_str in missing:
+                    batches.append(_arrow_rows(list(group), columns,
+                                               datetime.fromisoformat(ts_str)))
+        if batches:
+            flush(current, batches)
+            missing.discard(current)
+            yield current, True
+
+    # Catalogued snapshots with no rows have nothing to write.
+    for ts_str in sorted(missing):
+        yield ts_str, False
+
+
+# Per-process state for --workers: one read-only connection per worker.
+_worker: dict = {}
+
+
+def _init_worker(db_path: str, out: str, prov: dict) -> None:
+    _worker["conn"] = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    _worker["out"] = Path(out)
+    _worker["prov"] = prov
+    _worker["columns"] = {}
+
+
+def _convert_in_worker(ts_str: str) -> tuple:
+    written = write_snapshot(_worker["conn"], ts_str, _worker["out"],
+                             _worker["prov"], _worker["columns"])
+    return ts_str, written
+
+
+def convert(db_path: str, out: Path, timestamps: list, workers: int = 1,
+            checkpoint_every: int = 50):
+    """Convert `timestamps`, yielding (timestamp, written) as each finishes.
+
+    With workers > 1 the snapshots are spread over a process pool. Every
+    `checkpoint_every` results, the finished snapshots are flagged in the
+    catalog, so progress survives an interruption there as well as in
+    the output tree.
+    """
+    prov = provenance()
+    done = []
+    if workers > 1:
+        pool = ProcessPoolExecutor(workers, initializer=_init_worker,
+                                   initargs=(db_path, str(out), prov))
+        results = pool.map(_convert_in_worker, timestamps, chunksize=4)
+    else:
+        # In-process: one ordered pass over the rows, not a probe per snapshot.
+        pool = None
+        _init_worker(db_path, str(out), prov)
+        results = export_snapshots(_worker["conn"], out, timestamps, prov)
+    try:
+        for ts_str, written in results:
+            done.append(ts_str)
+            if len(done) >= checkpoint_every:
+                mark_emitted(db_path, done)
+                done = []
+            yield ts_str, written
+    finally:
+        # Skipped snapshots already have their file, so all of them are emitted.
+        if done:
+            mark_emitted(db_path, done)
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        else:
+            _worker.pop("conn").close()
+
+
 def main() -> None:
     ap = argparse.ArgumentParser(description=__doc__)
     ap.add_argument("--db", required=True, help="Path to source SQLite DB")
@@ -159,32 +374,39 @@ def main() -> None:
         default=None,
         help="Convert only the N most recent snapshots (debugging)",
     )
+    ap.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Convert on a pool of N processes (default: 1, in-process)",
+    )
     args = ap.parse_args()
 
     out = Path(args.out)
     out.mkdir(parents=True, exist_ok=True)
 
     conn = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
-    timestamps = [
-        r[0]
-        for r in conn.execute(
-            "SELECT DISTINCT timestamp FROM gpu_prices ORDER BY timestamp DESC"
-        )
-    ]
-    if args.limit_snapshots:
-        timestamps = timestamps[: args.limit_snapshots]
+    timestamps = snapshot_timestamps(conn, limit=args.limit_snapshots)
+    conn.close()
     print(f"{len(timestamps)} snapshots to convert -> {out}")
 
     written = skipped = 0
-    for i, ts_str in enumerate(timestamps, 1):
-        if write_snapshot(conn, ts_str, out):
+    results = convert(args.db, out, timestamps, workers=args.workers)
+    for i, (_, was_written) in enumerate(results, 1):
+        if was_written:
             written += 1
         else:
             skipped += 1
         if i % 10 == 0 or i == len(timestamps):
             print(f"  [{i}/{len(timestamps)}] written={written} skipped={skipped}")
 
-    print(f"Done. written={written} skipped={skipped}")
+    cubes, _ = build_missing_cubes(out)
+    manifest = update_snapshot_manifest(out)
+    stats = rebuild_latest_stats(out)
+    newest = sorted((out / "prices").glob("dt=*/*.parquet"))
+    if newest:
+        publish_latest(out, newest[-1], stats)
+    print(f"Done. written={written} skipped={skipped} cubes={cubes}; manifest {manifest}")
 
 
 if __name__ == "__main__":
@@ -1,5 +1,5 @@
 #!/usr/bin/env python3
-"""Upgrade pre-v1.1 Parquet snapshots in place to the current schema.
+"""Upgrade older Parquet snapshots in place to the current schema.
 
 Snapshot files written before schema v1.1 carry 13 columns. v1.1 (emitted by
 `sqlite_to_parquet.py` since 2026-07) adds:
@@ -10,10 +10,16 @@ Snapshot files written before schema v1.1 carry 13 columns. v1.1 (emitted by
                      — canonical region enrichment via `regions.enrich()`
 - file-level metadata (schema_version, row_count, quality_summary, ...)
 
-This script rewrites only files that are not already v1.1, casting them to the
-exact Arrow schema of a reference v1.1 file so the published tree stays
-byte-schema uniform (readers do not need `union_by_name`). Rewrites are
-atomic (tmp file + rename). Idempotent: a second run is a no-op.
+v1.2 keeps the v1.1 columns but pins their Arrow types (`SNAPSHOT_SCHEMA` in
+`sqlite_to_parquet.py`: dictionary-encoded low-cardinality strings, UTC
+timestamps) and drops the pandas schema metadata.
+
+This script rewrites only files that are not already at the current version,
+casting them to `SNAPSHOT_SCHEMA` and rewriting them in the same sorted,
+statistics-rich layout as new files, so the published tree stays byte-schema
+uniform (readers do not need `union_by_name`). Rewrites are atomic (tmp file
++ rename), and the snapshot manifest entries of rewritten files are refreshed
+when a manifest exists. Idempotent: a second run is a no-op.
 
 Usage:
     python3 scripts/upgrade_parquet_schema.py --root data/parquet/prices [--dry-run]
@@ -31,9 +37,13 @@ import pyarrow as pa
 import pyarrow.parquet as pq
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
-import regions  # noqa: E402  — sibling module at repo root
+import regions  # noqa: E402  — repo root
+from parquet_dataset import SNAPSHOT_MANIFEST  # noqa: E402
+from parquet_publish import (  # noqa: E402
+    FILE_SCHEMA_VERSION, SNAPSHOT_SCHEMA, parquet_write_options, sort_rows,
+    update_snapshot_manifest,
+)
 
-SCHEMA_VERSION = b"1.1"
 REGION_COLUMNS = ("region_canonical", "country", "region_lat", "region_lon", "region_group")
 
 
@@ -51,26 +61,18 @@ def synthesize_quality(df: pd.DataFrame) -> pd.Series:
     return df.apply(tag, axis=1)
 
 
-def find_reference_schema(files: list[Path]) -> pa.Schema | None:
-    """Arrow schema of any file already at v1.1, to cast upgraded files to."""
-    for f in files:
-        schema = pq.read_schema(f)
-        md = schema.metadata or {}
-        if md.get(b"schema_version") == SCHEMA_VERSION and "quality" in schema.names:
-            return schema
-    return None
-
-
-def upgrade_file(path: Path, ref_schema: pa.Schema, dry_run: bool) -> bool:
+def upgrade_file(path: Path, dry_run: bool) -> bool:
     schema = pq.read_schema(path)
-    if (schema.metadata or {}).get(b"schema_version") == SCHEMA_VERSION:
+    if (schema.metadata or {}).get(b"schema_version") == FILE_SCHEMA_VERSION:
         return False
 
     if dry_run:
         print(f"would upgrade: {path}")
         return True
 
-    df = pq.read_table(path).to_pandas()
+    source = pq.read_table(path)
+    previous = {k: v for k, v in (source.schema.metadata or {}).items() if k != b"pandas"}
+    df = source.to_pandas()
     if "quality" not in df.columns:
         df["quality"] = synthesize_quality(df)
     if any(c not in df.columns for c in REGION_COLUMNS):
@@ -78,7 +80,7 @@ def upgrade_file(path: Path, ref_schema: pa.Schema, dry_run: bool) -> bool:
         df = regions.enrich(df)
 
     table = pa.Table.from_pandas(df, preserve_index=False)
-    table = table.select(ref_schema.names).cast(ref_schema.remove_metadata())
+    table = sort_rows(table.select(SNAPSHOT_SCHEMA.names)).cast(SNAPSHOT_SCHEMA)
 
     quality_summary = df["quality"].value_counts().to_dict()
     snapshot_ts = pd.Timestamp(table["timestamp"][0].as_py())
@@ -89,14 +91,14 @@ def upgrade_file(path: Path, ref_schema: pa.Schema, dry_run: bool) -> bool:
         b"quality_summary": ",".join(
             f"{k}={v}" for k, v in sorted(quality_summary.items())
         ).encode(),
-        b"schema_version": SCHEMA_VERSION,
-        b"backfilled": b"true",  # upgraded from a pre-v1.1 file, not re-collected
+        b"schema_version": FILE_SCHEMA_VERSION,
     }
-    existing = table.schema.metadata or {}
-    table = table.replace_schema_metadata({**existing, **metadata})
+    if previous.get(b"schema_version") is None:
+        metadata[b"backfilled"] = b"true"  # upgraded from a pre-v1.1 file, not re-collected
+    table = table.replace_schema_metadata({**previous, **metadata})
 
     tmp = path.with_suffix(".parquet.tmp")
-    pq.write_table(table, tmp, compression="zstd")
+    pq.write_table(table, tmp, **parquet_write_options(table))
     tmp.replace(path)
     print(f"upgraded: {path}")
     return True
@@ -113,13 +115,11 @@ def main() -> None:
         print(f"ERROR: no snapshot files under {args.root}", file=sys.stderr)
         sys.exit(2)
 
-    ref = find_reference_schema(files)
-    if ref is None:
-        print("ERROR: no v1.1 reference file found; emit one first "
-              "(scripts/emit_latest_parquet.py).", file=sys.stderr)
-        sys.exit(2)
-
-    changed = sum(upgrade_file(f, ref, args.dry_run) for f in files)
+    upgraded = [f for f in files if upgrade_file(f, args.dry_run)]
+    changed = len(upgraded)
+    out = Path(args.root).parent
+    if upgraded and not args.dry_run and (out / SNAPSHOT_MANIFEST).exists():
+        update_snapshot_manifest(out, upgraded)
     print(f"{changed}/{len(files)} files {'need upgrading' if args.dry_run else 'upgraded'}.")
 
 
@@ -13,6 +13,7 @@ import plotly.express as px  # noqa: E402
 import streamlit as st  # noqa: E402
 
 from queries import (  # noqa: E402
+    PriceFilter,
     load_filter_options,
     load_latest_snapshot,
     load_provider_freshness,
@@ -252,13 +253,13 @@ with tab_trends:
     else:
         default_gpus = tuple(gpu_filter)
 
-    trends = load_trends(
+    trends = load_trends(PriceFilter(
         gpu_types=default_gpus,
         providers=tuple(provider_filter),
         region_groups=tuple(region_group_filter),
         is_spot=is_spot_filter,
         days=lookback_days,
-    )
+    ))
 
     if trends.empty:
         st.warning(
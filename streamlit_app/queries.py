@@ -3,16 +3,34 @@
 The app never downloads the full dataset. DuckDB's httpfs extension issues
 range requests to S3 and prunes by the `dt=YYYY-MM-DD` partition column, so
 trend / spread / latest-snapshot queries each touch only the files they need.
+Closed months are read from the compacted monthly tier when one has been
+published, so full-history scans open a file per month instead of one per
+snapshot, and the snapshot manifest names the files explicitly, so no query
+lists the bucket and lookback queries open only their window's files (see
+`parquet_dataset.py`). The landing page (stats, filter options, latest
+snapshot, provider freshness) reads the published `latest/` artifacts and
+only scans the history when they are missing. The trend, spread and
+regional-dispersion tabs re-aggregate the pre-computed daily cube
+(`cube/`), a few hundred rows per snapshot, and only aggregate the
+listings themselves when part of their window has no cube.
 
 A `regions` view (loaded from `data/regions.csv`) is also registered, and
 all listing-level queries LEFT JOIN it to expose `region_canonical`,
 `country`, and `region_group` for cross-cloud regional analysis.
+
+Filter values are bound parameters, never SQL text: a `PriceFilter` turns a
+tab's selection into normalised conditions and parameters, so each query
+has one SQL string per shape (parsed once, `_statement`) and one cache
+entry per distinct selection.
 """
 
 from __future__ import annotations
 
 import os
 import sys
+import tempfile
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
 
@@ -20,8 +38,10 @@ import duckdb
 import pandas as pd
 import streamlit as st
 
-# Repo root on sys.path so we can import the sibling `regions` module.
+# Repo root on sys.path so we can import the sibling root modules.
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import parquet_dataset  # noqa: E402
+import price_sketch  # noqa: E402
 import regions as regions_module  # noqa: E402
 
 
@@ -31,19 +51,27 @@ def _aws_secret(key: str, default: Optional[str] = None) -> Optional[str]:
     return default
 
 
-@st.cache_resource
+def _prices_url() -> str:
+    """The snapshot tier: a local dir in dev mode, else s3://<bucket>/<prefix>."""
+    if os.environ.get("LOCAL_PARQUET"):
+        # Dev mode: read from a local parquet partition tree.
+        root = os.environ.get("LOCAL_PARQUET_PATH", "data/parquet")
+        return f"{root}/prices"
+    bucket = _aws_secret("bucket", "hubbard-gpu-price-data")
+    prefix = _aws_secret("prefix", "prices")
+    return f"s3://{bucket}/{prefix}"
+
+
+# Recreated hourly (like the cached query results): the `prices` view names
+# its files explicitly, from the manifests, so new snapshots only appear in
+# a new view.
+@st.cache_resource(ttl=3600)
 def get_con() -> duckdb.DuckDBPyConnection:
     """One DuckDB connection per Streamlit session, configured for S3 or local."""
     con = duckdb.connect(":memory:")
 
-    if os.environ.get("LOCAL_PARQUET"):
-        # Dev mode: read from a local parquet partition tree.
-        root = os.environ.get("LOCAL_PARQUET_PATH", "data/parquet")
-        glob = f"{root}/prices/**/*.parquet"
-    else:
+    if not os.environ.get("LOCAL_PARQUET"):
         con.execute("INSTALL httpfs; LOAD httpfs;")
-        bucket = _aws_secret("bucket", "hubbard-gpu-price-data")
-        prefix = _aws_secret("prefix", "prices")
         region = _aws_secret("region", "us-east-1")
         access_key = _aws_secret("access_key_id")
         secret_key = _aws_secret("secret_access_key")
@@ -58,19 +86,6 @@ def get_con() -> duckdb.DuckDBPyConnection:
             # public s3:GetObject + s3:ListBucket on the prices/ prefix.
             con.execute("SET s3_use_ssl=true")
             con.execute("SET s3_url_style='vhost'")
-        glob = f"s3://{bucket}/{prefix}/**/*.parquet"
-
-    # union_by_name: snapshot files written before schema v1.1 lack the
-    # `quality` and region-enrichment columns. Unioning by name keeps the
-    # view working over a mixed-vintage tree (missing columns read as NULL,
-    # which the `prices` view below backfills).
-    con.execute(
-        f"""
-        CREATE OR REPLACE VIEW prices_raw AS
-        SELECT *
-        FROM read_parquet('{glob}', hive_partitioning = true, union_by_name = true)
-        """
-    )
 
     # Register the regions lookup as a DuckDB table so we can JOIN in SQL.
     regions_df = regions_module.load_regions().rename(
@@ -89,6 +104,28 @@ def get_con() -> duckdb.DuckDBPyConnection:
         """
     )
 
+    # The full-history view reads S3 directly; only the windowed views
+    # (`_prices_window`, `_cube_windows`) mirror their files to local disk,
+    # so a cold start does not download the whole bucket.
+    layout = parquet_dataset.load_layout(con, _prices_url())
+    _create_prices_view(con, "prices", layout.relation())
+    return con
+
+
+def _create_prices_view(con: duckdb.DuckDBPyConnection, name: str, source: str) -> None:
+    """Create views `<name>_raw` (the files of `source`) and `<name>` over it."""
+    # union_by_name: snapshot files written before schema v1.1 lack the
+    # `quality` and region-enrichment columns. Unioning by name keeps the
+    # view working over a mixed-vintage tree (missing columns read as NULL,
+    # which the `<name>` view below backfills).
+    con.execute(
+        f"""
+        CREATE OR REPLACE VIEW {name}_raw AS
+        SELECT *
+        FROM {source}
+        """
+    )
+
     # Build the canonical `prices` view. We always expose `quality`,
     # `region_canonical`, `country`, `region_lat`, `region_lon`, and
     # `region_group` so downstream queries don't have to think about which
@@ -98,7 +135,7 @@ def get_con() -> duckdb.DuckDBPyConnection:
     # to the regions.csv lookup join.
     sample_columns = {
         c[0]
-        for c in con.execute("DESCRIBE prices_raw").fetchall()
+        for c in con.execute(f"DESCRIBE {name}_raw").fetchall()
     }
     base_columns = [
         "timestamp", "provider", "instance_type", "gpu_type", "gpu_count",
@@ -126,18 +163,101 @@ def get_con() -> duckdb.DuckDBPyConnection:
 
     con.execute(
         f"""
-        CREATE OR REPLACE VIEW prices AS
+        CREATE OR REPLACE VIEW {name} AS
         SELECT {', '.join(select_parts)}
-        FROM prices_raw p
+        FROM {name}_raw p
         LEFT JOIN regions r
           ON p.provider = r.provider AND p.region = r.region
         """
     )
-    return con
+
+
+def _file_cache() -> Optional[parquet_dataset.LocalFileCache]:
+    """The local-disk mirror of the S3 files that windowed views read.
+
+    Snapshot, compacted and cube files are keyed by the content hash their
+    manifest records, so after a restart or a view refresh warm windows read
+    local copies instead of S3, and a rewritten file is fetched again.
+    `PARQUET_CACHE_DIR` (default: under the system temp dir) and
+    `PARQUET_CACHE_MB` (default 512; 0 disables) configure it. None for a
+    local tree, which is read in place.
+    """
+    if os.environ.get("LOCAL_PARQUET"):
+        return None
+    budget = int(os.environ.get("PARQUET_CACHE_MB", "512")) * 1024 * 1024
+    if budget <= 0:
+        return None
+    directory = os.environ.get(
+        "PARQUET_CACHE_DIR", os.path.join(tempfile.gettempdir(), "gpu-price-parquet-cache")
+    )
+    return parquet_dataset.LocalFileCache(get_con(), directory, budget)
+
+
+def _prices_window(days: int) -> str:
+    """A view like `prices` over only the files of the last `days` days.
+
+    The file list is resolved from the snapshot manifest, so queries bounded
+    by `timestamp >= MAX(timestamp) - INTERVAL 'days days'` open only the
+    files that can match. Returns the view's name; `days=0` is the newest
+    snapshot alone. Without a manifest the view reads the whole tree. Files
+    are read through `_file_cache()`.
+    """
+    con = get_con()
+    name = f"prices_last_{int(days)}d"
+    layout = parquet_dataset.load_layout(con, _prices_url(), cache=_file_cache())
+    _create_prices_view(con, name, layout.relation(int(days)))
+    return name
+
+
+def _cube_windows(days: int, *tables: str) -> Optional[dict]:
+    """Views over cube tables `tables` for the last `days` days, or None.
+
+    Returns {table: view name}. All views come from one read of the
+    manifests, so they cover the same snapshots. None when some snapshot
+    in the window has no cube files (or there is no snapshot manifest);
+    the caller then reads `_prices_window(days)`.
+    """
+    con = get_con()
+    layout = parquet_dataset.load_layout(con, _prices_url(), cache=_file_cache())
+    sources = {table: layout.cube_relation(table, int(days)) for table in tables}
+    if None in sources.values():
+        return None
+    names = {}
+    for table, source in sources.items():
+        names[table] = f"cube_{table}_last_{int(days)}d"
+        con.execute(f"CREATE OR REPLACE VIEW {names[table]} AS SELECT * FROM {source}")
+    return names
+
+
+def _latest_stats() -> Optional[dict]:
+    """The published `latest/stats.json`, or None if there is none."""
+    root = parquet_dataset.dataset_root(_prices_url())
+    return parquet_dataset.load_latest_stats(get_con(), root)
+
+
+def _latest_view() -> str:
+    """A view like `prices` over the newest snapshot alone.
+
+    Reads the fixed-path `latest/latest.parquet` when it is published (one
+    small GET), else the newest file of the snapshot tier.
+    """
+    con = get_con()
+    root = parquet_dataset.dataset_root(_prices_url())
+    path = f"{root}/{parquet_dataset.LATEST_SNAPSHOT}".replace("'", "''")
+    try:
+        _create_prices_view(con, "prices_latest", f"(SELECT * FROM read_parquet('{path}'))")
+    except duckdb.IOException:
+        return _prices_window(0)
+    return "prices_latest"
 
 
 @st.cache_data(ttl=3600)
 def load_stats() -> dict:
+    stats = _latest_stats()
+    if stats is not None:
+        keys = ("first_snapshot", "last_snapshot", "snapshots", "total_records",
+                "providers", "gpu_types")
+        return {key: stats[key] for key in keys}
     con = get_con()
     row = con.execute(
         """
@@ -162,16 +282,16 @@ def load_latest_snapshot() -> pd.DataFrame:
 
     Excludes gpu_count = 0 (CPU-only artifacts) and Unknown gpu_type.
     """
-    con = get_con()
-    df = con.execute(
-        """
+    view = _latest_view()
+    df = get_con().execute(
+        f"""
         SELECT timestamp, provider, instance_type, gpu_type, gpu_count,
                gpu_memory_gb, vcpus, ram_gb, region,
                region_canonical, country, region_group,
                price_per_hour,
                is_spot, available, availability_zone
-        FROM prices
-        WHERE timestamp = (SELECT MAX(timestamp) FROM prices)
+        FROM {view}
+        WHERE timestamp = (SELECT MAX(timestamp) FROM {view})
           AND quality = 'ok'
         """
     ).df()
@@ -188,9 +308,27 @@ def load_provider_freshness() -> pd.DataFrame:
     render the freshness panel in the app header — providers that have not
     appeared in a recent snapshot indicate a scraper outage.
     """
-    con = get_con()
-    df = con.execute(
-        """
+    latest = _latest_view()
+    stats = _latest_stats()
+    if stats is not None:
+        counts = get_con().execute(
+            f"""
+            SELECT provider, COUNT(*) AS listings_in_latest
+            FROM {latest}
+            WHERE quality = 'ok'
+            GROUP BY provider
+            """
+        ).df()
+        df = pd.DataFrame(
+            sorted(stats["provider_last_seen"].items()), columns=["provider", "last_seen"]
+        ).merge(counts, on="provider", how="left")
+        df["listings_in_latest"] = df["listings_in_latest"].fillna(0).astype("int64")
+        df["last_seen"] = pd.to_datetime(df["last_seen"])
+        return df.sort_values(["last_seen", "provider"], ascending=[False, True],
+                              ignore_index=True)
+
+    df = get_con().execute(
+        f"""
         WITH per_provider AS (
             SELECT provider,
                    MAX(timestamp) AS last_seen
@@ -200,8 +338,8 @@ def load_provider_freshness() -> pd.DataFrame:
         ),
         latest_listings AS (
             SELECT provider, COUNT(*) AS listings_in_latest
-            FROM prices
-            WHERE timestamp = (SELECT MAX(timestamp) FROM prices)
+            FROM {latest}
+            WHERE timestamp = (SELECT MAX(timestamp) FROM {latest})
               AND quality = 'ok'
             GROUP BY provider
         )
@@ -220,6 +358,17 @@ def load_provider_freshness() -> pd.DataFrame:
 
 @st.cache_data(ttl=3600)
 def load_filter_options() -> dict:
+    stats = _latest_stats()
+    if stats is not None:
+        ranked = {
+            name: [v for v, _ in sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))]
+            for name, counts in stats["ok_listings"].items()
+        }
+        return {
+            "gpu_types": ranked["gpu_type"],
+            "providers": ranked["provider"],
+            "region_groups": ranked["region_group"],
+        }
     con = get_con()
     gpu_types = con.execute(
         """
@@ -250,33 +399,84 @@ def load_filter_options() -> dict:
     }
 
 
-def _quoted_in_clause(values: tuple[str, ...]) -> str:
-    """Build a SQL IN-list from a small set of trusted strings."""
-    safe = [v.replace("'", "''") for v in values]
-    return ", ".join(f"'{v}'" for v in safe)
+@dataclass(frozen=True)
+class PriceFilter:
+    """The listing filters of a tab, normalised so equal filters are equal.
+
+    Value tuples are deduplicated and sorted and `days` is an int, so the
+    same selection in any order is one `st.cache_data` key and one SQL
+    shape. Empty tuples and `is_spot=None` do not filter.
+    """
+
+    gpu_types: tuple = ()
+    providers: tuple = ()
+    region_groups: tuple = ()
+    is_spot: Optional[bool] = None
+    days: int = 30
+
+    def __post_init__(self):
+        for name in ("gpu_types", "providers", "region_groups"):
+            object.__setattr__(self, name, tuple(sorted(set(getattr(self, name)))))
+        if self.is_spot is not None:
+            object.__setattr__(self, "is_spot", bool(self.is_spot))
+        object.__setattr__(self, "days", int(self.days))
+
+    def where(self, newest: str, alias: str = "") -> tuple[list, dict]:
+        """WHERE conditions and their bound parameters.
+
+        Args:
+            newest: View whose MAX(timestamp) ends the lookback window.
+            alias: Table alias to qualify the filtered columns with.
+
+        Returns:
+            (conditions, parameters). Values are never part of the SQL: a
+            list becomes one placeholder per value (`gpu_type IN ($gpu_type_0,
+            $gpu_type_1)`), which DuckDB still pushes into the Parquet scan
+            like literals, so the text depends only on the list lengths.
+        """
+        col = f"{alias}." if alias else ""
+        where = [f"{col}timestamp >= (SELECT MAX(timestamp) FROM {newest}) - to_days($days)"]
+        params = {"days": self.days}
+        for column, values in (("gpu_type", self.gpu_types), ("provider", self.providers),
+                               ("region_group", self.region_groups)):
+            if values:
+                names = [f"{column}_{i}" for i in range(len(values))]
+                where.append(f"{col}{column} IN ({', '.join('$' + n for n in names)})")
+                params.update(zip(names, values))
+        if self.is_spot is not None:
+            where.append(f"{col}is_spot = $is_spot")
+            params["is_spot"] = self.is_spot
+        return where, params
+
+
+@lru_cache(maxsize=256)
+def _statement(sql: str) -> duckdb.Statement:
+    """`sql` parsed once per query shape; reusable on any connection."""
+    statement, = get_con().extract_statements(sql)
+    return statement
+
+
+def _query_df(sql: str, params: dict) -> pd.DataFrame:
+    """Run `sql` with bound `params`; `day` columns become datetimes."""
+    df = get_con().execute(_statement(sql), params).df()
+    if not df.empty and "day" in df:
+        df["day"] = pd.to_datetime(df["day"])
+    return df
 
 
 @st.cache_data(ttl=3600)
-def load_trends(
-    gpu_types: tuple[str, ...] = (),
-    providers: tuple[str, ...] = (),
-    region_groups: tuple[str, ...] = (),
-    is_spot: Optional[bool] = None,
-    days: int = 30,
-) -> pd.DataFrame:
-    """Daily-aggregated $/GPU-hr per gpu_type within the lookback window."""
-    where = [
-        "timestamp >= (SELECT MAX(timestamp) FROM prices) - INTERVAL '{} days'".format(int(days)),
-        "quality = 'ok'",
-    ]
-    if gpu_types:
-        where.append(f"gpu_type IN ({_quoted_in_clause(gpu_types)})")
-    if providers:
-        where.append(f"provider IN ({_quoted_in_clause(providers)})")
-    if region_groups:
-        where.append(f"region_group IN ({_quoted_in_clause(region_groups)})")
-    if is_spot is not None:
-        where.append(f"is_spot = {str(bool(is_spot)).upper()}")
+def load_trends(spec: PriceFilter = PriceFilter()) -> pd.DataFrame:
+    """Daily-aggregated $/GPU-hr per gpu_type within the lookback window.
+
+    The median is the lower median of the day's listings (`quantile_disc`:
+    the value at rank (n - 1) / 2). Read from the cube, it is the value of
+    the sketch bin holding that listing, within 1% of it
+    (`price_sketch.ALPHA`); read from the listings, it is exact.
+    """
+    cube = _cube_windows(spec.days, "daily")
+    view = cube["daily"] if cube else _prices_window(spec.days)
+    where, params = spec.where(view)
+    where.append("quality = 'ok'")
 
     sql = f"""
         SELECT CAST(timestamp AS DATE) AS day,
@@ -284,16 +484,55 @@ def load_trends(
                AVG(price_per_hour / gpu_count) AS avg_price_per_gpu_hour,
                MIN(price_per_hour / gpu_count) AS min_price_per_gpu_hour,
                MAX(price_per_hour / gpu_count) AS max_price_per_gpu_hour,
+               quantile_disc(price_per_hour / gpu_count, 0.5) AS median_price_per_gpu_hour,
                COUNT(*) AS listings
-        FROM prices
+        FROM {view}
         WHERE {' AND '.join(where)}
         GROUP BY day, gpu_type
         ORDER BY day, gpu_type
     """
-    df = get_con().execute(sql).df()
-    if not df.empty:
-        df["day"] = pd.to_datetime(df["day"])
-    return df
+    if cube:
+        # Sum the groups' sketches per (day, gpu_type); the median is the
+        # first bin whose running count exceeds rank (n - 1) / 2.
+        sql = f"""
+            WITH c AS (
+                SELECT CAST(timestamp AS DATE) AS day, *
+                FROM {view}
+                WHERE {' AND '.join(where)}
+            ),
+            bins AS (
+                SELECT day, gpu_type, bin, SUM(n) AS n
+                FROM (SELECT day, gpu_type,
+                             UNNEST(sketch_bins) AS bin, UNNEST(sketch_counts) AS n
+                      FROM c)
+                GROUP BY day, gpu_type, bin
+            ),
+            ranked AS (
+                SELECT day, gpu_type, bin,
+                       SUM(n) OVER (PARTITION BY day, gpu_type ORDER BY bin) AS below,
+                       SUM(n) OVER (PARTITION BY day, gpu_type) AS total
+                FROM bins
+            ),
+            medians AS (
+                SELECT day, gpu_type, MIN(bin) AS bin
+                FROM ranked
+                WHERE below > 0.5 * (total - 1)
+                GROUP BY day, gpu_type
+            )
+            SELECT c.day,
+                   c.gpu_type,
+                   SUM(price_sum) / NULLIF(SUM(priced), 0) AS avg_price_per_gpu_hour,
+                   MIN(price_min) AS min_price_per_gpu_hour,
+                   MAX(price_max) AS max_price_per_gpu_hour,
+                   ANY_VALUE({price_sketch.bin_value_sql("m.bin")})
+                       AS median_price_per_gpu_hour,
+                   CAST(SUM(listings) AS BIGINT) AS listings
+            FROM c
+            LEFT JOIN medians m ON c.day = m.day AND c.gpu_type = m.gpu_type
+            GROUP BY c.day, c.gpu_type
+            ORDER BY c.day, c.gpu_type
+        """
+    return _query_df(sql, params)
 
 
 @st.cache_data(ttl=3600)
@@ -310,19 +549,37 @@ def load_regional_dispersion(
     a listing count; downstream code can compute coefficient of
     variation across regions per day from this.
     """
-    safe_gpu = gpu_type.replace("'", "''")
-    safe_prov = provider.replace("'", "''")
+    spec = PriceFilter(gpu_types=(gpu_type,), providers=(provider,), days=days)
+    cube = _cube_windows(spec.days, "regional", "daily")
+    if cube:
+        # The window ends at the newest snapshot, which `daily` always has.
+        where, params = spec.where(cube["daily"])
+        sql = f"""
+            SELECT CAST(timestamp AS DATE) AS day,
+                   region,
+                   region_group,
+                   SUM(price_sum) / NULLIF(SUM(priced), 0) AS avg_price_per_gpu_hour,
+                   MIN(price_min) AS min_price_per_gpu_hour,
+                   MAX(price_max) AS max_price_per_gpu_hour,
+                   CAST(SUM(listings) AS BIGINT) AS listings
+            FROM {cube['regional']}
+            WHERE {' AND '.join(where)}
+            GROUP BY day, region, region_group
+            ORDER BY day, region
+        """
+        return _query_df(sql, params)
+
+    view = _prices_window(spec.days)
+    where, params = spec.where(view)
     sql = f"""
         WITH t AS (
             SELECT CAST(timestamp AS DATE) AS day,
                    COALESCE(region_canonical, region) AS region,
                    region_group,
                    price_per_hour / gpu_count AS p
-            FROM prices
-            WHERE gpu_type = '{safe_gpu}'
-              AND provider = '{safe_prov}'
+            FROM {view}
+            WHERE {' AND '.join(where)}
               AND quality = 'ok'
-              AND timestamp >= (SELECT MAX(timestamp) FROM prices) - INTERVAL '{int(days)} days'
         )
         SELECT day,
                region,
@@ -335,16 +592,34 @@ def load_regional_dispersion(
         GROUP BY day, region, region_group
         ORDER BY day, region
     """
-    df = get_con().execute(sql).df()
-    if not df.empty:
-        df["day"] = pd.to_datetime(df["day"])
-    return df
+    return _query_df(sql, params)
 
 
 @st.cache_data(ttl=3600)
 def load_spread(gpu_type: str, days: int = 30) -> pd.DataFrame:
     """Daily on-demand minus spot $/GPU-hr per provider, for one GPU family."""
-    safe_gpu = gpu_type.replace("'", "''")
+    spec = PriceFilter(gpu_types=(gpu_type,), days=days)
+    cube = _cube_windows(spec.days, "spread", "daily")
+    if cube:
+        # The spread table holds the spot/on-demand pairs already matched.
+        # The window ends at the newest snapshot, which `daily` always has.
+        where, params = spec.where(cube["daily"])
+        sql = f"""
+            SELECT CAST(timestamp AS DATE) AS day,
+                   provider,
+                   SUM(spot_sum) / NULLIF(SUM(spot_priced), 0) AS spot_price,
+                   SUM(on_demand_sum) / NULLIF(SUM(on_demand_priced), 0) AS on_demand_price,
+                   SUM(spread_sum) / NULLIF(SUM(spread_priced), 0) AS spread,
+                   CAST(SUM(pairs) AS BIGINT) AS pairs
+            FROM {cube['spread']}
+            WHERE {' AND '.join(where)}
+            GROUP BY day, provider
+            ORDER BY day, provider
+        """
+        return _query_df(sql, params)
+
+    view = _prices_window(spec.days)
+    where, params = spec.where(view, alias="s")
     sql = f"""
         SELECT CAST(s.timestamp AS DATE) AS day,
                s.provider,
@@ -352,20 +627,16 @@ def load_spread(gpu_type: str, days: int = 30) -> pd.DataFrame:
                AVG(od.price_per_hour / od.gpu_count) AS on_demand_price,
                AVG((od.price_per_hour - s.price_per_hour) / s.gpu_count) AS spread,
                COUNT(*) AS pairs
-        FROM prices s
-        JOIN prices od
+        FROM {view} s
+        JOIN {view} od
           ON s.timestamp = od.timestamp
          AND s.provider = od.provider
          AND s.instance_type = od.instance_type
          AND s.region = od.region
          AND s.is_spot = TRUE AND od.is_spot = FALSE
-        WHERE s.gpu_type = '{safe_gpu}'
+        WHERE {' AND '.join(where)}
           AND s.quality = 'ok'
-          AND s.timestamp >= (SELECT MAX(timestamp) FROM prices) - INTERVAL '{int(days)} days'
         GROUP BY day, s.provider
         ORDER BY day, s.provider
     """
-    df = get_con().execute(sql).df()
-    if not df.empty:
-        df["day"] = pd.to_datetime(df["day"])
-    return df
+    return _query_df(sql, params)
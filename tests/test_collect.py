@@ -0,0 +1,69 @@
+"""Regression tests for the batch catalog converter in collect.py."""
+
+import importlib.util
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# collect.py exits when gpuhunt is missing.
+HAVE_GPUHUNT = importlib.util.find_spec("gpuhunt") is not None
+if HAVE_GPUHUNT:
+    import collect
+    from database import PriceDatabase
+
+
+def _item(**overrides):
+    fields = dict(provider="aws", gpu_name="H100", gpu_count=8, gpu_memory=80,
+                  instance_name="p5.48xlarge", cpu=192, memory=2048, location="us-east-1",
+                  price=98.32, spot=False)
+    fields.update(overrides)
+    return SimpleNamespace(**fields)
+
+
+@unittest.skipUnless(HAVE_GPUHUNT, "gpuhunt not installed")
+class ConvertGpuhuntItemsTest(unittest.TestCase):
+
+    def test_priceless_items_fail_and_snapshot_is_stored(self):
+        items = [
+            _item(),
+            _item(instance_name="no-price", price=None),
+            _item(instance_name="bad-price", price="n/a"),
+        ]
+        batch, failures = collect.convert_gpuhunt_items(items)
+
+        self.assertEqual(list(batch.instance_type), ["p5.48xlarge"])
+        self.assertEqual(failures, {"aws": 2})
+
+        with tempfile.TemporaryDirectory() as tmp:
+            db = PriceDatabase(str(Path(tmp) / "prices.db"))
+            try:
+                stored = db.store_prices(batch, timestamp=datetime(2026, 1, 1, 12))
+                self.assertEqual(stored, 1)
+                snapshots = db.get_snapshots(days=100_000)
+            finally:
+                db.close()
+        self.assertEqual([s["total_instances"] for s in snapshots], [1])
+
+    def test_cpu_only_items_are_not_failures(self):
+        items = [_item(), _item(instance_name="cpu", gpu_count=0, gpu_memory=float("nan"))]
+        batch, failures = collect.convert_gpuhunt_items(items)
+
+        self.assertEqual(len(batch), 1)
+        self.assertEqual(failures, {})
+
+    def test_provider_spellings_merge(self):
+        items = [_item(provider="AWS"), _item(provider="aws"), _item(provider="gcp")]
+        batch, _ = collect.convert_gpuhunt_items(items)
+
+        self.assertEqual(list(batch.provider.categories), ["aws", "gcp"])
+        self.assertEqual(sorted(name for name, _ in batch.groups("provider")), ["aws", "gcp"])
+        self.assertEqual(len(batch.to_pandas()), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()